@@ -0,0 +1,217 @@
+"""
+Per-locality aggregates, materialized once per dataset snapshot.
+
+Summaries only need each locality's first/last year values, growth and
+totals, plus who grew fastest. Computing them here for every locality and
+metric in one vectorized pass turns summary generation into lookups.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .index import LocalityYearCube
+
+
+class LocalityAggregates:
+    """
+    Aggregate table over a ``LocalityYearCube``.
+
+    With ``year_mask``, only the selected years are aggregated.
+
+    Attributes (arrays indexed by locality code, and metric code where 2-D):
+        first_year, last_year: first/last year with data for each locality
+        first_values, last_values: metric values in those years
+        growth: percentage change from first to last value
+        totals: sum of each metric over the aggregated years
+        growth_rank: 0-based rank of each locality's growth per metric
+            (0 = fastest growing, NaN growth ranked last)
+    """
+
+    def __init__(self, cube: LocalityYearCube, year_mask: Optional[np.ndarray] = None):
+        self.cube = cube
+        self.year_mask = year_mask
+        years, row_index, values = cube.years, cube.row_index, cube.values
+        if year_mask is not None:
+            # Aggregate over a window of years only
+            years, row_index, values = years[year_mask], row_index[:, year_mask], values[:, year_mask, :]
+
+        (self.has_data, self.first_year, self.last_year, self.first_values, self.last_values,
+         self.growth, self.totals) = _locality_aggregates(years, row_index, values)
+        self._rank()
+
+    def _rank(self) -> None:
+        # Sort descending by growth with NaN last, then turn the order into ranks
+        order = np.argsort(_rank_keys(self.growth), axis=0, kind='stable')
+        self.growth_order = order
+        self.growth_rank = np.empty_like(order)
+        np.put_along_axis(self.growth_rank, order, np.arange(len(order))[:, None], axis=0)
+
+    def _rerank(self, previous: 'LocalityAggregates', codes: np.ndarray) -> None:
+        """
+        Growth ranks after only the localities ``codes`` changed (or were
+        added) since ``previous``.
+
+        A metric keeps its order when each changed locality still sorts
+        between its old neighbours; otherwise the changed localities are
+        taken out of the old order and merged back in at their new places.
+        Nothing is sorted beyond ``codes``.
+        """
+        n, stale = len(self.growth), len(previous.growth)
+        keys = _rank_keys(self.growth)
+        metrics = np.arange(keys.shape[1])
+        if n == stale:
+            # (key, code) pairs must still increase along the old order around each changed locality
+            at = previous.growth_rank[codes]
+            before = previous.growth_order[np.maximum(at - 1, 0), metrics]
+            after = previous.growth_order[np.minimum(at + 1, n - 1), metrics]
+            mine = keys[codes]
+            in_place = (
+                ((at == 0) | _precedes(keys[before, metrics], before, mine, codes[:, None]))
+                & ((at == n - 1) | _precedes(mine, codes[:, None], keys[after, metrics], after))
+            ).all(axis=0)
+            if in_place.all():
+                self.growth_order, self.growth_rank = previous.growth_order, previous.growth_rank
+                return
+            moved = np.flatnonzero(~in_place)
+        else:
+            moved = metrics
+
+        self.growth_order = np.empty((n, len(metrics)), dtype=previous.growth_order.dtype)
+        self.growth_order[:stale] = previous.growth_order
+        self.growth_rank = np.empty_like(self.growth_order)
+        self.growth_rank[:stale] = previous.growth_rank
+        changed = np.zeros(n, dtype=bool)
+        changed[codes] = True
+        pair = np.dtype([('key', np.float64), ('code', np.int64)])
+        for m in moved.tolist():
+            kept = previous.growth_order[:, m]
+            kept = kept[~changed[kept]]
+            merged = np.empty(len(codes), dtype=pair)
+            merged['key'], merged['code'] = keys[codes, m], codes
+            merged.sort()
+            remaining = np.empty(len(kept), dtype=pair)
+            remaining['key'], remaining['code'] = keys[kept, m], kept
+            # Both sides are in (key, code) order, as the stable sort of _rank leaves ties
+            order = np.insert(kept, np.searchsorted(remaining, merged), merged['code'])
+            self.growth_order[:, m] = order
+            self.growth_rank[order, m] = np.arange(n)
+
+    def updated(self, cube: LocalityYearCube, codes: np.ndarray) -> Optional['LocalityAggregates']:
+        """
+        Aggregates of ``cube``, an update of this one's cube where only the
+        localities ``codes`` changed (or were added).
+
+        Only those localities are recomputed and re-ranked (see ``_rerank``);
+        the other localities' aggregates do not depend on the year axis, so
+        new years need no full pass either. None for aggregates over a year
+        window, whose mask no longer fits the new cube.
+        """
+        if self.year_mask is not None:
+            return None
+        codes = np.unique(codes)
+
+        aggregates = LocalityAggregates.__new__(LocalityAggregates)
+        aggregates.cube, aggregates.year_mask = cube, None
+        stale = len(self.has_data)
+        fields = ('has_data', 'first_year', 'last_year', 'first_values', 'last_values', 'growth', 'totals')
+        fresh = _locality_aggregates(cube.years, cube.row_index[codes], cube.values[codes])
+        for name, part in zip(fields, fresh):
+            array = getattr(self, name)
+            # Room for new localities, which are always appended
+            grown = np.zeros((len(cube.localities),) + array.shape[1:], array.dtype)
+            grown[:stale] = array
+            grown[codes] = part
+            setattr(aggregates, name, grown)
+        aggregates._rerank(self, codes)
+        return aggregates
+
+    def _box(self, value: float, metric: str):
+        if metric in self.cube.integer_metrics and not np.isnan(value):
+            return int(value)
+        return float(value)
+
+    def has(self, locality: str) -> bool:
+        """Whether ``locality`` has any data."""
+        code = self.cube.locality_code(locality)
+        return code is not None and bool(self.has_data[code])
+
+    def years(self, locality: str) -> Tuple[int, int]:
+        """First and last year with data for ``locality``."""
+        code = self.cube.locality_codes[locality]
+        return int(self.first_year[code]), int(self.last_year[code])
+
+    def first(self, locality: str, metric: str):
+        """Value of ``metric`` in the first year of ``locality``."""
+        code = self.cube.locality_codes[locality]
+        return self._box(self.first_values[code, self.cube.metric_codes[metric]], metric)
+
+    def last(self, locality: str, metric: str):
+        """Value of ``metric`` in the last year of ``locality``."""
+        code = self.cube.locality_codes[locality]
+        return self._box(self.last_values[code, self.cube.metric_codes[metric]], metric)
+
+    def change(self, locality: str, metric: str) -> float:
+        """Percentage change of ``metric`` from the first to the last year."""
+        code = self.cube.locality_codes[locality]
+        return float(self.growth[code, self.cube.metric_codes[metric]])
+
+    def total(self, locality: str, metric: str):
+        """Sum of ``metric`` over all years of ``locality``."""
+        code = self.cube.locality_codes[locality]
+        return self._box(self.totals[code, self.cube.metric_codes[metric]], metric)
+
+    def best(self, localities: List[str], metric: str) -> Tuple[Optional[str], Optional[float]]:
+        """Locality with the highest growth of ``metric`` among ``localities``."""
+        candidates = [locality for locality in localities if self.has(locality)]
+        if not candidates:
+            return None, None
+        codes = np.array([self.cube.locality_codes[locality] for locality in candidates])
+        growth = self.growth[codes, self.cube.metric_codes[metric]]
+        if np.isnan(growth).all():
+            return None, None
+        best = int(np.nanargmax(growth))
+        return candidates[best], float(growth[best])
+
+    def ranking(self, metric: str, n: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Localities ordered by growth of ``metric`` (fastest first, NaN excluded)."""
+        m = self.cube.metric_codes[metric]
+        result = []
+        for code in self.growth_order[:, m]:
+            growth = self.growth[code, m]
+            if np.isnan(growth) or (n is not None and len(result) >= n):
+                break
+            result.append((self.cube.localities[code], float(growth)))
+        return result
+
+
+def _rank_keys(growth: np.ndarray) -> np.ndarray:
+    """Ascending sort keys of growth: fastest first, NaN last."""
+    return np.where(np.isnan(growth), np.inf, -growth)
+
+
+def _precedes(key_a: np.ndarray, code_a: np.ndarray, key_b: np.ndarray, code_b: np.ndarray) -> np.ndarray:
+    """Whether (key_a, code_a) sorts before (key_b, code_b), ties between keys broken by code."""
+    return (key_a < key_b) | ((key_a == key_b) & (code_a < code_b))
+
+
+def _locality_aggregates(years: np.ndarray, row_index: np.ndarray, values: np.ndarray) -> tuple:
+    """(has_data, first_year, last_year, first_values, last_values, growth, totals) of each row of ``row_index``."""
+    n_localities, n_years = row_index.shape
+    localities = np.arange(n_localities)
+
+    present = row_index >= 0
+    has_data = present.any(axis=1)
+    first = np.argmax(present, axis=1)
+    last = n_years - 1 - np.argmax(present[:, ::-1], axis=1)
+
+    if n_years:
+        first_year, last_year = years[first], years[last]
+        first_values, last_values = values[localities, first, :], values[localities, last, :]
+    else:
+        first_year = last_year = np.zeros(n_localities, dtype=np.int64)
+        first_values = last_values = np.full((n_localities, values.shape[2]), np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (last_values - first_values) / first_values * 100
+    totals = np.nansum(values, axis=1)
+    return has_data, first_year, last_year, first_values, last_values, growth, totals
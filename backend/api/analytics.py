@@ -0,0 +1,216 @@
+"""
+Derived market statistics for every locality, materialized once per
+dataset snapshot (and year window).
+
+CAGR, year-over-year changes, rolling averages, volatility and the
+price-demand correlation are computed for all localities and metrics in
+one pass over the cube's ``(localities, years, metrics)`` array, so the
+analytics endpoint, the summaries and the OpenAI prompt only look them up.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .dataset import DatasetSnapshot
+from .engine import PROPERTY_TYPES, metric_column
+from .index import LocalityYearCube
+
+
+class LocalityAnalytics:
+    """
+    Statistics table over a ``LocalityYearCube``.
+
+    With ``year_mask``, only the selected years are used.
+
+    Attributes (arrays indexed by locality code, then year and/or metric code):
+        years: the years covered
+        cagr: compound annual growth rate (%) from the first to the last year
+            with data, NaN with fewer than two years or a non-positive start
+        yoy: (localities, years, metrics) change (%) from the previous year
+            in the data, NaN where either year is missing
+        rolling: (localities, years, metrics) mean of the trailing
+            ``window`` years that have data, NaN where the year is missing
+        volatility: sample standard deviation of the year-over-year changes
+            (percentage points), NaN with fewer than two changes
+        correlation: (localities, property types) Pearson correlation of
+            price and demand over the years where both are known, NaN with
+            fewer than three such years or no variation
+    """
+
+    STATISTICS = ('cagr', 'yoy', 'rolling', 'volatility', 'correlation')
+
+    def __init__(self, cube: LocalityYearCube, year_mask: Optional[np.ndarray] = None, window: int = 3):
+        self.cube = cube
+        self.window = window
+        self.year_mask = year_mask
+        years, values = cube.years, cube.values
+        if year_mask is not None:
+            years, values = years[year_mask], values[:, year_mask, :]
+        self.years = years
+        self.property_types = [
+            property_type for property_type in PROPERTY_TYPES
+            if metric_column('price', property_type) in cube.metric_codes
+            and metric_column('demand', property_type) in cube.metric_codes
+        ]
+        for name, array in zip(self.STATISTICS, self._statistics(values)):
+            setattr(self, name, array)
+
+    def _statistics(self, values: np.ndarray) -> tuple:
+        """(cagr, yoy, rolling, volatility, correlation) of each locality row of ``values``."""
+        years, window = self.years, self.window
+        n_localities, n_years, n_metrics = values.shape
+        known = ~np.isnan(values)
+        localities = np.arange(n_localities)[:, None]
+        metrics = np.arange(n_metrics)[None, :]
+
+        # First/last year with data, per locality and metric
+        has_data = known.any(axis=1)
+        first = np.argmax(known, axis=1)
+        last = n_years - 1 - np.argmax(known[:, ::-1, :], axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            if n_years:
+                first_values, last_values = values[localities, first, metrics], values[localities, last, metrics]
+                spans = (years[last] - years[first]).astype(np.float64)
+                cagr = (np.power(last_values / first_values, 1 / spans) - 1) * 100
+                cagr[~has_data | (spans <= 0) | (first_values <= 0)] = np.nan
+            else:
+                cagr = np.full((n_localities, n_metrics), np.nan)
+
+            yoy = np.full(values.shape, np.nan)
+            if n_years > 1:
+                yoy[:, 1:, :] = (values[:, 1:, :] / values[:, :-1, :] - 1) * 100
+            yoy[~np.isfinite(yoy)] = np.nan
+
+            # Trailing sums and counts via cumulative sums over the year axis
+            sums = np.cumsum(np.where(known, values, 0.0), axis=1)
+            counts = np.cumsum(known, axis=1)
+            if n_years > window:
+                sums[:, window:, :] = sums[:, window:, :] - sums[:, :-window, :]
+                counts[:, window:, :] = counts[:, window:, :] - counts[:, :-window, :]
+            rolling = np.where(known, sums / counts, np.nan)
+
+        changes = np.isfinite(yoy).sum(axis=1)
+        volatility = np.full((n_localities, n_metrics), np.nan)
+        enough = changes >= 2
+        if enough.any():
+            mean = np.nansum(yoy, axis=1) / np.maximum(changes, 1)
+            squares = np.nansum((yoy - mean[:, None, :]) ** 2, axis=1)
+            volatility[enough] = np.sqrt(squares[enough] / (changes[enough] - 1))
+
+        metric_codes = self.cube.metric_codes
+        correlation = np.full((n_localities, len(self.property_types)), np.nan)
+        for p, property_type in enumerate(self.property_types):
+            price = values[:, :, metric_codes[metric_column('price', property_type)]]
+            demand = values[:, :, metric_codes[metric_column('demand', property_type)]]
+            correlation[:, p] = _row_correlation(price, demand)
+
+        return cagr, yoy, rolling, volatility, correlation
+
+    def updated(self, cube: LocalityYearCube, codes: np.ndarray) -> Optional['LocalityAnalytics']:
+        """
+        Analytics of ``cube``, an update of this one's cube where only the
+        localities ``codes`` changed (or were added), recomputing just those.
+
+        None when that is not possible (a year window, or new years).
+        """
+        if self.year_mask is not None or not np.array_equal(cube.years, self.cube.years):
+            return None
+        analytics = LocalityAnalytics.__new__(LocalityAnalytics)
+        analytics.cube, analytics.window, analytics.year_mask = cube, self.window, None
+        analytics.years, analytics.property_types = self.years, self.property_types
+        stale = len(self.cagr)
+        for name, part in zip(self.STATISTICS, analytics._statistics(cube.values[codes])):
+            array = getattr(self, name)
+            # Room for new localities, which are always appended
+            array = np.concatenate([array, np.full((len(cube.localities) - stale,) + array.shape[1:], np.nan)])
+            array[codes] = part
+            setattr(analytics, name, array)
+        return analytics
+
+    def _code(self, locality: str) -> int:
+        return self.cube.locality_codes[locality]
+
+    def stats(self, locality: str, metric: str, series: bool = False) -> Dict[str, Any]:
+        """CAGR and volatility of ``metric`` for ``locality`` (plus its YoY and rolling series)."""
+        code, m = self._code(locality), self.cube.metric_codes[metric]
+        result = {'cagr': _number(self.cagr[code, m]), 'volatility': _number(self.volatility[code, m])}
+        if series:
+            result['yoy'] = _numbers(self.yoy[code, :, m])
+            result['rolling'] = _numbers(self.rolling[code, :, m])
+        return result
+
+    def correlation_of(self, locality: str, property_type: str = 'flat') -> Optional[float]:
+        """Price-demand correlation of ``locality`` for a property type (None if unknown)."""
+        if property_type not in self.property_types:
+            return None
+        return _number(self.correlation[self._code(locality), self.property_types.index(property_type)])
+
+    def locality_stats(self, locality: str, property_type: str = 'flat', series: bool = False) -> Dict[str, Any]:
+        """All statistics of ``locality`` for the price and demand metrics of a property type."""
+        return {
+            'locality': locality,
+            'price': self.stats(locality, metric_column('price', property_type), series),
+            'demand': self.stats(locality, metric_column('demand', property_type), series),
+            'priceDemandCorrelation': self.correlation_of(locality, property_type),
+        }
+
+
+SORT_KEYS = ('price_cagr', 'demand_cagr', 'price_volatility', 'demand_volatility', 'correlation')
+
+
+def sort_localities(analytics: LocalityAnalytics, codes: np.ndarray, key: str, property_type: str = 'flat', descending: bool = True) -> np.ndarray:
+    """
+    Order locality ``codes`` by one statistic (one of ``SORT_KEYS``), unknown values last.
+
+    Raises:
+        ValueError: for an unknown key
+    """
+    if key == 'correlation':
+        if property_type not in analytics.property_types:
+            return codes
+        scores = analytics.correlation[codes, analytics.property_types.index(property_type)]
+    elif key in SORT_KEYS:
+        kind, stat = key.split('_')
+        metric = metric_column(kind, property_type)
+        if metric not in analytics.cube.metric_codes:
+            return codes
+        scores = getattr(analytics, stat)[codes, analytics.cube.metric_codes[metric]]
+    else:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+
+    keys = -scores if descending else scores
+    return codes[np.argsort(np.where(np.isnan(keys), np.inf, keys), kind='stable')]
+
+
+def _row_correlation(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pearson correlation of each row pair of ``x`` and ``y`` over the columns where both are known."""
+    both = ~np.isnan(x) & ~np.isnan(y)
+    n = both.sum(axis=1)
+    x, y = np.where(both, x, 0.0), np.where(both, y, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dx = np.where(both, x - (x.sum(axis=1) / n)[:, None], 0.0)
+        dy = np.where(both, y - (y.sum(axis=1) / n)[:, None], 0.0)
+        r = (dx * dy).sum(axis=1) / np.sqrt((dx ** 2).sum(axis=1) * (dy ** 2).sum(axis=1))
+    r[(n < 3) | ~np.isfinite(r)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def _number(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _numbers(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else round(value, 2) for value in values.tolist()]
+
+
+def window_analytics(snapshot: DatasetSnapshot, start: Optional[int] = None, end: Optional[int] = None) -> LocalityAnalytics:
+    """Analytics over ``start..end``, computed once per window and snapshot."""
+    window = settings.ANALYTICS_ROLLING_WINDOW
+    if start is None and end is None:
+        return snapshot.derive(('analytics', window), lambda: LocalityAnalytics(snapshot.cube, window=window))
+    return snapshot.derive(
+        ('analytics', window, start, end),
+        lambda: LocalityAnalytics(snapshot.cube, snapshot.cube.year_mask(start, end), window)
+    )
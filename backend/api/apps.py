@@ -1,32 +1,48 @@
+import sys
+
 from django.apps import AppConfig
-import pandas as pd
-import os
+from django.conf import settings
+
+# Management commands that work on the dataset files directly: loading a
+# snapshot first would make them as slow as a worker start
+NO_SNAPSHOT_COMMANDS = ('ingest',)
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
     
-    # Global variable to store the DataFrame
-    real_estate_df = None
-    
     def ready(self):
-        """Load Excel file on startup"""
-        if ApiConfig.real_estate_df is None:
+        """Load the dataset snapshot on startup (memory-mapped from the columnar cache, or opened from SQLite)"""
+        from . import dataset
+
+        if sys.argv[1:2] and sys.argv[1] in NO_SNAPSHOT_COMMANDS:
+            return
+
+        source_path = str(settings.DATASET_PATH)
+        cache_dir = str(settings.DATASET_CACHE_DIR) if settings.DATASET_CACHE_DIR else None
+
+        if dataset.get_snapshot() is None:
             try:
-                # Get the path to the Excel file
-                base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                excel_path = os.path.join(base_dir, 'data', 'realestate.xlsx')
+                snapshot, _ = dataset.reload_snapshot(source_path, cache_dir, storage=settings.DATASET_STORAGE)
                 
-                # Load the Excel file
-                ApiConfig.real_estate_df = pd.read_excel(excel_path)
-                
-                # Clean column names (strip whitespace)
-                ApiConfig.real_estate_df.columns = ApiConfig.real_estate_df.columns.str.strip()
-                
-                print(f"✅ Successfully loaded real estate data with {len(ApiConfig.real_estate_df)} rows")
-                print(f"📊 Localities: {ApiConfig.real_estate_df['final location'].unique().tolist()}")
+                print(f"✅ Successfully loaded real estate data with {snapshot.rows} rows (version {snapshot.version}, {snapshot.store.kind} storage)")
+                print(f"📊 Localities: {snapshot.localities}")
             except Exception as e:
                 print(f"❌ Error loading Excel file: {e}")
-                # Create empty DataFrame if loading fails
-                ApiConfig.real_estate_df = pd.DataFrame()
+
+        # A preloading gunicorn master forks the workers later, and threads do
+        # not survive a fork: each worker starts its own (see gunicorn.conf.py)
+        if not settings.DATASET_WATCH_AFTER_FORK:
+            start_dataset_watcher()
+
+
+def start_dataset_watcher():
+    """Optionally pick up new versions of the workbook without a restart (once per process)."""
+    from . import dataset
+
+    if settings.DATASET_WATCH_INTERVAL > 0:
+        cache_dir = str(settings.DATASET_CACHE_DIR) if settings.DATASET_CACHE_DIR else None
+        dataset.start_watcher(
+            str(settings.DATASET_PATH), cache_dir, settings.DATASET_WATCH_INTERVAL, settings.DATASET_STORAGE
+        )
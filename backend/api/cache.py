@@ -0,0 +1,299 @@
+"""
+Caches: an in-process LRU, an adapter over Django's cache framework and a
+persistent SQLite store, plus single-flight call deduplication (threads and
+coroutines).
+
+The caches expose the same small interface (get/set/delete/clear/stats), so
+a backend can be chosen by a setting.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from django.core.cache import caches
+
+
+class LRUCache:
+    """
+    Thread-safe, bounded least-recently-used cache with hit/miss counters.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Size and hit/miss counters, e.g. for the health endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class DjangoCache:
+    """
+    ``LRUCache``-compatible adapter over a Django cache alias.
+
+    With a ``FileBasedCache`` or shared backend (memcached, redis) entries
+    survive restarts and are shared between workers. Keys must be strings.
+    """
+
+    def __init__(self, alias: str = 'default', timeout: Optional[int] = None):
+        self.alias = alias
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._cache.get(key, default)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._cache.set(key, value, self.timeout)
+
+    def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Hit/miss counters of this process (the backend's size is not known)."""
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.alias,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def make_cache(backend: str, maxsize: int = 1024, alias: str = 'default', timeout: Optional[int] = None):
+    """
+    Build a cache from settings.
+
+    ``backend`` is ``'memory'`` (per-process LRU), ``'django'`` (the Django
+    cache ``alias``) or ``'none'`` (caching disabled).
+    """
+    if backend == 'django':
+        return DjangoCache(alias, timeout)
+    if backend == 'none':
+        return LRUCache(0)
+    if backend != 'memory':
+        raise ValueError(f"Unknown cache backend {backend!r} (use 'memory', 'django' or 'none')")
+    return LRUCache(maxsize)
+
+
+class SQLiteCache:
+    """
+    Persistent string cache in a local SQLite file, with a time-to-live.
+
+    Safe to share between threads and worker processes (WAL mode); entries
+    survive restarts. ``path=''`` disables it.
+
+    Expired entries are never returned; ``set`` also deletes them from the
+    file (``purge``), at most once every ``purge_interval`` seconds per process.
+    """
+
+    def __init__(self, path: str, ttl: float, purge_interval: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.hits = 0
+        self.misses = 0
+        self.purged = 0
+        self._last_purge = 0.0
+        self._local = threading.local()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = sqlite3.connect(path, timeout=10)
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)')
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, never reused across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if not self.path:
+            return default
+        row = self._connect().execute(
+            'SELECT value FROM entries WHERE key = ? AND created >= ?', (key, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        if not self.path:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries (key, value, created) VALUES (?, ?, ?)', (key, value, now))
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            self.purge()
+
+    def delete(self, key: str) -> None:
+        if not self.path:
+            return
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def purge(self) -> int:
+        """Delete expired entries; returns how many were removed."""
+        if not self.path:
+            return 0
+        with self._connect() as conn:
+            removed = conn.execute('DELETE FROM entries WHERE created < ?', (time.time() - self.ttl,)).rowcount
+        self.purged += removed
+        return removed
+
+    def clear(self) -> None:
+        if not self.path:
+            return
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries')
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Hit/miss counters of this process."""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': bool(self.path),
+            'hits': self.hits,
+            'misses': self.misses,
+            'purged': self.purged,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one.
+
+    The first caller of ``do(key, fn)`` runs ``fn``; callers arriving while
+    it runs wait and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, '_Call'] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines.
+
+    The first ``await do(key, fn)`` on an event loop runs ``fn()`` as a task;
+    callers arriving on the same loop while it runs await that task. A
+    caller that gets cancelled does not cancel the shared call.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task_key = (asyncio.get_running_loop(), key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = self._tasks[task_key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
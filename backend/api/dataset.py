@@ -0,0 +1,450 @@
+"""
+Dataset loading with a columnar on-disk cache, and versioned snapshots.
+
+Reading the Excel workbook through openpyxl is the slowest part of startup and
+used to run again in every gunicorn worker. The first process converts the
+workbook into one ``.npy`` file per column; later processes memory-map those
+files instead, so they start quickly and share the same page-cache pages.
+
+With the ``sqlite`` storage backend the workbook is converted into an
+indexed SQLite file instead (see ``storage``), and rows are read from it on
+demand.
+
+The loaded data is published as an immutable ``DatasetSnapshot``. Reloads
+build the next snapshot off the request path and swap it in with a single
+reference assignment; requests keep using the snapshot they started with.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import LocalityAggregates
+from .geo import LocalityGeoIndex
+from .matcher import LocalityMatcher
+from .schema import normalize_dataframe
+from .storage import (
+    STORAGE_BACKENDS, MemoryStore, SQLiteStore, read_sqlite_meta, write_sqlite, write_sqlite_meta
+)
+
+# Bump whenever the on-disk layout changes so stale caches are rebuilt
+CACHE_FORMAT_VERSION = 2
+META_FILE = 'meta.json'
+
+
+def read_source(source_path: str) -> pd.DataFrame:
+    """Read the source workbook, clean column names and normalize the schema."""
+    df = pd.read_excel(source_path)
+    df.columns = df.columns.str.strip()
+    return normalize_dataframe(df)
+
+
+def file_fingerprint(path: str) -> Dict[str, int]:
+    """Cheap change detection: modification time and size."""
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def file_sha256(path: str) -> str:
+    """Content hash, used when the cheap fingerprint does not match."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path_for(source_path: str, cache_dir: str) -> str:
+    """Directory holding the columnar cache of one source file."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, stem)
+
+
+def _read_meta(cache_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(cache_path, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('format') != CACHE_FORMAT_VERSION:
+        return None
+    return meta
+
+
+def _write_meta(cache_path: str, meta: Dict[str, Any]) -> None:
+    # Write to a temp file and rename so readers never see a partial file
+    tmp_path = os.path.join(cache_path, f'{META_FILE}.tmp-{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(cache_path, META_FILE))
+
+
+def _is_fresh(meta: Dict[str, Any], source_path: str, save_meta: Callable[[Dict[str, Any]], None]) -> bool:
+    """
+    Check a cache against the source file.
+
+    Matching mtime/size is trusted as-is. Otherwise the content hash decides,
+    so a touched-but-unchanged workbook does not trigger a rebuild (the new
+    fingerprint is recorded with ``save_meta``).
+    """
+    fingerprint = file_fingerprint(source_path)
+    if meta['source'] == fingerprint:
+        return True
+    if meta['sha256'] != file_sha256(source_path):
+        return False
+    meta['source'] = fingerprint
+    try:
+        save_meta(meta)
+    except Exception:
+        pass
+    return True
+
+
+def write_cache(df: pd.DataFrame, source_path: str, cache_path: str) -> None:
+    """
+    Write ``df`` as a columnar cache directory.
+
+    Numeric columns are stored as raw ``.npy`` arrays. Everything else is
+    dictionary-encoded: ``int32`` codes on disk, distinct values in the meta
+    file. The cache is built in a temp directory and renamed into place, so
+    workers starting concurrently never read a half-written cache.
+    """
+    tmp_path = f'{cache_path}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            file_name = f'col_{i:03d}.npy'
+            entry = {'name': name, 'file': file_name, 'dtype': str(series.dtype)}
+
+            if series.dtype.kind in 'biufcmM':
+                np.save(os.path.join(tmp_path, file_name), np.ascontiguousarray(series.to_numpy()))
+                entry['kind'] = 'array'
+            else:
+                codes, uniques = pd.factorize(series)
+                np.save(os.path.join(tmp_path, file_name), codes.astype(np.int32))
+                entry['kind'] = 'dictionary'
+                entry['categories'] = list(uniques)
+
+            columns.append(entry)
+
+        _write_meta(tmp_path, {
+            'format': CACHE_FORMAT_VERSION,
+            'source': file_fingerprint(source_path),
+            'sha256': file_sha256(source_path),
+            'rows': len(df),
+            'columns': columns,
+        })
+
+        # Move any stale cache out of the way, then publish the new one
+        old_path = f'{cache_path}.old-{os.getpid()}'
+        if os.path.exists(cache_path):
+            os.rename(cache_path, old_path)
+        try:
+            os.rename(tmp_path, cache_path)
+        except OSError:
+            # Another worker published its cache first; use that one
+            pass
+        shutil.rmtree(old_path, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def read_cache(cache_path: str, meta: Dict[str, Any]) -> pd.DataFrame:
+    """Memory-map the cached columns into a DataFrame without copying them."""
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(cache_path, entry['file']), mmap_mode='r')
+        if entry['kind'] == 'dictionary':
+            categories = pd.Index(entry['categories'], dtype=object)
+            values = pd.Categorical.from_codes(values, categories)
+            if entry['dtype'] != 'category':
+                values = pd.Series(values.astype(object), dtype=entry['dtype'])
+        data[entry['name']] = values
+
+    # copy=False keeps the numeric columns backed by the read-only memmaps
+    return pd.DataFrame(data, copy=False)
+
+
+def load_dataset(source_path: str, cache_dir: Optional[str] = None) -> Tuple[pd.DataFrame, str]:
+    """
+    Load the real estate dataset, going through the columnar cache if enabled.
+
+    Any problem with the cache (unwritable directory, corrupt files, ...) falls
+    back to reading the workbook directly. Schema problems are not cache
+    problems: ``DatasetValidationError`` propagates to the caller.
+
+    Returns:
+        (DataFrame, sha256 of the source file)
+    """
+    if not cache_dir:
+        return read_source(source_path), file_sha256(source_path)
+
+    cache_path = cache_path_for(source_path, cache_dir)
+
+    try:
+        meta = _read_meta(cache_path)
+        if meta is not None and _is_fresh(meta, source_path, lambda meta: _write_meta(cache_path, meta)):
+            return read_cache(cache_path, meta), meta['sha256']
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable dataset cache {cache_path}: {e}")
+
+    df = read_source(source_path)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_cache(df, source_path, cache_path)
+        meta = _read_meta(cache_path)
+        if meta is not None:
+            return read_cache(cache_path, meta), meta['sha256']
+    except Exception as e:
+        print(f"⚠️ Could not write dataset cache {cache_path}: {e}")
+
+    return df, file_sha256(source_path)
+
+
+def sqlite_path_for(source_path: str, cache_dir: Optional[str] = None) -> str:
+    """SQLite file of one source file: in ``cache_dir``, or next to the source without a cache dir."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir or os.path.dirname(os.path.abspath(source_path)), f'{stem}.sqlite3')
+
+
+def ensure_sqlite(source_path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Path of the SQLite file of the dataset, converting the workbook first if
+    the file is missing or stale.
+
+    Once batches have been ingested into it, the file holds data the workbook
+    does not, so it is kept even when the workbook changes (delete it to
+    start over from the workbook).
+    """
+    path = sqlite_path_for(source_path, cache_dir)
+
+    try:
+        meta = read_sqlite_meta(path)
+        if meta is not None and _is_fresh(meta, source_path, lambda meta: write_sqlite_meta(path, meta)):
+            return path
+        if meta is not None and meta['batch']:
+            print(f"⚠️ {source_path} changed, but {path} has ingested batches; keeping it")
+            return path
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable dataset file {path}: {e}")
+
+    df = read_source(source_path)
+    sha256 = file_sha256(source_path)
+    write_sqlite(path, [df], {'source': file_fingerprint(source_path), 'sha256': sha256, 'version': sha256[:12]})
+    return path
+
+
+def load_sqlite_store(source_path: str, cache_dir: Optional[str] = None) -> Tuple[SQLiteStore, str]:
+    """
+    Open the SQLite file of the dataset (see ``ensure_sqlite``).
+
+    Returns:
+        (SQLiteStore, dataset version)
+    """
+    store = SQLiteStore(ensure_sqlite(source_path, cache_dir))
+    return store, store.version
+
+
+def load_store(source_path: str, cache_dir: Optional[str] = None, storage: str = 'memory'):
+    """
+    Load the dataset into a row store of the ``storage`` backend ('memory' or 'sqlite').
+
+    Returns:
+        (store, dataset version)
+    """
+    if storage not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown dataset storage {storage!r}; use one of: {', '.join(STORAGE_BACKENDS)}")
+    if storage == 'sqlite':
+        return load_sqlite_store(source_path, cache_dir)
+    df, sha256 = load_dataset(source_path, cache_dir)
+    return MemoryStore(df), sha256[:12]
+
+
+class DatasetSnapshot:
+    """
+    One immutable, versioned view of the dataset.
+
+    ``version`` is derived from the source file's content hash (and the
+    batches ingested since), so every worker that loaded the same data
+    reports the same version. Rows are read through ``store``
+    (``storage.MemoryStore`` or ``SQLiteStore``), whose data must be treated
+    as read-only; indexes derived from it are built here, once.
+
+    With a ``previous`` snapshot whose store ``store`` was updated from, only
+    the localities in ``store.changed`` are recomputed; derived structures
+    that know how to (an ``updated(cube, codes)`` method) are carried over
+    the same way, the others are rebuilt on first use.
+    """
+
+    __slots__ = (
+        'version', 'store', 'rows', 'cube', 'aggregates', 'matcher', 'geo', 'localities', 'sorted_localities',
+        'source_path', 'source_fingerprint', 'loaded_at', '_derived', '_derived_lock'
+    )
+
+    def __init__(
+        self,
+        version: str,
+        store,
+        source_path: str,
+        source_fingerprint: Dict[str, int],
+        previous: Optional['DatasetSnapshot'] = None
+    ):
+        self.version = version
+        self.store = store
+        self.rows = store.count()
+        self.cube = store.cube
+        self.localities = self.cube.localities
+        self.source_path = source_path
+        self.source_fingerprint = source_fingerprint
+        self.loaded_at = time.time()
+        self._derived: Dict[Any, Any] = {}
+        self._derived_lock = threading.RLock()
+
+        changed = getattr(store, 'changed', None)
+        if previous is None or changed is None:
+            self.aggregates = LocalityAggregates(self.cube)
+            self.matcher = LocalityMatcher(self.cube.localities)
+            self.geo = LocalityGeoIndex(self.cube)
+            self.sorted_localities = sorted(self.localities)
+            return
+
+        self.aggregates = previous.aggregates.updated(self.cube, changed)
+        self.geo = previous.geo.updated(self.cube, changed)
+        if len(self.localities) == len(previous.localities):
+            # Localities are only ever appended: same count, same names
+            self.matcher = previous.matcher
+            self.sorted_localities = previous.sorted_localities
+        else:
+            self.matcher = LocalityMatcher(self.cube.localities)
+            self.sorted_localities = sorted(self.localities)
+        for key, value in previous._derived.items():
+            updated = getattr(value, 'updated', None)
+            value = updated(self.cube, changed) if updated is not None else None
+            if value is not None:
+                self._derived[key] = value
+
+    def derive(self, key: Any, build: Callable[[], Any]) -> Any:
+        """
+        Memoize a structure derived from this snapshot.
+
+        ``build`` runs at most once per key; the result lives (and dies) with
+        the snapshot, so it is naturally cached per dataset version. ``build``
+        may itself derive other structures (the lock is reentrant).
+        """
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build()
+            return self._derived[key]
+
+    def updated(self) -> Optional['DatasetSnapshot']:
+        """This snapshot plus the batches ingested into its store since (None if there are none)."""
+        store = self.store.updated()
+        if store is None:
+            return None
+        return DatasetSnapshot(store.version, store, self.source_path, self.source_fingerprint, previous=self)
+
+    def __repr__(self):
+        return f'<DatasetSnapshot {self.version} rows={self.rows} storage={self.store.kind}>'
+
+
+def build_snapshot(source_path: str, cache_dir: Optional[str] = None, storage: str = 'memory') -> DatasetSnapshot:
+    """Load the dataset into a new snapshot. Does not publish it."""
+    fingerprint = file_fingerprint(source_path)
+    store, version = load_store(source_path, cache_dir, storage)
+    return DatasetSnapshot(version, store, source_path, fingerprint)
+
+
+# The published snapshot. Readers grab the reference once per request;
+# reloads replace it with one (atomic) assignment.
+_snapshot: Optional[DatasetSnapshot] = None
+_reload_lock = threading.Lock()
+_watcher: Optional[threading.Thread] = None
+
+# Fingerprint of the source file as last examined by a reload
+_seen_fingerprint: Optional[Dict[str, int]] = None
+
+
+def get_snapshot() -> Optional[DatasetSnapshot]:
+    """Return the current dataset snapshot (None if nothing has loaded yet)."""
+    return _snapshot
+
+
+def publish_snapshot(snapshot: DatasetSnapshot) -> None:
+    """Make ``snapshot`` the current one."""
+    global _snapshot, _seen_fingerprint
+    _seen_fingerprint = snapshot.source_fingerprint
+    _snapshot = snapshot
+
+
+def reload_snapshot(source_path: str, cache_dir: Optional[str] = None, force: bool = False, storage: str = 'memory') -> Tuple[DatasetSnapshot, bool]:
+    """
+    Build a snapshot of ``source_path`` and publish it if the data changed.
+
+    An unchanged workbook still picks up batches ingested into the store
+    since the current snapshot, applied incrementally. Concurrent reloads are serialized; requests are never blocked, they keep
+    reading whichever snapshot was current when they started.
+
+    Returns:
+        (current snapshot, whether a new snapshot was published)
+    """
+    global _seen_fingerprint
+
+    with _reload_lock:
+        current = _snapshot
+        unchanged_source = (
+            current is not None and current.source_path == source_path and current.store.kind == storage
+        )
+        if not force and unchanged_source and file_fingerprint(source_path) == _seen_fingerprint:
+            snapshot = current.updated()
+            if snapshot is None:
+                return current, False
+            publish_snapshot(snapshot)
+            return snapshot, True
+
+        snapshot = build_snapshot(source_path, cache_dir, storage)
+        if not force and unchanged_source and snapshot.version == current.version:
+            # Touched but identical file: keep serving the current snapshot
+            _seen_fingerprint = snapshot.source_fingerprint
+            return current, False
+
+        publish_snapshot(snapshot)
+        return snapshot, True
+
+
+def _watch(source_path: str, cache_dir: Optional[str], interval: float, storage: str) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            snapshot, changed = reload_snapshot(source_path, cache_dir, storage=storage)
+            if changed:
+                print(f"🔄 Reloaded real estate data: version {snapshot.version} with {snapshot.rows} rows")
+        except Exception as e:
+            print(f"❌ Error reloading dataset (keeping version "
+                  f"{_snapshot.version if _snapshot else None}): {e}")
+
+
+def start_watcher(source_path: str, cache_dir: Optional[str], interval: float, storage: str = 'memory') -> None:
+    """Poll the source file every ``interval`` seconds and hot-reload it when it changes."""
+    global _watcher
+    if _watcher is not None and _watcher.is_alive():
+        return
+    _watcher = threading.Thread(
+        target=_watch, args=(source_path, cache_dir, interval, storage),
+        name='dataset-watcher', daemon=True
+    )
+    _watcher.start()
@@ -0,0 +1,193 @@
+"""
+Vectorized execution of structured query intents.
+
+Intents (see ``utils.parse_query_intent``) can carry a year window, a
+property type and a ranking request. Everything here works on whole arrays
+of the snapshot's cube and aggregate tables, never row by row, so ranking
+every locality of a large multi-city dataset stays a few array operations.
+"""
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .aggregates import LocalityAggregates
+from .dataset import DatasetSnapshot
+
+PROPERTY_TYPES = ['flat', 'office', 'shop', 'others']
+
+# Most localities a "near X" or "like X" query adds to the analysis
+MAX_NEARBY_LOCALITIES = 10
+
+# How each property type reads in a sentence
+PROPERTY_LABELS = {
+    'flat': 'flat',
+    'office': 'office',
+    'shop': 'shop',
+    'others': 'other property',
+}
+
+
+def metric_column(kind: str, property_type: str = 'flat') -> str:
+    """Dataset column holding the ``price`` or ``demand`` metric of a property type."""
+    if kind == 'price':
+        return f'{property_type} - weighted average rate'
+    return f'{property_type}_sold - igr'
+
+
+def resolve_years(snapshot: DatasetSnapshot, years: Optional[Dict[str, int]]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Turn a parsed year filter into a concrete (start, end) window.
+
+    ``{'last': 3}`` means the three latest years in the dataset. Returns
+    (None, None) when there is no filter.
+    """
+    if not years:
+        return None, None
+
+    if 'last' in years:
+        available = snapshot.cube.years
+        if not len(available):
+            return None, None
+        last = max(1, years['last'])
+        return int(available[max(0, len(available) - last)]), int(available[-1])
+
+    return years.get('start'), years.get('end')
+
+
+def window_aggregates(snapshot: DatasetSnapshot, start: Optional[int], end: Optional[int]) -> LocalityAggregates:
+    """Per-locality aggregates over ``start..end``, materialized once per window and snapshot."""
+    if start is None and end is None:
+        return snapshot.aggregates
+    return snapshot.derive(
+        ('aggregates', start, end),
+        lambda: LocalityAggregates(snapshot.cube, snapshot.cube.year_mask(start, end))
+    )
+
+
+def rank_localities(
+    snapshot: DatasetSnapshot,
+    ranking: Dict[str, Any],
+    property_type: str = 'flat',
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    localities: Optional[List[str]] = None,
+    city: Optional[str] = None,
+) -> List[Tuple[str, Union[int, float]]]:
+    """
+    Rank localities by a metric over a year window.
+
+    Args:
+        ranking: {'by': 'price' | 'demand', 'measure': 'growth' | 'level' | 'total',
+                  'order': 'desc' | 'asc', 'limit': N}
+        localities: rank only these (default: every locality)
+        city: rank only localities of this city
+
+    Returns:
+        [(locality, score), ...] best first; localities without data are left out
+    """
+    cube = snapshot.cube
+    metric = metric_column(ranking['by'], property_type)
+    if metric not in cube.metric_codes:
+        return []
+
+    aggregates = window_aggregates(snapshot, start, end)
+    m = cube.metric_codes[metric]
+
+    measure = ranking.get('measure', 'level')
+    if measure == 'growth':
+        scores = aggregates.growth[:, m]
+    elif measure == 'total' and ranking['by'] == 'demand':
+        scores = aggregates.totals[:, m]
+    else:
+        scores = aggregates.last_values[:, m]
+
+    mask = aggregates.has_data & np.isfinite(scores)
+    if localities is not None:
+        selected = np.zeros(len(cube.localities), dtype=bool)
+        selected[[cube.locality_codes[name] for name in localities if name in cube.locality_codes]] = True
+        mask &= selected
+    if city is not None:
+        if city not in cube.cities:
+            return []
+        mask &= cube.locality_city == cube.cities.index(city)
+
+    candidates = np.flatnonzero(mask)
+    keys = scores[candidates] if ranking.get('order') == 'asc' else -scores[candidates]
+
+    limit = ranking.get('limit')
+    if limit is not None and limit < len(candidates):
+        # Partial selection first, then sort only the winners
+        top = np.argpartition(keys, limit - 1)[:limit]
+        top = top[np.argsort(keys[top], kind='stable')]
+    else:
+        top = np.argsort(keys, kind='stable')
+
+    # Levels and totals of count metrics stay whole numbers, as in the window aggregates
+    cast = int if measure != 'growth' and metric in cube.integer_metrics else float
+    return [(cube.localities[code], cast(scores[code])) for code in candidates[top]]
+
+
+def resolve_intent(intent: Dict[str, Any], snapshot: DatasetSnapshot) -> Dict[str, Any]:
+    """
+    Bind a parsed intent to a snapshot (in place).
+
+    Adds ``year_range`` ([start, end] or None). A ``nearby`` request appends
+    the first locality's nearest neighbours to ``localities`` (turning a
+    single analysis into a comparison) and lists them with their distances
+    in ``nearby_results``; a ``similar`` request does the same with the
+    localities most like it (``similar_results``). For rankings, fills ``localities`` with the winners
+    (among the neighbourhood, if any) and ``ranking_results`` with their scores. A ``forecast``
+    request gets its year and model filled in, and ``forecast_results`` projects every locality.
+    """
+    start, end = resolve_years(snapshot, intent.get('years'))
+    intent['year_range'] = [start, end] if (start, end) != (None, None) else None
+
+    nearby = intent.get('nearby')
+    if nearby and intent['localities']:
+        anchor = intent['localities'][0]
+        limit = min(nearby['limit'] or MAX_NEARBY_LOCALITIES, MAX_NEARBY_LOCALITIES)
+        neighbours = snapshot.geo.nearest(anchor, limit, nearby['radius_km'])
+        nearby['locality'] = anchor
+        intent['nearby_results'] = [
+            {'locality': name, 'distanceKm': round(distance, 2)} for name, distance in neighbours
+        ]
+        intent['localities'] = list(dict.fromkeys(intent['localities'] + [name for name, _ in neighbours]))
+        if intent['type'] == 'single' and len(intent['localities']) > 1:
+            intent['type'] = 'comparison'
+
+    similar = intent.get('similar')
+    if similar and intent['localities']:
+        # Imported here (as is .forecast): both are built on top of this module's helpers
+        from .similarity import locality_similarity
+
+        anchor = intent['localities'][0]
+        matches = locality_similarity(snapshot).similar(
+            anchor, min(similar['limit'], MAX_NEARBY_LOCALITIES), similar['metric'], intent.get('city')
+        )
+        similar['locality'] = anchor
+        intent['similar_results'] = [{'locality': name, 'score': round(score, 4)} for name, score in matches]
+        intent['localities'] = list(dict.fromkeys(intent['localities'] + [name for name, _ in matches]))
+        if intent['type'] == 'single' and len(intent['localities']) > 1:
+            intent['type'] = 'comparison'
+
+    if intent['type'] == 'ranking':
+        results = rank_localities(
+            snapshot, intent['ranking'], intent.get('property_type', 'flat'), start, end,
+            localities=intent['localities'] or None, city=intent.get('city')
+        )
+        intent['ranking_results'] = [{'locality': name, 'value': value} for name, value in results]
+        intent['localities'] = [name for name, _ in results]
+
+    forecast = intent.get('forecast')
+    if forecast and intent['localities'] and len(snapshot.cube.years):
+        from .forecast import locality_forecast, next_year
+
+        model = locality_forecast(snapshot, forecast['model'])
+        forecast['model'] = model.model
+        forecast['year'] = forecast['year'] or next_year(snapshot.cube, forecast['horizon'])
+        intent['forecast_results'] = [
+            model.locality_stats(name, forecast['year'], intent.get('property_type', 'flat'))
+            for name in intent['localities'] if name in snapshot.cube.locality_codes
+        ]
+
+    return intent
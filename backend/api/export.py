@@ -0,0 +1,131 @@
+"""
+Streamed exports of dataset slices.
+
+Exports are generated from chunks of rows read from the snapshot's store,
+so the server never holds more than one chunk's worth of rows or
+serialized output, whatever the size of the export.
+"""
+import io
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from .utils import dumps_line
+
+# Parquet support (optional)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+EXPORT_FORMATS = {
+    'csv': {'content_type': 'text/csv', 'extension': 'csv'},
+    'jsonl': {'content_type': 'application/x-ndjson', 'extension': 'jsonl'},
+    'parquet': {'content_type': 'application/vnd.apache.parquet', 'extension': 'parquet'},
+    'arrow': {'content_type': 'application/vnd.apache.arrow.stream', 'extension': 'arrows'},
+}
+
+ARROW_STREAM_TYPE = EXPORT_FORMATS['arrow']['content_type']
+
+
+def iter_csv(chunks: Iterable[pd.DataFrame], schema: pd.DataFrame) -> Iterator[str]:
+    """CSV text, a header then one piece per chunk of rows."""
+    yield schema.to_csv(index=False)
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=False)
+
+
+def iter_jsonl(chunks: Iterable[pd.DataFrame], schema: pd.DataFrame) -> Iterator[bytes]:
+    """JSON Lines, one row per line."""
+    for chunk in chunks:
+        for row in chunk.to_dict('records'):
+            yield dumps_line(row)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last ``drain``."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(chunks: Iterable[pd.DataFrame], schema: pd.DataFrame) -> Iterator[bytes]:
+    """Parquet file bytes, one row group per chunk of rows."""
+    sink = _ChunkSink()
+    schema = pa.Schema.from_pandas(schema, preserve_index=False)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_arrow(chunks: Iterable[pd.DataFrame], schema: pd.DataFrame) -> Iterator[bytes]:
+    """Arrow IPC stream bytes, one record batch per chunk of rows."""
+    sink = _ChunkSink()
+    schema = pa.Schema.from_pandas(schema, preserve_index=False)
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def arrow_ipc(df: pd.DataFrame, columns: List[str], metadata: Optional[Dict[str, bytes]] = None) -> bytes:
+    """``df[columns]`` as an Arrow IPC stream, with ``metadata`` on the schema."""
+    table = pa.Table.from_pandas(df[columns], preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def gzip_stream(chunks: Iterable) -> Iterator[bytes]:
+    """Gzip-compress a stream of str/bytes chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(chunks: Iterable[pd.DataFrame], schema: pd.DataFrame, format_type: str, gzip: bool = False) -> Iterator:
+    """
+    Serialize DataFrame ``chunks`` in ``format_type`` ('csv', 'jsonl', 'parquet' or 'arrow').
+
+    ``schema`` is an empty DataFrame with the exported columns and dtypes;
+    it provides the header/schema even when there are no rows.
+
+    Raises:
+        ValueError: for an unknown format, or parquet without pyarrow
+    """
+    if format_type == 'csv':
+        output = iter_csv(chunks, schema)
+    elif format_type == 'jsonl':
+        output = iter_jsonl(chunks, schema)
+    elif format_type in ('parquet', 'arrow'):
+        if not PYARROW_AVAILABLE:
+            raise ValueError(f'{format_type.capitalize()} export requires pyarrow (pip install pyarrow)')
+        output = (iter_parquet if format_type == 'parquet' else iter_arrow)(chunks, schema)
+    else:
+        raise ValueError(f'Invalid format. Use one of: {", ".join(EXPORT_FORMATS)}')
+
+    return gzip_stream(output) if gzip else output
@@ -0,0 +1,233 @@
+"""
+Next-year projections for every locality, fitted once per dataset snapshot.
+
+Each model reduces every (locality, metric) series of the cube to a level at
+the series' last year with data and a trend per year:
+
+- ``linear``: least-squares line through the known years
+- ``log_linear``: least-squares line through the log of the (positive)
+  values, i.e. constant compound growth
+- ``exponential``: Holt's exponential smoothing with a damped trend, which
+  weighs recent years more than old ones and flattens projections out
+
+The fits run over the whole ``(localities, years, metrics)`` array at once
+(closed-form sums for the regressions, one vectorized step per year for the
+smoothing), so projecting any locality to any year is a lookup.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .dataset import DatasetSnapshot
+from .engine import metric_column
+from .index import LocalityYearCube
+
+FORECAST_MODELS = ('linear', 'log_linear', 'exponential')
+
+
+class LocalityForecast:
+    """
+    Trend model of every series of a ``LocalityYearCube``.
+
+    Attributes (arrays indexed by locality code, then metric code):
+        model: one of ``FORECAST_MODELS``
+        smoothing: (level, trend, damping) factors of ``exponential``
+            (``FORECAST_SMOOTHING_LEVEL``, ``FORECAST_SMOOTHING_TREND``,
+            ``FORECAST_DAMPING``)
+        level: fitted value at ``origin`` (its log for ``log_linear``)
+        trend: fitted change per year (of the log for ``log_linear``)
+        origin: last year with data
+        last_values: actual value at ``origin``
+        observations: years with data used by the fit
+        nonnegative: series without negative values, whose projections are
+            floored at 0 (prices and units sold cannot go below it)
+
+    Series with fewer than two usable years have no trend, and their
+    projections are NaN.
+    """
+
+    PARAMETERS = ('level', 'trend', 'origin', 'last_values', 'observations', 'nonnegative')
+
+    def __init__(self, cube: LocalityYearCube, model: str = 'linear', smoothing: Optional[Tuple[float, float, float]] = None):
+        if model not in FORECAST_MODELS:
+            raise ValueError(f"model must be one of: {', '.join(FORECAST_MODELS)}")
+        self.smoothing = smoothing or (settings.FORECAST_SMOOTHING_LEVEL, settings.FORECAST_SMOOTHING_TREND, settings.FORECAST_DAMPING)
+        if not all(0 < factor <= 1 for factor in self.smoothing):
+            raise ValueError('smoothing and damping factors must be in (0, 1]')
+        self.cube = cube
+        self.model = model
+        for name, array in zip(self.PARAMETERS, self._fit(cube.values)):
+            setattr(self, name, array)
+
+    def _fit(self, values: np.ndarray) -> tuple:
+        """(level, trend, origin, last_values, observations, nonnegative) of each locality row of ``values``."""
+        years = self.cube.years.astype(np.float64)
+        n_localities, n_years, n_metrics = values.shape
+        localities = np.arange(n_localities)[:, None]
+        metrics = np.arange(n_metrics)[None, :]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            nonnegative = ~(values < 0).any(axis=1)
+            series = np.log(np.where(values > 0, values, np.nan)) if self.model == 'log_linear' else values
+            known = ~np.isnan(series)
+            observations = known.sum(axis=1)
+
+            if n_years:
+                last = n_years - 1 - np.argmax(known[:, ::-1, :], axis=1)
+                origin = np.where(observations > 0, years[last], np.nan)
+                last_values = np.where(observations > 0, values[localities, last, metrics], np.nan)
+            else:
+                origin = np.full((n_localities, n_metrics), np.nan)
+                last_values = origin.copy()
+
+            level, trend = _least_squares(series, known, years, observations, origin)
+            if self.model == 'exponential':
+                level, trend = _holt(series, known, years, trend, *self.smoothing)
+
+        enough = observations >= 2
+        level[~enough] = np.nan
+        trend[~enough] = np.nan
+        return level, trend, origin, last_values, observations, nonnegative
+
+    def updated(self, cube: LocalityYearCube, codes: np.ndarray) -> Optional['LocalityForecast']:
+        """
+        Forecast of ``cube``, an update of this one's cube where only the
+        localities ``codes`` changed (or were added), refitting just those.
+
+        None when the years changed (every fit would move).
+        """
+        if not np.array_equal(cube.years, self.cube.years):
+            return None
+        forecast = LocalityForecast.__new__(LocalityForecast)
+        forecast.cube, forecast.model, forecast.smoothing = cube, self.model, self.smoothing
+        stale = len(self.level)
+        for name, part in zip(self.PARAMETERS, forecast._fit(cube.values[codes])):
+            array = getattr(self, name)
+            # Room for new localities, which are always appended
+            extra = np.full((len(cube.localities) - stale,) + array.shape[1:], np.nan if array.dtype.kind == 'f' else 0, array.dtype)
+            array = np.concatenate([array, extra])
+            array[codes] = part
+            setattr(forecast, name, array)
+        return forecast
+
+    def predict(self, year: int, codes: Optional[np.ndarray] = None) -> np.ndarray:
+        """(localities, metrics) projections for ``year`` (NaN without a trend), of ``codes`` only if given."""
+        index = slice(None) if codes is None else codes
+        with np.errstate(over='ignore', invalid='ignore'):
+            steps = year - self.origin[index]
+            if self.model == 'exponential':
+                steps = _damped(steps, self.smoothing[2])
+            values = self.level[index] + self.trend[index] * steps
+            if self.model == 'log_linear':
+                values = np.exp(values)
+        return np.where(self.nonnegative[index], np.maximum(values, 0.0), values)
+
+    def change(self, year: int, codes: Optional[np.ndarray] = None) -> np.ndarray:
+        """(localities, metrics) change (%) from the last known value to the ``year`` projection."""
+        last_values = self.last_values if codes is None else self.last_values[codes]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (self.predict(year, codes) / last_values - 1) * 100
+        change[~np.isfinite(change)] = np.nan
+        return change
+
+    def stats(self, locality: str, metric: str, year: int) -> Dict[str, Any]:
+        """Last known value of ``metric`` for ``locality`` and its projection for ``year``."""
+        code, m = self.cube.locality_codes[locality], self.cube.metric_codes[metric]
+        last_year = self.origin[code, m]
+        return {
+            'lastYear': None if np.isnan(last_year) else int(last_year),
+            'last': _number(self.last_values[code, m]),
+            'forecast': _number(self.predict(year, code)[m]),
+            'change': _number(self.change(year, code)[m]),
+        }
+
+    def locality_stats(self, locality: str, year: int, property_type: str = 'flat') -> Dict[str, Any]:
+        """Price and demand projections of ``locality`` for a property type."""
+        result = {'locality': locality}
+        for kind in ('price', 'demand'):
+            metric = metric_column(kind, property_type)
+            result[kind] = self.stats(locality, metric, year) if metric in self.cube.metric_codes else None
+        return result
+
+
+def _least_squares(series: np.ndarray, known: np.ndarray, years: np.ndarray, observations: np.ndarray, origin: np.ndarray) -> tuple:
+    """Level at ``origin`` and slope of the least-squares line through each row's known years."""
+    x = np.where(known, years[None, :, None], 0.0)
+    y = np.where(known, series, 0.0)
+    mean_x = x.sum(axis=1) / observations
+    mean_y = y.sum(axis=1) / observations
+    dx = np.where(known, years[None, :, None] - mean_x[:, None, :], 0.0)
+    dy = np.where(known, series - mean_y[:, None, :], 0.0)
+    slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    return mean_y + slope * (origin - mean_x), slope
+
+
+def _damped(steps: np.ndarray, damping: float) -> np.ndarray:
+    """Years of trend a damped trend adds over ``steps`` years: damping + damping² + ... (``steps`` when undamped)."""
+    if damping >= 1:
+        return steps
+    return damping * (1 - damping ** steps) / (1 - damping)
+
+
+def _holt(series: np.ndarray, known: np.ndarray, years: np.ndarray, slope: np.ndarray, alpha: float, beta: float, damping: float) -> tuple:
+    """
+    Level (at the last known year) and trend of Holt's damped-trend smoothing of each row.
+
+    The level starts at the first known year, with ``slope`` (the
+    least-squares slope over all known years) as the initial trend, so one
+    early jump does not set the momentum. Gaps in a series are bridged by
+    the damped trend over the years skipped.
+    """
+    shape = (series.shape[0], series.shape[2])
+    level, trend, seen = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    for t, year in enumerate(years.tolist()):
+        value, has = series[:, t, :], known[:, t, :]
+        first = has & np.isnan(level)
+        update = has & ~np.isnan(level)
+
+        gap = year - seen
+        smoothed = alpha * value + (1 - alpha) * (level + trend * _damped(gap, damping))
+        smoothed_trend = beta * (smoothed - level) / gap + (1 - beta) * damping ** gap * trend
+
+        trend = np.where(first, slope, np.where(update, smoothed_trend, trend))
+        level = np.where(first, value, np.where(update, smoothed, level))
+        seen = np.where(has, year, seen)
+    return level, trend
+
+
+SORT_KEYS = ('price', 'demand', 'price_change', 'demand_change')
+
+
+def sort_localities(forecast: LocalityForecast, codes: np.ndarray, key: str, year: int, property_type: str = 'flat', descending: bool = True) -> np.ndarray:
+    """
+    Order locality ``codes`` by their ``year`` projection (one of ``SORT_KEYS``), unknown values last.
+
+    Raises:
+        ValueError: for an unknown key
+    """
+    if key not in SORT_KEYS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+    kind, _, change = key.partition('_')
+    metric = metric_column(kind, property_type)
+    if metric not in forecast.cube.metric_codes:
+        return codes
+    scores = (forecast.change(year, codes) if change else forecast.predict(year, codes))[:, forecast.cube.metric_codes[metric]]
+
+    keys = -scores if descending else scores
+    return codes[np.argsort(np.where(np.isnan(keys), np.inf, keys), kind='stable')]
+
+
+def next_year(cube: LocalityYearCube, horizon: int = 1) -> Optional[int]:
+    """The year ``horizon`` years after the dataset's last one (None without years)."""
+    return int(cube.years[-1]) + horizon if len(cube.years) else None
+
+
+def _number(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def locality_forecast(snapshot: DatasetSnapshot, model: Optional[str] = None) -> LocalityForecast:
+    """Fitted ``model`` (default ``FORECAST_MODEL``), computed once per snapshot."""
+    model = model or settings.FORECAST_MODEL
+    return snapshot.derive(('forecast', model), lambda: LocalityForecast(snapshot.cube, model))
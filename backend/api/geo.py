@@ -0,0 +1,212 @@
+"""
+Nearest-locality lookups over the dataset's ``loc_lat``/``loc_lng``.
+
+Coordinates become unit vectors on the sphere, where the straight-line
+(chord) distance orders points exactly like the great-circle (haversine)
+distance. A static KD-tree over those vectors, built once per dataset
+snapshot, answers k-nearest and within-radius queries by visiting a handful
+of leaves instead of scanning every locality.
+"""
+import heapq
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .index import LocalityYearCube
+from .schema import LATITUDE_COLUMN, LONGITUDE_COLUMN
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Localities per KD-tree leaf: distances within a leaf are one vectorized step
+LEAF_SIZE = 16
+
+
+def _unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    lat, lng = np.radians(latitudes), np.radians(longitudes)
+    return np.column_stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)])
+
+
+def _chord(km: float) -> float:
+    """Chord length (on the unit sphere) of a great-circle distance."""
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def _km(chord: np.ndarray) -> np.ndarray:
+    """Great-circle distance of chord lengths (on the unit sphere)."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+
+
+def first_known(cube: LocalityYearCube, metric: str) -> np.ndarray:
+    """First non-missing value of ``metric`` for every locality (NaN if it has none)."""
+    if metric not in cube.metric_codes:
+        return np.full(len(cube.localities), np.nan)
+    values = cube.values[:, :, cube.metric_codes[metric]]
+    if not values.shape[1]:
+        return np.full(len(cube.localities), np.nan)
+    first = np.argmax(~np.isnan(values), axis=1)
+    return values[np.arange(len(values)), first]
+
+
+class LocalityGeoIndex:
+    """
+    KD-tree over the coordinates of a ``LocalityYearCube``'s localities.
+
+    Each locality is placed at its first known ``loc_lat``/``loc_lng``;
+    localities without coordinates are left out of every result.
+
+    Attributes:
+        latitudes, longitudes: arrays indexed by locality code (NaN if unknown)
+    """
+
+    def __init__(self, cube: LocalityYearCube):
+        self.cube = cube
+        self.latitudes = first_known(cube, LATITUDE_COLUMN)
+        self.longitudes = first_known(cube, LONGITUDE_COLUMN)
+        codes = np.flatnonzero(np.isfinite(self.latitudes) & np.isfinite(self.longitudes))
+        points = _unit_vectors(self.latitudes[codes], self.longitudes[codes])
+
+        # Nodes cover contiguous slices of the reordered points; leaves have no children
+        order = np.arange(len(codes))
+        starts, ends = ([0], [len(codes)]) if len(codes) else ([], [])
+        lefts, rights = [-1] * len(starts), [-1] * len(starts)
+        lows, highs = [None] * len(starts), [None] * len(starts)
+        stack = list(range(len(starts)))
+        while stack:
+            node = stack.pop()
+            start, end = starts[node], ends[node]
+            segment = points[order[start:end]]
+            low, high = segment.min(axis=0), segment.max(axis=0)
+            lows[node], highs[node] = low.tolist(), high.tolist()
+            if end - start <= LEAF_SIZE:
+                continue
+            # Split the widest dimension at the median
+            dim = int(np.argmax(high - low))
+            middle = (start + end) // 2
+            order[start:end] = order[start:end][np.argpartition(segment[:, dim], middle - start)]
+            for child_start, child_end in ((start, middle), (middle, end)):
+                starts.append(child_start)
+                ends.append(child_end)
+                lefts.append(-1)
+                rights.append(-1)
+                lows.append(None)
+                highs.append(None)
+                stack.append(len(starts) - 1)
+            lefts[node], rights[node] = len(starts) - 2, len(starts) - 1
+
+        self._codes = codes[order]
+        self._points = points[order]
+        self._starts, self._ends = starts, ends
+        self._lefts, self._rights = lefts, rights
+        self._lows, self._highs = lows, highs
+
+    def __len__(self) -> int:
+        """Number of localities with coordinates."""
+        return len(self._codes)
+
+    def updated(self, cube: LocalityYearCube, codes: np.ndarray) -> 'LocalityGeoIndex':
+        """
+        Index of ``cube``, an update of this one's cube where only the
+        localities ``codes`` changed: this tree if their coordinates did not
+        move and no locality was added, a new one otherwise.
+        """
+        if len(cube.localities) == len(self.cube.localities):
+            latitudes = first_known(cube, LATITUDE_COLUMN)[codes]
+            longitudes = first_known(cube, LONGITUDE_COLUMN)[codes]
+            if (np.array_equal(latitudes, self.latitudes[codes], equal_nan=True)
+                    and np.array_equal(longitudes, self.longitudes[codes], equal_nan=True)):
+                index = LocalityGeoIndex.__new__(LocalityGeoIndex)
+                index.__dict__.update(self.__dict__)
+                index.cube = cube
+                return index
+        return LocalityGeoIndex(cube)
+
+    def coordinates(self, locality: str) -> Optional[Tuple[float, float]]:
+        """(latitude, longitude) of ``locality`` (None if unknown)."""
+        code = self.cube.locality_code(locality)
+        if code is None or not (np.isfinite(self.latitudes[code]) and np.isfinite(self.longitudes[code])):
+            return None
+        return float(self.latitudes[code]), float(self.longitudes[code])
+
+    def _search(self, point: np.ndarray, k: Optional[int], bound: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best-first search: the ``k`` (all if None) points nearest to ``point``
+        within chord ``bound``, as (positions into the leaf order, squared chords).
+        """
+        x, y, z = point.tolist()
+        limit = bound * bound
+        found_positions = np.empty(0, dtype=np.int64)
+        found_distances = np.empty(0)
+        heap = [(0.0, 0)] if self._starts else []
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > limit:
+                break
+            left = self._lefts[node]
+            if left < 0:
+                start, end = self._starts[node], self._ends[node]
+                differences = self._points[start:end] - point
+                distances = np.einsum('ij,ij->i', differences, differences)
+                keep = distances <= limit
+                found_positions = np.concatenate([found_positions, np.arange(start, end)[keep]])
+                found_distances = np.concatenate([found_distances, distances[keep]])
+                if k is not None and len(found_distances) >= k:
+                    nearest = np.argpartition(found_distances, k - 1)[:k]
+                    found_positions, found_distances = found_positions[nearest], found_distances[nearest]
+                    limit = min(limit, float(found_distances.max()))
+                continue
+            for child in (left, self._rights[node]):
+                # Squared distance from the point to the child's bounding box
+                (lx, ly, lz), (hx, hy, hz) = self._lows[child], self._highs[child]
+                dx = lx - x if x < lx else (x - hx if x > hx else 0.0)
+                dy = ly - y if y < ly else (y - hy if y > hy else 0.0)
+                dz = lz - z if z < lz else (z - hz if z > hz else 0.0)
+                box = dx * dx + dy * dy + dz * dz
+                if box <= limit:
+                    heapq.heappush(heap, (box, child))
+        order = np.argsort(found_distances, kind='stable')
+        return found_positions[order], found_distances[order]
+
+    def nearest_to(
+        self,
+        latitude: float,
+        longitude: float,
+        k: Optional[int] = 5,
+        radius_km: Optional[float] = None,
+        exclude: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Localities nearest to a point, closest first.
+
+        Args:
+            k: at most this many (all within ``radius_km`` if None)
+            radius_km: only localities at most this far
+            exclude: leave this locality out (e.g. the one at the point)
+
+        Returns:
+            [(locality, distance in km), ...]
+        """
+        if k is None and radius_km is None:
+            raise ValueError('Give a number of localities or a radius')
+        if k is not None and k < 1:
+            return []
+        point = _unit_vectors(np.array([latitude]), np.array([longitude]))[0]
+        excluded = self.cube.locality_code(exclude) if exclude is not None else None
+        wanted = None if k is None else k + (excluded is not None)
+        bound = _chord(radius_km) if radius_km is not None else 2.0
+
+        positions, distances = self._search(point, wanted, bound)
+        codes = self._codes[positions]
+        keep = codes != excluded if excluded is not None else np.ones(len(codes), dtype=bool)
+        codes, distances = codes[keep][:k], distances[keep][:k]
+        return [
+            (self.cube.localities[code], distance)
+            for code, distance in zip(codes.tolist(), _km(np.sqrt(distances)).tolist())
+        ]
+
+    def nearest(self, locality: str, k: Optional[int] = 5, radius_km: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Localities nearest to ``locality`` (itself excluded); empty if it has no coordinates."""
+        coordinates = self.coordinates(locality)
+        if coordinates is None:
+            return []
+        return self.nearest_to(*coordinates, k=k, radius_km=radius_km, exclude=locality)
@@ -0,0 +1,311 @@
+"""
+Dense locality × year × metric index, built once per dataset snapshot.
+
+Localities and years are mapped to integer codes and every numeric column is
+stored in one ``(localities, years, metrics)`` float array, so chart series,
+table slices and summaries are slice lookups instead of boolean masks over
+the whole DataFrame.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .schema import CITY_COLUMN, LOCALITY_COLUMN, YEAR_COLUMN
+
+
+def _whole(column: pd.Series) -> bool:
+    """Whether every known value of a numeric column is a whole number."""
+    values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+    known = values[~np.isnan(values)]
+    return bool(np.all(known == np.round(known)))
+
+
+class LocalityYearCube:
+    """
+    Index over a dataset DataFrame.
+
+    Attributes:
+        localities: locality names, in order of first appearance in the data
+        years: sorted array of all years in the data
+        metrics: numeric columns stored in ``values``
+        values: float64 array of shape (localities, years, metrics), NaN where
+            a locality has no row for a year
+        row_index: int64 array of shape (localities, years) with the DataFrame
+            position of each cell's row, -1 where missing
+        cities: city names; locality_city holds each locality's city code
+
+    ``positions`` gives the dataset position of each row of ``df`` when
+    ``df`` holds only some of the rows (by default, its own positions). When
+    ``df`` holds just the first row of each cell, ``rows`` gives the dataset
+    positions of every row, grouped by locality (see ``_group_rows``), so
+    ``locality_rows`` still lists repeated (locality, year) rows.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        positions: Optional[np.ndarray] = None,
+        rows: Optional[Tuple[List[str], np.ndarray, np.ndarray]] = None
+    ):
+        locality_codes, localities = pd.factorize(df[LOCALITY_COLUMN])
+        self.localities: List[str] = localities.tolist()
+        self.locality_codes: Dict[str, int] = {name: code for code, name in enumerate(self.localities)}
+
+        self.years = np.sort(df[YEAR_COLUMN].unique())
+        year_codes = np.searchsorted(self.years, df[YEAR_COLUMN].to_numpy())
+        self.year_codes: Dict[int, int] = {int(year): code for code, year in enumerate(self.years)}
+
+        self.metrics: List[str] = [
+            col for col in df.columns
+            if col != YEAR_COLUMN and pd.api.types.is_numeric_dtype(df[col])
+        ]
+        self.metric_codes: Dict[str, int] = {name: code for code, name in enumerate(self.metrics)}
+        self.integer_metrics = {col for col in self.metrics if pd.api.types.is_integer_dtype(df[col])}
+
+        shape = (len(self.localities), len(self.years))
+
+        # The first row wins when a (locality, year) repeats; fancy assignment
+        # leaves the winner among repeated indices unspecified, so pick it explicitly
+        cells = locality_codes.astype(np.int64) * shape[1] + year_codes
+        _, row_numbers = np.unique(cells, return_index=True)
+        self.row_index = np.full(shape, -1, dtype=np.int64)
+        self.row_index.reshape(-1)[cells[row_numbers]] = row_numbers
+
+        self.values = np.full(shape + (len(self.metrics),), np.nan)
+        present = self.row_index >= 0
+        if self.metrics:
+            self.values[present] = df[self.metrics].to_numpy(dtype=np.float64)[self.row_index[present]]
+        if positions is not None:
+            positions = np.asarray(positions, dtype=np.int64)
+            self.row_index[present] = positions[self.row_index[present]]
+
+        # City of each locality (from its first row)
+        self.cities: List[str] = []
+        self.locality_city = np.full(len(self.localities), -1, dtype=np.int64)
+        if CITY_COLUMN in df.columns:
+            city_codes, cities = pd.factorize(df[CITY_COLUMN])
+            self.cities = cities.tolist()
+            first_rows = np.unique(locality_codes, return_index=True)[1]
+            self.locality_city[locality_codes[first_rows]] = city_codes[first_rows]
+
+        # Row positions grouped by locality, ordered by year within each group
+        if rows is None:
+            order = np.lexsort((df[YEAR_COLUMN].to_numpy(), locality_codes))
+            self._rows_by_locality = order if positions is None else positions[order]
+            self._row_bounds = np.searchsorted(locality_codes[order], np.arange(len(self.localities) + 1))
+        else:
+            self._rows_by_locality = np.empty(0, dtype=np.int64)
+            self._row_bounds = np.zeros(len(self.localities) + 1, dtype=np.int64)
+            self._group_rows(*rows)
+
+    def _group_rows(self, localities: List[str], counts: np.ndarray, positions: np.ndarray) -> None:
+        """
+        Replace the row groups of ``localities`` and keep the others.
+
+        ``positions`` holds every dataset row of ``localities``: ``counts[i]``
+        rows of ``localities[i]`` after those of the localities before it, in
+        year order within each locality.
+
+        Kept groups are copied over in the stretches between the replaced
+        ones, so an update sorts nothing beyond ``localities``: the cost is one
+        copy of the positions plus a step per replaced locality.
+        """
+        codes = np.array([self.locality_codes[name] for name in localities], dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+        positions = np.asarray(positions, dtype=np.int64)
+        old_rows, old_bounds = self._rows_by_locality, self._row_bounds
+        if not len(old_rows):
+            # Nothing to keep (a cube built from scratch): one stable sort keeps each group in year order
+            grouped = np.repeat(codes, counts)
+            order = np.argsort(grouped, kind='stable')
+            self._rows_by_locality = positions[order]
+            self._row_bounds = np.searchsorted(grouped[order], np.arange(len(self.localities) + 1))
+            return
+
+        starts = np.concatenate([[0], np.cumsum(counts)])
+        n_old = len(old_bounds) - 1
+        sizes = np.zeros(len(self.localities), dtype=np.int64)
+        sizes[:n_old] = np.diff(old_bounds)
+        sizes[codes] = counts
+        bounds = np.zeros(len(self.localities) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=bounds[1:])
+
+        rows = np.empty(bounds[-1], dtype=np.int64)
+        kept = 0
+        for i in np.argsort(codes, kind='stable').tolist():
+            code = int(codes[i])
+            # Untouched groups before this one keep their size, so they move as one block
+            end = min(code, n_old)
+            if kept < end:
+                rows[bounds[kept]:bounds[end]] = old_rows[old_bounds[kept]:old_bounds[end]]
+            rows[bounds[code]:bounds[code + 1]] = positions[starts[i]:starts[i + 1]]
+            kept = max(kept, code + 1)
+        if kept < n_old:
+            rows[bounds[kept]:bounds[n_old]] = old_rows[old_bounds[kept]:old_bounds[n_old]]
+        self._rows_by_locality, self._row_bounds = rows, bounds
+
+    def updated(
+        self,
+        df: pd.DataFrame,
+        positions: np.ndarray,
+        rows: Tuple[List[str], np.ndarray, np.ndarray]
+    ) -> 'LocalityYearCube':
+        """
+        A new cube with the cells of ``df`` (at most one row per (locality,
+        year), at dataset ``positions``) added or replaced.
+
+        ``rows`` holds the dataset positions of every row of the localities in
+        ``df``, repeated cells included, grouped as ``_group_rows`` takes them.
+
+        New localities, cities and years extend the axes; every other cell is
+        carried over, so the cost is a copy of the arrays rather than a pass
+        over the dataset. This cube is left untouched.
+        """
+        cube = LocalityYearCube.__new__(LocalityYearCube)
+        cube.metrics, cube.metric_codes = self.metrics, self.metric_codes
+        # Integer columns stay integer unless the batch brings fractions
+        cube.integer_metrics = {
+            col for col in self.metrics
+            if pd.api.types.is_integer_dtype(df[col]) or (col in self.integer_metrics and _whole(df[col]))
+        }
+
+        names = df[LOCALITY_COLUMN].astype(object).to_numpy()
+        new_localities = [name for name in pd.unique(names) if name not in self.locality_codes]
+        cube.localities = self.localities + new_localities
+        cube.locality_codes = {**self.locality_codes, **{
+            name: code for code, name in enumerate(new_localities, len(self.localities))
+        }}
+        cube.years = np.union1d(self.years, df[YEAR_COLUMN].to_numpy()).astype(self.years.dtype)
+        cube.year_codes = {int(year): code for code, year in enumerate(cube.years)}
+
+        shape = (len(cube.localities), len(cube.years))
+        if shape == self.row_index.shape:
+            cube.row_index, cube.values = self.row_index.copy(), self.values.copy()
+        else:
+            # Old cells move to their place on the extended axes
+            old = (slice(0, len(self.localities)), np.searchsorted(cube.years, self.years))
+            cube.row_index = np.full(shape, -1, dtype=np.int64)
+            cube.row_index[old] = self.row_index
+            cube.values = np.full(shape + (len(self.metrics),), np.nan)
+            cube.values[old] = self.values
+
+        codes = np.array([cube.locality_codes[name] for name in names], dtype=np.int64)
+        year_codes = np.searchsorted(cube.years, df[YEAR_COLUMN].to_numpy())
+        cube.row_index[codes, year_codes] = positions
+        if self.metrics:
+            cube.values[codes, year_codes] = df[self.metrics].to_numpy(dtype=np.float64)
+
+        cube.cities = list(self.cities)
+        cube.locality_city = np.concatenate([self.locality_city, np.full(len(new_localities), -1, dtype=np.int64)])
+        if CITY_COLUMN in df.columns:
+            city_codes = {name: code for code, name in enumerate(cube.cities)}
+            for code, city in zip(codes.tolist(), df[CITY_COLUMN].astype(object).tolist()):
+                if cube.locality_city[code] < 0:
+                    if city not in city_codes:
+                        city_codes[city] = len(cube.cities)
+                        cube.cities.append(city)
+                    cube.locality_city[code] = city_codes[city]
+
+        # Row groups of the untouched localities carry over; the touched ones are replaced
+        cube._rows_by_locality, cube._row_bounds = self._rows_by_locality, self._row_bounds
+        cube._group_rows(*rows)
+        return cube
+
+    def locality_code(self, locality: str) -> Optional[int]:
+        """Integer code of ``locality`` (None if it is not in the data)."""
+        return self.locality_codes.get(locality)
+
+    def locality_rows(self, locality: str) -> np.ndarray:
+        """DataFrame positions of every row of ``locality``, sorted by year."""
+        code = self.locality_codes.get(locality)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self._rows_by_locality[self._row_bounds[code]:self._row_bounds[code + 1]]
+
+    def rows_for(self, localities: List[str]) -> np.ndarray:
+        """DataFrame positions of every row of ``localities``, in DataFrame order."""
+        if not localities:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([self.locality_rows(locality) for locality in localities]))
+
+    def year_mask(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """Boolean mask over ``years`` selecting ``start <= year <= end`` (open-ended if None)."""
+        mask = np.ones(len(self.years), dtype=bool)
+        if start is not None:
+            mask &= self.years >= start
+        if end is not None:
+            mask &= self.years <= end
+        return mask
+
+    def series(self, locality: str, metric: str) -> np.ndarray:
+        """Values of ``metric`` for ``locality`` across all years (NaN where missing)."""
+        return self.values[self.locality_codes[locality], :, self.metric_codes[metric]]
+
+    def matrix(self, localities: List[str], metric: str, year_mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Values of ``metric`` for many localities at once, shape (localities, years).
+
+        One fancy-indexing gather; unknown localities get an all-NaN row.
+        """
+        codes = np.array([self.locality_codes.get(locality, -1) for locality in localities], dtype=np.int64)
+        known = codes >= 0
+        result = self.values[np.where(known, codes, 0), :, self.metric_codes[metric]]
+        if year_mask is not None:
+            result = result[:, year_mask]
+        if not known.all():
+            result[~known] = np.nan
+        return result
+
+    def block(self, localities: List[str], metrics: List[str]) -> 'CubeBlock':
+        """Values of ``metrics`` for ``localities`` in one gather, to be sliced by many requests."""
+        return CubeBlock(self, localities, metrics)
+
+    def to_list(self, values: np.ndarray, metric: str) -> list:
+        """Convert a slice of ``metric`` values to JSON-ready Python values (None for NaN)."""
+        cast = int if metric in self.integer_metrics else float
+        return [None if math.isnan(value) else cast(value) for value in values.tolist()]
+
+    def to_array(self, values: np.ndarray, metric: str) -> np.ndarray:
+        """
+        Slice of ``metric`` values ready for ``renderers.dumps``.
+
+        Integer metrics without gaps become int64 arrays; everything else stays
+        float, where NaN serializes as null.
+        """
+        if metric in self.integer_metrics and not np.isnan(values).any():
+            return values.astype(np.int64)
+        return values
+
+
+class CubeBlock:
+    """
+    A (localities, years, metrics) slab of a cube, gathered once.
+
+    Answers ``series`` and ``matrix`` like the cube for any of its localities
+    and metrics, so a batch of requests over overlapping localities costs a
+    single gather.
+    """
+
+    def __init__(self, cube: LocalityYearCube, localities: List[str], metrics: List[str]):
+        self.localities = list(dict.fromkeys(localities))
+        self.positions: Dict[str, int] = {name: position for position, name in enumerate(self.localities)}
+        self.metric_positions: Dict[str, int] = {name: position for position, name in enumerate(metrics)}
+
+        codes = np.array([cube.locality_codes.get(locality, -1) for locality in self.localities], dtype=np.int64)
+        known = codes >= 0
+        metric_codes = np.array([cube.metric_codes[metric] for metric in metrics], dtype=np.int64)
+        self.values = cube.values[np.where(known, codes, 0)[:, None, None], np.arange(len(cube.years))[None, :, None], metric_codes]
+        if not known.all():
+            self.values[~known] = np.nan
+
+    def series(self, locality: str, metric: str) -> np.ndarray:
+        return self.values[self.positions[locality], :, self.metric_positions[metric]]
+
+    def matrix(self, localities: List[str], metric: str, year_mask: Optional[np.ndarray] = None) -> np.ndarray:
+        rows = np.array([self.positions[locality] for locality in localities], dtype=np.int64)
+        result = self.values[rows, :, self.metric_positions[metric]]
+        if year_mask is not None:
+            result = result[:, year_mask]
+        return result
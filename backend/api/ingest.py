@@ -0,0 +1,51 @@
+"""
+Incremental ingestion of CSV/Excel batches into the SQLite dataset file.
+
+A batch is read and normalized like the workbook, checked against the
+stored columns and written in one transaction (see ``storage.ingest_sqlite``).
+Workers apply the touched cells to their snapshot on their next reload check
+(``dataset.reload_snapshot``) instead of rebuilding it.
+"""
+import os
+from typing import Any, Dict, IO, Optional, Union
+
+import pandas as pd
+
+from .dataset import ensure_sqlite
+from .schema import normalize_dataframe
+from .storage import ingest_sqlite
+
+BATCH_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+
+def read_batch(file: Union[str, IO], name: Optional[str] = None) -> pd.DataFrame:
+    """
+    Read a CSV or Excel batch (a path, or a file object named ``name``) and normalize it.
+
+    Raises:
+        DatasetValidationError: listing every schema problem found
+        ValueError: for a file that is neither CSV nor Excel
+    """
+    extension = os.path.splitext(name or str(file))[1].lower()
+    if extension not in BATCH_EXTENSIONS:
+        raise ValueError(f"Unsupported batch file {name or file!r}; use one of: {', '.join(BATCH_EXTENSIONS)}")
+    df = pd.read_csv(file) if extension == '.csv' else pd.read_excel(file)
+    df.columns = df.columns.str.strip()
+    return normalize_dataframe(df)
+
+
+def ingest_batch(
+    file: Union[str, IO],
+    source_path: str,
+    cache_dir: Optional[str] = None,
+    mode: str = 'upsert',
+    name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Read a batch and add it to the SQLite file of the dataset at ``source_path``.
+
+    Returns:
+        ``storage.ingest_sqlite`` counts: inserted, updated, rows, batch, version
+    """
+    df = read_batch(file, name)
+    return ingest_sqlite(ensure_sqlite(source_path, cache_dir), df, mode)
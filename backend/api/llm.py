@@ -0,0 +1,223 @@
+"""
+OpenAI chat completions with pooled clients, deadlines, concurrency limits
+and a circuit breaker.
+
+Each process keeps one ``OpenAI`` client (and one ``AsyncOpenAI`` client
+per event loop), so HTTP connections are reused between requests. Every
+call has a deadline (``OPENAI_TIMEOUT``), at most ``OPENAI_MAX_CONCURRENCY``
+calls run at once, and after ``OPENAI_BREAKER_THRESHOLD`` failed or slow
+calls in a row the upstream is left alone for ``OPENAI_BREAKER_RESET``
+seconds. A call that cannot be made raises ``LLMUnavailable``, and callers
+fall back to the mock summary.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, Iterator, Optional
+
+from django.conf import settings
+
+# OpenAI integration (optional)
+try:
+    from openai import AsyncOpenAI, OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+
+class LLMUnavailable(Exception):
+    """The call was not made: the circuit is open or no call slot came free in time."""
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream after ``threshold`` failures in a row.
+
+    Calls slower than ``slow_call`` seconds count as failures even when they
+    return. Once open, calls are refused for ``reset_timeout`` seconds; then a
+    single trial call is let through (half-open), and its outcome closes or
+    reopens the circuit.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float, slow_call: Optional[float] = None):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.state = 'closed'
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; a True answer must be followed by ``record``."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, duration: Optional[float]) -> None:
+        """Record the outcome of an allowed call: its duration in seconds, or None if it failed."""
+        with self._lock:
+            failed = duration is None or (self.slow_call is not None and duration > self.slow_call)
+            if not failed:
+                self.state = 'closed'
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.threshold:
+                if self.state != 'open':
+                    self.trips += 1
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'state': self.state, 'failures': self.failures, 'trips': self.trips, 'rejected': self.rejected}
+
+
+breaker = CircuitBreaker(
+    settings.OPENAI_BREAKER_THRESHOLD, settings.OPENAI_BREAKER_RESET, settings.OPENAI_SLOW_CALL
+)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(settings.OPENAI_MAX_CONCURRENCY)
+
+
+def _client_options() -> Dict[str, Any]:
+    # The breaker decides when to try again, so the SDK does not retry on its own
+    return {'api_key': os.environ['OPENAI_API_KEY'], 'timeout': settings.OPENAI_TIMEOUT, 'max_retries': 0}
+
+
+def get_client() -> 'OpenAI':
+    """The process-wide OpenAI client (base URL from OPENAI_BASE_URL, e.g. a local stub)."""
+    global _client, _client_pid
+    with _client_lock:
+        # A client's connections must not be shared with a forked worker
+        if _client is None or _client_pid != os.getpid():
+            _client, _client_pid = OpenAI(**_client_options()), os.getpid()
+        return _client
+
+
+def _acquire_slot() -> None:
+    if not _slots.acquire(timeout=settings.OPENAI_QUEUE_TIMEOUT):
+        raise LLMUnavailable('Too many OpenAI calls in progress')
+    if not breaker.allow():
+        _slots.release()
+        raise LLMUnavailable('OpenAI circuit breaker is open')
+
+
+def complete(request: Dict[str, Any]) -> str:
+    """
+    Run a chat completion request and return the stripped message text.
+
+    Raises:
+        LLMUnavailable: the call was not made
+        Exception: whatever the OpenAI client raised (including timeouts)
+    """
+    _acquire_slot()
+    try:
+        start = time.monotonic()
+        try:
+            response = get_client().chat.completions.create(**request)
+        except Exception:
+            breaker.record(None)
+            raise
+        breaker.record(time.monotonic() - start)
+        return response.choices[0].message.content.strip()
+    finally:
+        _slots.release()
+
+
+def stream(request: Dict[str, Any]) -> Iterator[str]:
+    """
+    Run a chat completion request with ``stream=True`` and yield the text deltas.
+
+    The breaker judges the time to the first delta; ``OPENAI_TIMEOUT`` bounds
+    each wait for the next one.
+
+    Raises:
+        LLMUnavailable: the call was not made
+    """
+    _acquire_slot()
+    start = time.monotonic()
+    recorded = False
+    try:
+        for chunk in get_client().chat.completions.create(**request, stream=True):
+            if not recorded:
+                breaker.record(time.monotonic() - start)
+                recorded = True
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        if not recorded:
+            breaker.record(time.monotonic() - start)
+            recorded = True
+    finally:
+        # Failed, or abandoned before anything arrived
+        if not recorded:
+            breaker.record(None)
+        _slots.release()
+
+
+class _LoopState:
+    """Async client and call slots of one event loop."""
+
+    def __init__(self):
+        self.client = AsyncOpenAI(**_client_options())
+        self.slots = asyncio.BoundedSemaphore(settings.OPENAI_MAX_CONCURRENCY)
+
+
+_loop_states: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]' = weakref.WeakKeyDictionary()
+
+
+def _loop_state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _loop_states.get(loop)
+    if state is None:
+        state = _loop_states[loop] = _LoopState()
+    return state
+
+
+async def acomplete(request: Dict[str, Any]) -> str:
+    """
+    Async ``complete``: awaits the shared AsyncOpenAI client of the running
+    event loop, cancelling the call once ``OPENAI_TIMEOUT`` seconds have passed.
+
+    Raises:
+        LLMUnavailable: the call was not made
+        Exception: whatever the OpenAI client raised, or asyncio.TimeoutError
+    """
+    state = _loop_state()
+    try:
+        await asyncio.wait_for(state.slots.acquire(), settings.OPENAI_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise LLMUnavailable('Too many OpenAI calls in progress')
+
+    try:
+        if not breaker.allow():
+            raise LLMUnavailable('OpenAI circuit breaker is open')
+        start = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                state.client.chat.completions.create(**request), settings.OPENAI_TIMEOUT
+            )
+        except BaseException:
+            breaker.record(None)
+            raise
+        breaker.record(time.monotonic() - start)
+        return response.choices[0].message.content.strip()
+    finally:
+        state.slots.release()
+
+
+def stats() -> Dict[str, Any]:
+    """Circuit breaker state, for the health check."""
+    return {'breaker': breaker.stats(), 'max_concurrency': settings.OPENAI_MAX_CONCURRENCY}
@@ -0,0 +1,45 @@
+"""
+Append or upsert CSV/Excel batches into the SQLite dataset file.
+
+    DATASET_STORAGE=sqlite python manage.py ingest batch-2025.csv [--mode append]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...ingest import ingest_batch
+from ...schema import DatasetValidationError
+from ...storage import INGEST_MODES
+
+
+class Command(BaseCommand):
+    help = 'Append or upsert CSV/Excel batches into the SQLite dataset file (DATASET_STORAGE=sqlite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='CSV or Excel files with the dataset columns')
+        parser.add_argument(
+            '--mode', choices=INGEST_MODES, default='upsert',
+            help='upsert replaces existing locality/year rows, append adds every row (default: upsert)'
+        )
+
+    def handle(self, *args, **options):
+        if settings.DATASET_STORAGE != 'sqlite':
+            raise CommandError('Ingestion needs DATASET_STORAGE=sqlite; the memory backend only reloads the workbook')
+
+        source_path = str(settings.DATASET_PATH)
+        cache_dir = str(settings.DATASET_CACHE_DIR) if settings.DATASET_CACHE_DIR else None
+
+        for file in options['files']:
+            start = time.perf_counter()
+            try:
+                result = ingest_batch(file, source_path, cache_dir, options['mode'])
+            except (OSError, ValueError) as e:
+                # DatasetValidationError lists every schema problem of the batch
+                problems = e.problems if isinstance(e, DatasetValidationError) else [str(e)]
+                raise CommandError(f"{file}: " + '; '.join(problems))
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {file}: {result['inserted']} inserted, {result['updated']} updated in "
+                f"{time.perf_counter() - start:.2f}s (batch {result['batch']}, version {result['version']}, "
+                f"{result['rows']} rows)"
+            ))
@@ -0,0 +1,265 @@
+"""
+Locality matching for free-text queries.
+
+A ``LocalityMatcher`` is compiled once per dataset snapshot:
+
+- Names and aliases are normalized and folded to a rough phonetic key
+  ("Wakkad", "Vakad" and "wakad" all become "vakad"), then compiled into an
+  Aho-Corasick automaton, so exact and alias hits cost one pass over the
+  query regardless of how many localities there are.
+- Query words not covered by an exact hit fall back to a symmetric-delete
+  index (SymSpell-style) with a bounded edit distance, which catches typos
+  with a few dictionary lookups instead of comparing against every name.
+"""
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Common suffixes of Maharashtra locality names and how people abbreviate them
+SUFFIX_ABBREVIATIONS = {
+    'budruk': ['bk', 'bu', 'bud'],
+    'khurd': ['kh', 'khu'],
+}
+
+# Query words that must never fuzzy-match a locality
+STOPWORDS = {
+    'analyse', 'analyze', 'analysis', 'compare', 'comparison', 'between', 'versus',
+    'price', 'prices', 'pricing', 'rate', 'rates', 'cost', 'costs',
+    'demand', 'sales', 'sold', 'units', 'trend', 'trends', 'growth',
+    'show', 'give', 'tell', 'about', 'which', 'where', 'there', 'their',
+    'years', 'last', 'over', 'with', 'from', 'and', 'the', 'for',
+    'locality', 'localities', 'since', 'before', 'until', 'total', 'overall',
+    'highest', 'lowest', 'cheapest', 'bottom', 'ranking',
+    'flats', 'apartments', 'office', 'offices', 'shops', 'others',
+}
+
+MIN_FUZZY_LENGTH = 5
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_REPEATED = re.compile(r'([a-z])\1+')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse everything that is not a letter or digit into single spaces."""
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def fold(text: str) -> str:
+    """
+    Fold normalized text to a rough phonetic key.
+
+    Smooths over common transliteration differences: ee/i, oo/u, w/v, ph/f
+    and doubled letters.
+    """
+    text = text.replace('ee', 'i').replace('oo', 'u').replace('ph', 'f').replace('w', 'v')
+    return _REPEATED.sub(r'\1', text)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal-string-alignment distance between ``a`` and ``b``.
+
+    Returns ``limit + 1`` as soon as the distance is known to exceed ``limit``.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+_FOLDED_STOPWORDS = {fold(word) for word in STOPWORDS}
+
+
+def _deletes(key: str, distance: int) -> Set[str]:
+    """``key`` and every string obtained by deleting up to ``distance`` characters from it."""
+    variants = {key}
+    edge = {key}
+    for _ in range(distance):
+        edge = {word[:i] + word[i + 1:] for word in edge for i in range(len(word))} - variants
+        variants |= edge
+    return variants
+
+
+def _max_distance(key: str) -> int:
+    return 1 if len(key) < 9 else 2
+
+
+def generate_aliases(localities: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Aliases derived from the names themselves.
+
+    "Ambegaon Budruk" gets "Ambegaon Bk" etc., plus plain "Ambegaon" when no
+    other locality shares that base name.
+    """
+    aliases: Dict[str, List[str]] = {}
+    bases: Dict[str, List[str]] = {}
+
+    for locality in localities:
+        words = normalize_text(locality).split()
+        if len(words) > 1 and words[-1] in SUFFIX_ABBREVIATIONS:
+            base = ' '.join(words[:-1])
+            aliases.setdefault(locality, []).extend(
+                f'{base} {short}' for short in SUFFIX_ABBREVIATIONS[words[-1]]
+            )
+            bases.setdefault(base, []).append(locality)
+
+    known = {normalize_text(locality) for locality in localities}
+    for base, owners in bases.items():
+        if len(owners) == 1 and base not in known:
+            aliases[owners[0]].append(base)
+
+    return aliases
+
+
+class LocalityMatcher:
+    """Finds locality names (exact, alias or approximate) in query text."""
+
+    def __init__(self, localities: List[str], aliases: Optional[Dict[str, List[str]]] = None):
+        self.localities = list(localities)
+
+        # Folded key -> localities it names
+        self._keys: Dict[str, List[str]] = {}
+        all_aliases = generate_aliases(self.localities)
+        for locality, extra in (aliases or {}).items():
+            all_aliases.setdefault(locality, []).extend(extra)
+
+        for locality in self.localities:
+            for name in [locality] + all_aliases.get(locality, []):
+                key = fold(normalize_text(name))
+                if key:
+                    owners = self._keys.setdefault(key, [])
+                    if locality not in owners:
+                        owners.append(locality)
+
+        self._build_automaton()
+        self._build_fuzzy_index()
+
+    def _build_automaton(self) -> None:
+        """Compile all keys into an Aho-Corasick automaton (goto, fail and output tables)."""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for key in self._keys:
+            state = 0
+            for char in key:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(key)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _build_fuzzy_index(self) -> None:
+        """Map every deletion of every key, up to its allowed edit distance, back to the key."""
+        self._deletes: Dict[str, List[str]] = {}
+        self._word_counts: Set[int] = set()
+        for key in self._keys:
+            if len(key) < MIN_FUZZY_LENGTH:
+                continue
+            self._word_counts.add(key.count(' ') + 1)
+            for variant in _deletes(key, _max_distance(key)):
+                self._deletes.setdefault(variant, []).append(key)
+
+    def _exact_matches(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, key) of every whole-word key occurrence in folded ``text``."""
+        matches = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for key in self._output[state]:
+                start = end - len(key)
+                if (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' '):
+                    matches.append((start, end, key))
+        return matches
+
+    def _fuzzy_key(self, window: str) -> Optional[str]:
+        """Closest key within the allowed edit distance of ``window``, if any."""
+        limit = _max_distance(window)
+        best, best_distance = None, limit + 1
+        seen = set()
+        for variant in _deletes(window, limit):
+            for key in self._deletes.get(variant, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                distance = edit_distance(window, key, min(limit, _max_distance(key)))
+                if distance < best_distance:
+                    best, best_distance = key, distance
+        return best
+
+    def find(self, query: str) -> List[str]:
+        """Localities mentioned in ``query``, in the order they appear."""
+        text = fold(normalize_text(query))
+        if not text:
+            return []
+
+        # Leftmost-longest, non-overlapping exact hits
+        hits = []
+        covered_until = -1
+        for start, end, key in sorted(self._exact_matches(text), key=lambda m: (m[0], -(m[1] - m[0]))):
+            if start > covered_until:
+                hits.append((start, key))
+                covered_until = end
+
+        # Fuzzy fallback over runs of words not covered by an exact hit
+        covered = [False] * len(text)
+        for start, key in hits:
+            covered[start:start + len(key)] = [True] * len(key)
+
+        words = []
+        position = 0
+        for word in text.split(' '):
+            if not covered[position] and word not in _FOLDED_STOPWORDS:
+                words.append((position, word))
+            else:
+                words.append(None)
+            position += len(word) + 1
+
+        used = set()
+        for size in sorted(self._word_counts, reverse=True):
+            for i in range(len(words) - size + 1):
+                window_words = words[i:i + size]
+                if any(w is None or w[0] in used for w in window_words):
+                    continue
+                window = ' '.join(word for _, word in window_words)
+                if len(window) < MIN_FUZZY_LENGTH:
+                    continue
+                key = self._fuzzy_key(window)
+                if key is not None:
+                    hits.append((window_words[0][0], key))
+                    used.update(w[0] for w in window_words)
+
+        found = []
+        for _, key in sorted(hits):
+            for locality in self._keys[key]:
+                if locality not in found:
+                    found.append(locality)
+        return found
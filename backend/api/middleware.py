@@ -0,0 +1,145 @@
+"""
+Content-negotiated response compression, and static files for async
+middleware chains.
+"""
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+# Brotli support (optional)
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/vnd.apache.arrow.stream', 'text/',
+)
+
+_ETAG_SUFFIX = re.compile(r'-(br|gzip)"$')
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    """Whether ``coding`` is listed in Accept-Encoding without q=0."""
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip().lower() == coding:
+            return params.replace(' ', '').lower() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class CompressionMiddleware:
+    """
+    Compress API responses with brotli or gzip, as the client accepts.
+
+    Only responses of at least ``COMPRESSION_MIN_SIZE`` bytes are compressed;
+    streaming responses are left alone so they keep their time-to-first-byte.
+    Strong ETags get a ``-br``/``-gzip`` suffix, because each encoding is a
+    different representation; the suffix is stripped from If-None-Match
+    again before the view compares it. Works in sync and async middleware
+    chains.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tags = self._strip_etag_suffixes(request)
+        return self._process_response(request, self.get_response(request), tags)
+
+    async def __acall__(self, request):
+        tags = self._strip_etag_suffixes(request)
+        return self._process_response(request, await self.get_response(request), tags)
+
+    def _strip_etag_suffixes(self, request):
+        """The If-None-Match tags as sent, after removing their encoding suffixes from the request."""
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if not if_none_match:
+            return []
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        request.META['HTTP_IF_NONE_MATCH'] = ', '.join(_ETAG_SUFFIX.sub('"', tag) for tag in tags)
+        return tags
+
+    def _process_response(self, request, response, tags):
+        if response.status_code == 304:
+            # Hand back the ETag exactly as the client has it
+            etag = response.get('ETag')
+            if etag:
+                for tag in tags:
+                    if _ETAG_SUFFIX.sub('"', tag) == etag:
+                        response['ETag'] = tag
+                        break
+            return response
+
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+        if BROTLI_AVAILABLE and _accepts(accept_encoding, 'br'):
+            coding, content = 'br', brotli.compress(response.content, quality=5)
+        elif _accepts(accept_encoding, 'gzip'):
+            coding, content = 'gzip', gzip.compress(response.content, compresslevel=6, mtime=0)
+        else:
+            return response
+
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = coding
+
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = f'{etag[:-1]}-{coding}"'
+
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, usable in async middleware chains too.
+
+    WhiteNoise itself is sync-only; with it in the chain Django would run
+    every async view (/api/query/async/) through a thread under ASGI.
+    """
+
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
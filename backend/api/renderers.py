@@ -0,0 +1,134 @@
+"""
+Fast, NumPy-aware JSON serialization for API responses.
+
+With orjson installed, NumPy arrays and scalars are serialized natively
+(NaN becomes null), so views can return cube slices as arrays instead of
+converting them to Python lists first. Without orjson, the stdlib encoder
+does the same conversions, just more slowly; it also takes over values
+orjson rejects, such as integers past 64 bits.
+"""
+import json
+import math
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from rest_framework import exceptions
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson integration (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _array_to_list(array: np.ndarray) -> list:
+    """JSON-ready nested lists of ``array``, None for NaN."""
+    if array.dtype.kind == 'f':
+        values = array.astype(object)
+        values[np.isnan(array)] = None
+        return values.tolist()
+    return array.tolist()
+
+
+def _default(obj: Any, native_arrays: bool = False) -> Any:
+    """
+    Fallback conversions for values neither serializer handles itself.
+    
+    With ``native_arrays`` (orjson), numeric arrays stay arrays, made
+    contiguous; otherwise they become lists.
+    """
+    if isinstance(obj, np.ndarray):
+        # Non-contiguous or exotic dtypes
+        if obj.dtype.kind in 'biuf':
+            return np.ascontiguousarray(obj) if native_arrays else _array_to_list(obj)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return _default(obj.to_numpy(), native_arrays)
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _orjson_default(obj: Any) -> Any:
+    return _default(obj, native_arrays=True)
+
+
+class NumpyJSONEncoder(JSONEncoder):
+    """DRF's encoder plus NumPy/pandas values, for when orjson is not installed."""
+
+    def default(self, obj):
+        try:
+            return _default(obj)
+        except TypeError:
+            return super().default(obj)
+
+    def iterencode(self, obj, _one_shot=False):
+        # NaN floats anywhere become null, as with orjson
+        return super().iterencode(_replace_nan(obj), _one_shot)
+
+
+def _replace_nan(obj: Any) -> Any:
+    if isinstance(obj, float) and math.isnan(obj):
+        return None
+    if isinstance(obj, dict):
+        return {key: _replace_nan(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_nan(value) for value in obj]
+    return obj
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Serialize ``data`` to compact UTF-8 JSON.
+    
+    Values orjson rejects but the stdlib encoder accepts (integers past
+    64 bits, for one) make the whole value go through the stdlib encoder.
+    
+    Raises:
+        TypeError: for values neither encoder can serialize
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(data, default=_orjson_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(data, cls=NumpyJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class ORJSONRenderer(BaseRenderer):
+    """DRF renderer using ``dumps``; a drop-in replacement for ``JSONRenderer``."""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+class JSONFallbackNegotiation(DefaultContentNegotiation):
+    """
+    Content negotiation that renders JSON instead of answering 406.
+
+    Some views build their own non-JSON responses from the Accept header
+    (NDJSON, Arrow IPC); DRF has no renderer for those types and would
+    reject the request before the view runs.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except exceptions.NotAcceptable:
+            return renderers[0], renderers[0].media_type
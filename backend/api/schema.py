@@ -0,0 +1,131 @@
+"""
+Dataset schema: column names, load-time normalization and validation.
+
+All per-value cleaning happens here, once, when the dataset is loaded:
+numbers stored as text (``"1,234"``) are parsed, integer columns get the
+narrowest dtype that fits, locality/city become categoricals and the
+``... most prevailing rate - range`` strings are split into numeric
+``... - low`` / ``... - high`` columns. Problems are reported at startup
+instead of surfacing per request.
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+LOCALITY_COLUMN = 'final location'
+YEAR_COLUMN = 'year'
+CITY_COLUMN = 'city'
+LATITUDE_COLUMN = 'loc_lat'
+LONGITUDE_COLUMN = 'loc_lng'
+
+CATEGORICAL_COLUMNS = [LOCALITY_COLUMN, CITY_COLUMN]
+
+# Columns the API cannot work without
+REQUIRED_COLUMNS = [
+    LOCALITY_COLUMN, YEAR_COLUMN, CITY_COLUMN,
+    'total_sales - igr', 'total sold - igr',
+    'flat_sold - igr', 'flat - weighted average rate',
+]
+
+RANGE_SUFFIX = ' - range'
+
+
+class DatasetValidationError(ValueError):
+    """The dataset does not match the expected schema."""
+
+    def __init__(self, problems: List[str]):
+        self.problems = problems
+        super().__init__('Invalid dataset: ' + '; '.join(problems))
+
+
+def _parse_numbers(series: pd.Series, column: str, problems: List[str]) -> pd.Series:
+    """Parse a text column like ``"1,234"`` into numbers, recording unparseable cells."""
+    text = series.astype(str).str.replace(',', '', regex=False).str.strip()
+    numbers = pd.to_numeric(text.where(series.notna()), errors='coerce')
+    bad = series.notna() & numbers.isna()
+    if bad.any():
+        problems.append(
+            f"column '{column}' has {int(bad.sum())} non-numeric value(s), "
+            f"e.g. {series[bad].iloc[0]!r} in sheet row {bad.idxmax() + 2}"
+        )
+    return numbers
+
+
+def _narrow(series: pd.Series) -> pd.Series:
+    """
+    Downcast whole-number columns to the smallest integer dtype that fits.
+
+    Fractional columns stay float64: float32 would shift the rupee values
+    shown with two decimals.
+    """
+    if series.isna().any():
+        return series
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy()
+        if not (np.isfinite(values).all() and np.array_equal(values, np.floor(values))):
+            return series
+    return pd.to_numeric(series.astype(np.int64), downcast='integer')
+
+
+def _split_range(series: pd.Series, column: str, problems: List[str]):
+    """Split ``"8216-9081"`` strings into numeric low/high Series."""
+    parts = series.astype(str).str.replace(',', '', regex=False).str.extract(r'^\s*(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*$')
+    low = pd.to_numeric(parts[0], errors='coerce')
+    high = pd.to_numeric(parts[1], errors='coerce')
+    bad = series.notna() & (low.isna() | high.isna())
+    if bad.any():
+        problems.append(
+            f"column '{column}' has {int(bad.sum())} malformed range(s), "
+            f"e.g. {series[bad].iloc[0]!r} in sheet row {bad.idxmax() + 2}"
+        )
+    return _narrow(low), _narrow(high)
+
+
+def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return a typed, compact copy of a freshly read dataset.
+
+    Raises:
+        DatasetValidationError: listing every problem found
+    """
+    problems = []
+
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise DatasetValidationError([f"missing column(s): {', '.join(missing)}"])
+
+    result = {}
+    for column in df.columns:
+        series = df[column]
+
+        if column in CATEGORICAL_COLUMNS:
+            values = series.astype(str).str.strip().where(series.notna())
+            if values.isna().any():
+                problems.append(f"column '{column}' has {int(values.isna().sum())} empty value(s)")
+            result[column] = values.astype('category')
+
+        elif column.endswith(RANGE_SUFFIX):
+            prefix = column[:-len(RANGE_SUFFIX)]
+            result[f'{prefix} - low'], result[f'{prefix} - high'] = _split_range(series, column, problems)
+
+        elif pd.api.types.is_numeric_dtype(series):
+            result[column] = _narrow(series)
+
+        else:
+            result[column] = _narrow(_parse_numbers(series, column, problems))
+
+    normalized = pd.DataFrame(result)
+
+    year = normalized[YEAR_COLUMN]
+    if year.isna().any() or not pd.api.types.is_integer_dtype(year):
+        problems.append(f"column '{YEAR_COLUMN}' must contain a whole-number year in every row")
+
+    if problems:
+        raise DatasetValidationError(problems)
+
+    duplicates = normalized.duplicated([LOCALITY_COLUMN, YEAR_COLUMN]).sum()
+    if duplicates:
+        print(f"⚠️ Dataset has {duplicates} duplicate locality/year row(s); the first one is used for charts")
+
+    return normalized
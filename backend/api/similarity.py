@@ -0,0 +1,162 @@
+"""
+"Which localities are like Aundh?": nearest neighbours in a feature space.
+
+Every locality gets one feature vector per dataset snapshot: price levels,
+price and demand growth, demand, the sales mix across property types and
+supply. Features are standardized, and each group is weighted to count as
+much as any other, so four price columns do not outvote one demand column.
+With the row norms cached, a top-k query is one matrix-vector product and a
+partial sort over all localities.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .analytics import LocalityAnalytics, window_analytics
+from .dataset import DatasetSnapshot
+from .engine import PROPERTY_TYPES, metric_column
+from .index import LocalityYearCube
+
+SIMILARITY_METRICS = ('cosine', 'euclidean')
+
+TOTAL_SOLD_COLUMN = 'total sold - igr'
+SUPPLY_COLUMNS = ['total units', 'total carpet area supplied (sqft)']
+
+
+def _yearly_mean(cube: LocalityYearCube, metric: str) -> np.ndarray:
+    """Mean of ``metric`` over the years each locality has it (NaN if none)."""
+    values = cube.values[:, :, cube.metric_codes[metric]]
+    known = ~np.isnan(values)
+    counts = known.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, np.where(known, values, 0.0).sum(axis=1) / counts, np.nan)
+
+
+def _standardize(column: np.ndarray) -> np.ndarray:
+    """z-scores over the known values; unknown values (and constant columns) become 0, the mean."""
+    known = np.isfinite(column)
+    if known.sum() < 2:
+        return np.zeros(len(column))
+    mean, std = column[known].mean(), column[known].std()
+    if std == 0:
+        return np.zeros(len(column))
+    return np.where(known, (column - mean) / std, 0.0)
+
+
+class LocalitySimilarity:
+    """
+    Standardized feature matrix over a ``LocalityYearCube``, with top-k search.
+
+    Attributes:
+        features: feature names, one per column of ``matrix``
+        groups: feature group of each column (price, growth, demand, mix, supply)
+        matrix: float32 array (localities, features)
+        norms, squared_norms: row norms of ``matrix``, cached for the searches
+        has_data: localities with any row (the only ones ever returned)
+    """
+
+    def __init__(self, cube: LocalityYearCube, analytics: LocalityAnalytics):
+        self.cube = cube
+        columns: Dict[str, List[Tuple[str, np.ndarray]]] = {'price': [], 'growth': [], 'demand': [], 'mix': [], 'supply': []}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for property_type in PROPERTY_TYPES:
+                metric = metric_column('price', property_type)
+                if metric in cube.metric_codes:
+                    price = _yearly_mean(cube, metric)
+                    columns['price'].append((f'{property_type} price', np.log(np.where(price > 0, price, np.nan))))
+
+            growth = [(metric_column('price', 'flat'), 'flat price growth'), (TOTAL_SOLD_COLUMN, 'demand growth')]
+            for metric, name in growth:
+                if metric in cube.metric_codes:
+                    columns['growth'].append((name, analytics.cagr[:, cube.metric_codes[metric]]))
+
+            if TOTAL_SOLD_COLUMN in cube.metric_codes:
+                columns['demand'].append(('demand', np.log1p(np.maximum(_yearly_mean(cube, TOTAL_SOLD_COLUMN), 0))))
+
+            # Share of each property type in the units sold over all years
+            sold = {
+                property_type: np.nansum(cube.values[:, :, cube.metric_codes[metric_column('demand', property_type)]], axis=1)
+                for property_type in PROPERTY_TYPES if metric_column('demand', property_type) in cube.metric_codes
+            }
+            if sold:
+                total = sum(sold.values())
+                for property_type, units in sold.items():
+                    columns['mix'].append((f'{property_type} share', np.where(total > 0, units / total, np.nan)))
+
+            for metric in SUPPLY_COLUMNS:
+                if metric in cube.metric_codes:
+                    columns['supply'].append((metric, np.log1p(np.maximum(_yearly_mean(cube, metric), 0))))
+
+        self.features: List[str] = []
+        self.groups: List[str] = []
+        matrix = []
+        for group, group_columns in columns.items():
+            for name, column in group_columns:
+                # Every group weighs the same, however many columns it has
+                matrix.append(_standardize(column) / np.sqrt(len(group_columns)))
+                self.features.append(name)
+                self.groups.append(group)
+
+        n_localities = len(cube.localities)
+        self.matrix = (np.column_stack(matrix) if matrix else np.zeros((n_localities, 0))).astype(np.float32)
+        self.norms = np.linalg.norm(self.matrix, axis=1)
+        self.squared_norms = self.norms ** 2
+        self.has_data = (cube.row_index >= 0).any(axis=1)
+
+    def similar(
+        self,
+        locality: str,
+        k: int = 5,
+        metric: str = 'cosine',
+        city: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        The ``k`` localities most like ``locality`` (itself excluded), most similar first.
+
+        Args:
+            metric: 'cosine' (score is the cosine similarity, higher is closer)
+                or 'euclidean' (score is the distance, lower is closer)
+            city: only localities of this city
+
+        Returns:
+            [(locality, score), ...]; empty for an unknown locality
+
+        Raises:
+            ValueError: for an unknown metric
+        """
+        if metric not in SIMILARITY_METRICS:
+            raise ValueError(f"metric must be one of: {', '.join(SIMILARITY_METRICS)}")
+        code = self.cube.locality_code(locality)
+        if code is None or k < 1:
+            return []
+
+        dots = self.matrix @ self.matrix[code]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if metric == 'cosine':
+                scores = dots / (self.norms * self.norms[code])
+                scores[~np.isfinite(scores)] = 0.0
+                keys = -scores
+            else:
+                scores = np.sqrt(np.maximum(self.squared_norms + self.squared_norms[code] - 2 * dots, 0))
+                keys = scores
+
+        candidates = self.has_data.copy()
+        candidates[code] = False
+        if city is not None:
+            if city not in self.cube.cities:
+                return []
+            candidates &= self.cube.locality_city == self.cube.cities.index(city)
+        keys = np.where(candidates, keys, np.inf)
+
+        k = min(k, int(candidates.sum()))
+        if not k:
+            return []
+        top = np.argpartition(keys, k - 1)[:k]
+        top = top[np.argsort(keys[top], kind='stable')]
+        return [(self.cube.localities[code], float(scores[code])) for code in top.tolist()]
+
+
+def locality_similarity(snapshot: DatasetSnapshot) -> LocalitySimilarity:
+    """The feature matrix of a snapshot, built once per dataset version."""
+    return snapshot.derive('similarity', lambda: LocalitySimilarity(snapshot.cube, window_analytics(snapshot)))
@@ -0,0 +1,554 @@
+"""
+Row storage backends behind a dataset snapshot.
+
+The cube (``index.LocalityYearCube``) answers charts, summaries and
+analytics; a store answers everything that needs the rows themselves: row
+counts, table pages and exports. Two backends share one interface:
+
+- ``MemoryStore`` keeps the rows in a DataFrame (memory-mapped from the
+  columnar cache) and selects them through the cube's row index.
+- ``SQLiteStore`` keeps the rows in an indexed SQLite file. Filters, counts
+  and paging run as SQL, and the per-(locality, year) rows the cube is built
+  from come out of one ``GROUP BY``, so a worker never holds the full table.
+  Pages of the file are shared through the OS page cache by every worker.
+
+Rows always come back in dataset order (the order of the source rows).
+
+A SQLite file also takes batches of new rows (``ingest_sqlite``) without
+being rebuilt. Each batch records the (locality, year) cells it touched in a
+``changes`` table, and ``SQLiteStore.updated`` applies just those cells to
+the cube of an open store.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from .index import LocalityYearCube
+from .schema import CITY_COLUMN, LOCALITY_COLUMN, YEAR_COLUMN, DatasetValidationError
+
+STORAGE_BACKENDS = ('memory', 'sqlite')
+
+# Bump whenever the SQLite layout changes so stale files are rebuilt
+SQLITE_FORMAT_VERSION = 2
+SQLITE_TABLE = 'rows'
+SQLITE_CHANGES_TABLE = 'changes'
+
+# upsert: replace the row of each (locality, year) already present; append: add every row
+INGEST_MODES = ('upsert', 'append')
+
+# Rows per INSERT batch / per fetch when streaming out of SQLite
+SQLITE_CHUNK_ROWS = 50_000
+
+
+class MemoryStore:
+    """Rows held in a DataFrame, selected through the cube's row index."""
+
+    kind = 'memory'
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.cube = LocalityYearCube(df)
+        self.columns: List[str] = list(df.columns)
+        # Empty frame with the column dtypes, e.g. for export schemas
+        self.schema = df.iloc[:0]
+
+    def updated(self) -> None:
+        """Rows in memory only change by reloading the workbook."""
+        return None
+
+    def _positions(self, localities: Optional[List[str]], year_range: Optional[List[int]]) -> Optional[np.ndarray]:
+        """Row positions of the selection, or None for every row."""
+        positions = None if localities is None else self.cube.rows_for(localities)
+        if year_range and (year_range[0] is not None or year_range[1] is not None):
+            start, end = year_range
+            if positions is None:
+                positions = np.arange(len(self.df), dtype=np.int64)
+            years = self.df[YEAR_COLUMN].to_numpy()[positions]
+            mask = np.ones(len(positions), dtype=bool)
+            if start is not None:
+                mask &= years >= start
+            if end is not None:
+                mask &= years <= end
+            positions = positions[mask]
+        return positions
+
+    def count(self, localities: Optional[List[str]] = None, year_range: Optional[List[int]] = None) -> int:
+        """Number of rows of ``localities`` (all if None) within ``year_range``."""
+        positions = self._positions(localities, year_range)
+        return len(self.df) if positions is None else len(positions)
+
+    def rows(
+        self,
+        localities: Optional[List[str]] = None,
+        year_range: Optional[List[int]] = None,
+        columns: Optional[List[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> pd.DataFrame:
+        """``columns`` (all if None) of the selected rows, ``offset`` rows skipped, at most ``limit``."""
+        positions = self._positions(localities, year_range)
+        return self._take(positions, offset, None if limit is None else offset + limit, columns)
+
+    def iter_rows(
+        self,
+        localities: Optional[List[str]] = None,
+        year_range: Optional[List[int]] = None,
+        columns: Optional[List[str]] = None,
+        chunk_size: int = 10_000,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Iterator[pd.DataFrame]:
+        """The selected rows (``offset`` rows skipped, at most ``limit``) as DataFrames of at most ``chunk_size`` rows."""
+        positions = self._positions(localities, year_range)
+        total = len(self.df) if positions is None else len(positions)
+        end = total if limit is None else min(total, offset + limit)
+        for start in range(offset, end, chunk_size):
+            yield self._take(positions, start, min(start + chunk_size, end), columns)
+
+    def _take(self, positions: Optional[np.ndarray], start: int, end: Optional[int], columns: Optional[List[str]]) -> pd.DataFrame:
+        # Rows first, so only the selected rows of ``columns`` are copied
+        df = self.df.iloc[start:end] if positions is None else self.df.iloc[positions[start:end]]
+        return df if columns is None else df[columns]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(dtype) -> str:
+    kind = np.dtype(dtype).kind if not isinstance(dtype, pd.CategoricalDtype) else 'O'
+    if kind in 'biu':
+        return 'INTEGER'
+    if kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+
+def _numpy_dtype(dtype: str) -> np.dtype:
+    """NumPy dtype holding values of a stored pandas dtype (object for categories and strings)."""
+    try:
+        dtype = np.dtype(dtype)
+    except TypeError:
+        return np.dtype(object)
+    return dtype if dtype.kind in 'biuf' else np.dtype(object)
+
+
+def _records(df: pd.DataFrame) -> Iterator[tuple]:
+    """Rows of ``df`` as tuples of plain Python values (None for missing)."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def read_sqlite_meta(path: str) -> Optional[Dict[str, Any]]:
+    """Metadata stored in a SQLite dataset file (None if missing or of another format)."""
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'meta'").fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    meta = json.loads(row[0]) if row else None
+    if meta is None or meta.get('format') != SQLITE_FORMAT_VERSION:
+        return None
+    return meta
+
+
+def write_sqlite_meta(path: str, meta: Dict[str, Any]) -> None:
+    with sqlite3.connect(path, timeout=10) as conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('meta', ?)", (json.dumps(meta),))
+    conn.close()
+
+
+def write_sqlite(path: str, frames: Iterable[pd.DataFrame], meta: Dict[str, Any]) -> None:
+    """
+    Write the rows of ``frames`` (same columns, in dataset order) as a SQLite dataset file.
+
+    The column names and dtypes come from the first frame and are stored with
+    ``meta``, which must hold the dataset ``version``. Like the columnar cache, the file is built under a temp name and
+    renamed into place, so workers never open a half-written file.
+    """
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        # Nothing to recover from if the build dies half-way: skip the journal
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+
+        columns, rows = None, 0
+        for df in frames:
+            if columns is None:
+                columns = [{'name': name, 'dtype': str(df[name].dtype)} for name in df.columns]
+                conn.execute(
+                    f'CREATE TABLE {SQLITE_TABLE} ('
+                    + ', '.join(f'{_quote(name)} {_sql_type(df[name].dtype)}' for name in df.columns)
+                    + ')'
+                )
+                insert = f'INSERT INTO {SQLITE_TABLE} VALUES ({", ".join("?" * len(columns))})'
+            for start in range(0, len(df), SQLITE_CHUNK_ROWS):
+                conn.executemany(insert, _records(df.iloc[start:start + SQLITE_CHUNK_ROWS]))
+            rows += len(df)
+
+        if columns is None:
+            raise ValueError('No rows to write')
+
+        # Table pages and counts filter by locality and year (or by year alone)
+        conn.execute(
+            f'CREATE INDEX {SQLITE_TABLE}_locality_year ON {SQLITE_TABLE} '
+            f'({_quote(LOCALITY_COLUMN)}, {_quote(YEAR_COLUMN)})'
+        )
+        conn.execute(f'CREATE INDEX {SQLITE_TABLE}_year ON {SQLITE_TABLE} ({_quote(YEAR_COLUMN)})')
+        conn.execute(
+            f'CREATE TABLE {SQLITE_CHANGES_TABLE} (batch INTEGER NOT NULL, locality TEXT NOT NULL, year INTEGER NOT NULL)'
+        )
+        conn.execute(f'CREATE INDEX {SQLITE_CHANGES_TABLE}_batch ON {SQLITE_CHANGES_TABLE} (batch)')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        # ``build`` tells stores whether batches can be applied on top of what they loaded
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('meta', ?)",
+            (json.dumps({
+                **meta, 'format': SQLITE_FORMAT_VERSION, 'rows': rows, 'columns': columns,
+                'batch': 0, 'build': uuid.uuid4().hex
+            }),)
+        )
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, path)
+    finally:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _merged_dtype(stored: str, incoming) -> str:
+    """Dtype of a stored column once values of dtype ``incoming`` are added (numbers widen)."""
+    stored_numpy, incoming_numpy = _numpy_dtype(stored), _numpy_dtype(str(incoming))
+    if stored_numpy.kind in 'biuf' and incoming_numpy.kind in 'biuf':
+        return str(np.result_type(stored_numpy, incoming_numpy))
+    return stored
+
+
+def ingest_sqlite(path: str, df: pd.DataFrame, mode: str = 'upsert') -> Dict[str, Any]:
+    """
+    Add a batch of normalized rows to a SQLite dataset file, in one transaction.
+
+    In ``upsert`` mode, a row whose (locality, year) is already present
+    replaces the first row of that cell (the one charts use) and the last row
+    of the batch wins; other rows are appended. In ``append`` mode every row is
+    appended. Lookups go through the (locality, year) index, so the cost
+    depends on the size of the batch, not of the dataset.
+
+    Returns:
+        {'inserted', 'updated', 'rows', 'batch', 'version'}
+
+    Raises:
+        DatasetValidationError: when the batch columns do not match the dataset's
+        ValueError: for an unknown mode
+    """
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Unknown ingest mode {mode!r}; use one of: {', '.join(INGEST_MODES)}")
+    if df.empty:
+        raise DatasetValidationError(['the batch has no rows'])
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        # Take the write lock before reading meta, so concurrent ingests queue up
+        conn.execute('BEGIN IMMEDIATE')
+        meta = json.loads(conn.execute("SELECT value FROM meta WHERE key = 'meta'").fetchone()[0])
+        columns = [column['name'] for column in meta['columns']]
+
+        problems = []
+        missing = [name for name in columns if name not in df.columns]
+        unknown = [name for name in df.columns if name not in columns]
+        if missing:
+            problems.append(f"missing column(s): {', '.join(missing)}")
+        if unknown:
+            problems.append(f"unknown column(s): {', '.join(unknown)}")
+        if problems:
+            raise DatasetValidationError(problems)
+
+        df = df[columns]
+        if mode == 'upsert':
+            df = df.drop_duplicates([LOCALITY_COLUMN, YEAR_COLUMN], keep='last')
+        records = list(_records(df))
+        locality, year = columns.index(LOCALITY_COLUMN), columns.index(YEAR_COLUMN)
+        keys = [(record[locality], record[year]) for record in records]
+
+        targets = [None] * len(records)
+        if mode == 'upsert':
+            lookup = (
+                f'SELECT MIN(rowid) FROM {SQLITE_TABLE} '
+                f'WHERE {_quote(LOCALITY_COLUMN)} = ? AND {_quote(YEAR_COLUMN)} = ?'
+            )
+            targets = [conn.execute(lookup, key).fetchone()[0] for key in keys]
+
+        updates = [record + (rowid,) for record, rowid in zip(records, targets) if rowid is not None]
+        inserts = [record for record, rowid in zip(records, targets) if rowid is None]
+        conn.executemany(
+            f'UPDATE {SQLITE_TABLE} SET {", ".join(f"{_quote(name)} = ?" for name in columns)} WHERE rowid = ?',
+            updates
+        )
+        conn.executemany(f'INSERT INTO {SQLITE_TABLE} VALUES ({", ".join("?" * len(columns))})', inserts)
+
+        batch = meta['batch'] + 1
+        conn.executemany(
+            f'INSERT INTO {SQLITE_CHANGES_TABLE} (batch, locality, year) VALUES (?, ?, ?)',
+            [(batch, *key) for key in dict.fromkeys(keys)]
+        )
+
+        # Chain the version: same base data plus same batches, same version
+        digest = hashlib.sha256(meta['version'].encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        for column in meta['columns']:
+            column['dtype'] = _merged_dtype(column['dtype'], df[column['name']].dtype)
+        meta.update(batch=batch, rows=meta['rows'] + len(inserts), version=digest.hexdigest()[:12])
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'meta'", (json.dumps(meta),))
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    return {
+        'inserted': len(inserts), 'updated': len(updates), 'rows': meta['rows'],
+        'batch': batch, 'version': meta['version']
+    }
+
+
+class SQLiteStore:
+    """
+    Rows in an indexed SQLite file, queried with the filters pushed down.
+
+    The file is opened read-only, one connection per thread (never reused
+    across a fork). Reads go through SQLite's small page cache rather than a
+    memory map, so the file's pages stay in the OS page cache, shared by all
+    workers, instead of adding to each worker's RSS.
+
+    Opened with a ``previous`` store of the same file, the cube is that
+    store's cube with the cells of the batches ingested since applied, and
+    ``changed`` holds the codes of the localities they touched (None when
+    the cube was built from scratch).
+
+    Rows are read live from the file, so table pages and exports see an
+    ingested batch as soon as it is committed; the cube sees it once the
+    store is updated.
+    """
+
+    kind = 'sqlite'
+
+    def __init__(self, path: str, previous: Optional['SQLiteStore'] = None):
+        self.path = path
+        self._local = threading.local()
+
+        meta = read_sqlite_meta(path)
+        if meta is None:
+            raise ValueError(f'{path} is not a dataset file')
+        self.meta = meta
+        self.version: str = meta['version']
+        self.columns: List[str] = [column['name'] for column in meta['columns']]
+        self.dtypes: Dict[str, str] = {column['name']: column['dtype'] for column in meta['columns']}
+        self._numpy_dtypes = {name: _numpy_dtype(dtype) for name, dtype in self.dtypes.items()}
+
+        self.categories: Dict[str, pd.CategoricalDtype] = {}
+        self.changed: Optional[np.ndarray] = None
+        if previous is not None and previous.meta['build'] == meta['build']:
+            df, positions = self.changed_cells(previous.meta['batch'])
+            touched = pd.unique(df[LOCALITY_COLUMN].astype(object).to_numpy()).tolist()
+            self.cube = previous.cube.updated(df, positions, self.row_positions(touched))
+            self.changed = np.unique([self.cube.locality_codes[name] for name in touched])
+        else:
+            self.cube = LocalityYearCube(*self.locality_years(), rows=self.row_positions())
+        # Same categories, in the same order, as the in-memory frame has
+        category_values = {LOCALITY_COLUMN: self.cube.localities, CITY_COLUMN: self.cube.cities}
+        self.categories = {
+            name: pd.CategoricalDtype(pd.Index(values, dtype=object)) for name, values in category_values.items()
+            if self.dtypes.get(name) == 'category'
+        }
+        self.schema = self._frame([], self.columns)
+
+    def updated(self) -> Optional['SQLiteStore']:
+        """A store with the batches ingested into the file since this one was opened (None if there are none)."""
+        meta = read_sqlite_meta(self.path)
+        if meta is None or meta['version'] == self.version:
+            return None
+        return SQLiteStore(self.path, previous=self)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                f'file:{quote(os.path.abspath(self.path))}?mode=ro', uri=True, check_same_thread=False
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _frame(self, records: List[tuple], columns: List[str]) -> pd.DataFrame:
+        """DataFrame of fetched rows with the dtypes the columns had when written."""
+        try:
+            # Numeric columns go straight from the row tuples into typed arrays
+            array = np.array(records, dtype=[(name, self._numpy_dtypes[name]) for name in columns])
+            df = pd.DataFrame({name: array[name] for name in columns})
+        except (TypeError, ValueError):
+            # e.g. NULLs in an integer column: let pandas infer the dtypes
+            df = pd.DataFrame.from_records(records, columns=columns)
+        for name in columns:
+            dtype = self.categories.get(name, self.dtypes[name])
+            if str(df[name].dtype) != str(dtype) or name in self.categories:
+                try:
+                    df[name] = df[name].astype(dtype)
+                except (TypeError, ValueError):
+                    # e.g. NULLs in an integer column: keep the inferred dtype
+                    pass
+        return df
+
+    @staticmethod
+    def _where(localities: Optional[List[str]], year_range: Optional[List[int]]):
+        clauses, params = [], []
+        if localities is not None:
+            # One parameter whatever the number of localities
+            clauses.append(f'{_quote(LOCALITY_COLUMN)} IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(list(localities)))
+        if year_range:
+            start, end = year_range
+            if start is not None:
+                clauses.append(f'{_quote(YEAR_COLUMN)} >= ?')
+                params.append(int(start))
+            if end is not None:
+                clauses.append(f'{_quote(YEAR_COLUMN)} <= ?')
+                params.append(int(end))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def count(self, localities: Optional[List[str]] = None, year_range: Optional[List[int]] = None) -> int:
+        """Number of rows of ``localities`` (all if None) within ``year_range``."""
+        where, params = self._where(localities, year_range)
+        if not where:
+            # Kept up to date by ingest_sqlite, in the same transaction as the rows
+            return self._connect().execute("SELECT json_extract(value, '$.rows') FROM meta WHERE key = 'meta'").fetchone()[0]
+        return self._connect().execute(f'SELECT COUNT(*) FROM {SQLITE_TABLE}{where}', params).fetchone()[0]
+
+    def _select(self, localities, year_range, columns: List[str], offset: int = 0, limit: Optional[int] = None):
+        where, params = self._where(localities, year_range)
+        sql = f'SELECT {", ".join(map(_quote, columns))} FROM {SQLITE_TABLE}{where} ORDER BY rowid'
+        if limit is not None or offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [-1 if limit is None else int(limit), int(offset)]
+        return self._connect().execute(sql, params)
+
+    def rows(
+        self,
+        localities: Optional[List[str]] = None,
+        year_range: Optional[List[int]] = None,
+        columns: Optional[List[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> pd.DataFrame:
+        """``columns`` (all if None) of the selected rows, ``offset`` rows skipped, at most ``limit``."""
+        columns = columns or self.columns
+        if limit == 0:
+            return self.schema[columns]
+        return self._frame(self._select(localities, year_range, columns, offset, limit).fetchall(), columns)
+
+    def iter_rows(
+        self,
+        localities: Optional[List[str]] = None,
+        year_range: Optional[List[int]] = None,
+        columns: Optional[List[str]] = None,
+        chunk_size: int = 10_000,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        The selected rows (``offset`` rows skipped, at most ``limit``) as
+        DataFrames of at most ``chunk_size`` rows, fetched as they are consumed.
+        """
+        columns = columns or self.columns
+        if limit == 0:
+            return
+        cursor = self._select(localities, year_range, columns, offset, limit)
+        while True:
+            records = cursor.fetchmany(chunk_size)
+            if not records:
+                break
+            yield self._frame(records, columns)
+
+    def _first_rows(self, where: str = '', params: Tuple = ()) -> Tuple[pd.DataFrame, np.ndarray]:
+        select = ', '.join(map(_quote, self.columns))
+        # Bare columns next to MIN(rowid) come from that (first) row
+        cursor = self._connect().execute(
+            f'SELECT {select}, first_row FROM (SELECT {select}, MIN(rowid) AS first_row FROM {SQLITE_TABLE}{where} '
+            f'GROUP BY {_quote(LOCALITY_COLUMN)}, {_quote(YEAR_COLUMN)}) ORDER BY first_row',
+            params
+        )
+        frames, positions = [], []
+        while True:
+            records = cursor.fetchmany(SQLITE_CHUNK_ROWS)
+            if not records:
+                break
+            frames.append(self._frame([record[:-1] for record in records], self.columns))
+            positions.append(np.array([record[-1] - 1 for record in records], dtype=np.int64))
+        if not frames:
+            return self._frame([], self.columns), np.empty(0, dtype=np.int64)
+        # Chunks with different categories concatenate as object columns
+        return pd.concat(frames, ignore_index=True), np.concatenate(positions)
+
+    def locality_years(self) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        One row per (locality, year): the first one in dataset order, as in
+        the in-memory cube, grouped inside SQLite and fetched in chunks.
+
+        Returns:
+            (rows, their dataset positions)
+        """
+        return self._first_rows()
+
+    def row_positions(self, localities: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Dataset positions of every row of ``localities`` (all if None),
+        repeated (locality, year) rows included, grouped by locality and in
+        year order within a group, read in (locality, year) index order.
+
+        Returns:
+            (localities, row count of each, positions)
+        """
+        where, params = self._where(localities, None)
+        locality, year = _quote(LOCALITY_COLUMN), _quote(YEAR_COLUMN)
+        conn = self._connect()
+        # One read transaction, so the counts match the positions
+        conn.execute('BEGIN')
+        try:
+            groups = conn.execute(
+                f'SELECT {locality}, COUNT(*) FROM {SQLITE_TABLE}{where} GROUP BY {locality} ORDER BY {locality}', params
+            ).fetchall()
+            cursor = conn.execute(f'SELECT rowid - 1 FROM {SQLITE_TABLE}{where} ORDER BY {locality}, {year}, rowid', params)
+            chunks = [np.empty(0, dtype=np.int64)]
+            while True:
+                records = cursor.fetchmany(SQLITE_CHUNK_ROWS)
+                if not records:
+                    break
+                chunks.append(np.array(records, dtype=np.int64).ravel())
+        finally:
+            conn.execute('COMMIT')
+        return [name for name, _ in groups], np.array([count for _, count in groups], dtype=np.int64), np.concatenate(chunks)
+
+    def changed_cells(self, since_batch: int) -> Tuple[pd.DataFrame, np.ndarray]:
+        """``locality_years`` restricted to the cells touched by batches after ``since_batch``."""
+        return self._first_rows(
+            f' WHERE ({_quote(LOCALITY_COLUMN)}, {_quote(YEAR_COLUMN)}) IN '
+            f'(SELECT locality, year FROM {SQLITE_CHANGES_TABLE} WHERE batch > ?)',
+            (since_batch,)
+        )
@@ -1,4 +1,1476 @@
-from django.test import TestCase
+import asyncio
+import gc
+import gzip
+import io
+import json
+import os
+import runpy
+import shutil
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
 
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from benchmarks.comparison import legacy_comparison
+from benchmarks.fake_openai import FakeOpenAIHandler, serve
+from benchmarks.synthetic import make_dataframe
+
+from . import apps, dataset, llm, middleware, renderers, utils, views, warmup
+from .aggregates import LocalityAggregates
+from .analytics import LocalityAnalytics
+from .cache import LRUCache, SQLiteCache
+from .engine import rank_localities, resolve_years
+from .export import PYARROW_AVAILABLE
+from .forecast import LocalityForecast
+from .geo import LocalityGeoIndex
+from .index import LocalityYearCube
+from .matcher import LocalityMatcher, edit_distance
+from .renderers import dumps
+from .schema import DatasetValidationError, normalize_dataframe
+from .storage import MemoryStore, SQLiteStore, ingest_sqlite
+from .utils import extract_chart_data, intent_cache, response_cache, table_columns
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+
+class ApiTestCase(SimpleTestCase):
+    """Requests against the shipped dataset, with empty caches and without OpenAI."""
+
+    def setUp(self):
+        response_cache.clear()
+        intent_cache.clear()
+        environ = mock.patch.dict(os.environ, {'OPENAI_API_KEY': ''})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def post(self, path, body, **headers):
+        return self.client.post(path, body, content_type='application/json', **headers)
+
+
+class FakeOpenAITestCase(ApiTestCase):
+    """Summaries from the local OpenAI stub (benchmarks.fake_openai), cached in a fresh SQLite file."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = serve(port=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        FakeOpenAIHandler.calls = 0
+        FakeOpenAIHandler.latency = 0.0
+        environ = mock.patch.dict(os.environ, {
+            'OPENAI_API_KEY': 'test',
+            'OPENAI_BASE_URL': f'http://127.0.0.1:{self.server.server_address[1]}/v1',
+        })
+        environ.start()
+        self.addCleanup(environ.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.summary_cache = SQLiteCache(os.path.join(directory.name, 'summaries.sqlite3'), 3600)
+        for patcher in (
+            mock.patch.object(utils, 'summary_cache', self.summary_cache),
+            mock.patch.object(llm, 'breaker', llm.CircuitBreaker(5, 30, 10)),
+            mock.patch.object(llm, '_client', None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class DatasetCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, 'sample_data.xlsx')
+        shutil.copy(settings.DATASET_PATH, self.source)
+        self.cache_dir = os.path.join(directory.name, 'cache')
+
+    def test_second_load_reads_the_memory_mapped_columns(self):
+        df, sha256 = dataset.load_dataset(self.source, self.cache_dir)
+        self.assertEqual(sha256, dataset.file_sha256(self.source))
+        with mock.patch.object(dataset, 'read_source', side_effect=AssertionError('workbook read')):
+            cached, cached_sha256 = dataset.load_dataset(self.source, self.cache_dir)
+        self.assertEqual(cached_sha256, sha256)
+        pd.testing.assert_frame_equal(cached, df)
+        self.assertIsInstance(cached['year'].values.base, np.memmap)
+
+    def test_touched_but_unchanged_workbook_keeps_the_cache(self):
+        dataset.load_dataset(self.source, self.cache_dir)
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        with mock.patch.object(dataset, 'read_source', side_effect=AssertionError('workbook read')):
+            dataset.load_dataset(self.source, self.cache_dir)
+        meta = dataset._read_meta(dataset.cache_path_for(self.source, self.cache_dir))
+        self.assertEqual(meta['source'], dataset.file_fingerprint(self.source))
+
+    def test_changed_workbook_rebuilds_the_cache(self):
+        df, sha256 = dataset.load_dataset(self.source, self.cache_dir)
+        changed = pd.read_excel(self.source)
+        changed.loc[0, 'year'] = 2019
+        changed.to_excel(self.source, index=False)
+        reloaded, reloaded_sha256 = dataset.load_dataset(self.source, self.cache_dir)
+        self.assertNotEqual(reloaded_sha256, sha256)
+        self.assertEqual(reloaded['year'].min(), 2019)
+
+    def test_corrupt_cache_falls_back_to_the_workbook(self):
+        df, _ = dataset.load_dataset(self.source, self.cache_dir)
+        cache_path = dataset.cache_path_for(self.source, self.cache_dir)
+        for name in os.listdir(cache_path):
+            if name.endswith('.npy'):
+                # A new file: ``df`` still maps the old one
+                os.remove(os.path.join(cache_path, name))
+                with open(os.path.join(cache_path, name), 'wb') as f:
+                    f.write(b'garbage')
+        reloaded, _ = dataset.load_dataset(self.source, self.cache_dir)
+        pd.testing.assert_frame_equal(reloaded, df)
+
+
+class DatasetReloadTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, 'sample_data.xlsx')
+        shutil.copy(settings.DATASET_PATH, self.source)
+        # Reloads publish into the module globals; put the shipped snapshot back afterwards
+        for name in ('_snapshot', '_seen_fingerprint'):
+            patcher = mock.patch.object(dataset, name, getattr(dataset, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        dataset.publish_snapshot(dataset.build_snapshot(self.source))
+
+    def change_source(self):
+        df = pd.read_excel(self.source)
+        df = pd.concat([df, df.iloc[[0]].assign(**{'final location': 'Baner'})], ignore_index=True)
+        df.to_excel(self.source, index=False)
+
+    def test_unchanged_or_touched_source_keeps_the_snapshot(self):
+        current = dataset.get_snapshot()
+        self.assertEqual(dataset.reload_snapshot(self.source), (current, False))
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(dataset.reload_snapshot(self.source), (current, False))
+
+    def test_changed_source_swaps_in_a_new_snapshot(self):
+        current = dataset.get_snapshot()
+        self.change_source()
+        snapshot, changed = dataset.reload_snapshot(self.source)
+        self.assertTrue(changed)
+        self.assertIs(dataset.get_snapshot(), snapshot)
+        self.assertNotEqual(snapshot.version, current.version)
+        self.assertIn('Baner', snapshot.localities)
+        # Requests holding the old snapshot keep seeing the old data
+        self.assertEqual((current.rows, 'Baner' in current.localities), (20, False))
+
+    def test_derived_structures_live_with_their_snapshot(self):
+        current = dataset.get_snapshot()
+        builds = []
+        build = lambda: builds.append(1) or object()
+        self.assertIs(current.derive('key', build), current.derive('key', build))
+        self.change_source()
+        snapshot, _ = dataset.reload_snapshot(self.source)
+        self.assertIsNot(snapshot.derive('key', build), current.derive('key', build))
+        self.assertEqual(len(builds), 2)
+
+    def test_reload_endpoint(self):
+        self.assertEqual(self.post('/api/admin/reload/', {}).status_code, 403)
+        with self.settings(DATASET_RELOAD_TOKEN='secret', DATASET_PATH=self.source, DATASET_CACHE_DIR='', DATASET_STORAGE='memory'):
+            self.assertEqual(self.post('/api/admin/reload/', {}, HTTP_X_RELOAD_TOKEN='wrong').status_code, 403)
+            self.change_source()
+            response = self.post('/api/admin/reload/', {}, HTTP_X_RELOAD_TOKEN='secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['reloaded'], response.json()['rows']), (True, 21))
+        self.assertEqual(self.post('/api/query/', {'query': 'Analyze Baner'}).json()['localities'], ['Baner'])
+
+
+class CubeTests(SimpleTestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'final location': ['Wakad', 'Aundh', 'Wakad', 'Wakad', 'Baner'],
+            'year': [2020, 2020, 2022, 2020, 2021],
+            'city': ['Pune', 'Pune', 'Pune', 'Pune', 'Mumbai'],
+            'flat_sold - igr': [10, 20, 30, 40, 50],
+            'flat - weighted average rate': [100.5, 200.0, 300.0, 400.0, np.nan],
+        })
+        self.cube = LocalityYearCube(self.df)
+
+    def test_cells(self):
+        cube = self.cube
+        self.assertEqual((cube.localities, cube.years.tolist()), (['Wakad', 'Aundh', 'Baner'], [2020, 2021, 2022]))
+        # The first row of a repeated (locality, year) wins
+        np.testing.assert_array_equal(cube.series('Wakad', 'flat_sold - igr'), [10, np.nan, 30])
+        np.testing.assert_array_equal(cube.row_index, [[0, -1, 2], [1, -1, -1], [-1, 4, -1]])
+        self.assertEqual(cube.to_list(cube.series('Wakad', 'flat_sold - igr'), 'flat_sold - igr'), [10, None, 30])
+        self.assertEqual(cube.integer_metrics, {'flat_sold - igr'})
+        self.assertEqual([cube.cities[code] for code in cube.locality_city], ['Pune', 'Pune', 'Mumbai'])
+
+    def test_locality_rows_keep_repeated_rows(self):
+        self.assertEqual(self.cube.locality_rows('Wakad').tolist(), [0, 3, 2])
+        self.assertEqual(self.cube.rows_for(['Baner', 'Wakad']).tolist(), [0, 2, 3, 4])
+        self.assertEqual(self.cube.locality_rows('Nowhere').tolist(), [])
+
+    def test_matrix_and_block(self):
+        mask = self.cube.year_mask(2021, None)
+        matrix = self.cube.matrix(['Aundh', 'Nowhere', 'Baner'], 'flat - weighted average rate', mask)
+        np.testing.assert_array_equal(matrix, [[np.nan, np.nan], [np.nan, np.nan], [np.nan, np.nan]])
+        matrix = self.cube.matrix(['Baner', 'Wakad'], 'flat_sold - igr', mask)
+        np.testing.assert_array_equal(matrix, [[50, np.nan], [np.nan, 30]])
+        block = self.cube.block(['Wakad', 'Baner', 'Wakad'], ['flat_sold - igr'])
+        np.testing.assert_array_equal(block.series('Wakad', 'flat_sold - igr'), self.cube.series('Wakad', 'flat_sold - igr'))
+        np.testing.assert_array_equal(block.matrix(['Baner', 'Wakad'], 'flat_sold - igr', mask), matrix)
+
+    def test_positions_map_to_dataset_rows(self):
+        cube = LocalityYearCube(self.df, positions=np.arange(100, 105))
+        self.assertEqual(cube.row_index[0].tolist(), [100, -1, 102])
+        self.assertEqual(cube.locality_rows('Wakad').tolist(), [100, 103, 102])
+
+    def test_shipped_dataset(self):
+        snapshot = dataset.get_snapshot()
+        df = pd.read_excel(settings.DATASET_PATH).rename(columns=str.strip)
+        row = df[(df['final location'] == 'Wakad') & (df['year'] == 2022)].iloc[0]
+        code, year = snapshot.cube.locality_codes['Wakad'], snapshot.cube.year_codes[2022]
+        for metric in ('flat_sold - igr', 'flat - weighted average rate', 'loc_lat'):
+            self.assertAlmostEqual(snapshot.cube.values[code, year, snapshot.cube.metric_codes[metric]], row[metric])
+
+
+class AggregatesTests(SimpleTestCase):
+    metric = 'flat - weighted average rate'
+
+    def setUp(self):
+        self.df = pd.read_excel(settings.DATASET_PATH).rename(columns=str.strip)
+        self.aggregates = LocalityAggregates(LocalityYearCube(self.df))
+
+    def test_matches_pandas(self):
+        groups = self.df.sort_values('year').groupby('final location')[self.metric]
+        for locality, series in groups:
+            self.assertEqual(self.aggregates.years(locality), (2020, 2024))
+            self.assertAlmostEqual(self.aggregates.first(locality, self.metric), series.iloc[0])
+            self.assertAlmostEqual(self.aggregates.last(locality, self.metric), series.iloc[-1])
+            self.assertAlmostEqual(self.aggregates.change(locality, self.metric), (series.iloc[-1] / series.iloc[0] - 1) * 100)
+            self.assertAlmostEqual(self.aggregates.total(locality, self.metric), series.sum())
+        self.assertIsInstance(self.aggregates.total('Wakad', 'flat_sold - igr'), int)
+
+    def test_best_and_ranking(self):
+        growth = {locality: self.aggregates.change(locality, self.metric) for locality in self.aggregates.cube.localities}
+        ranked = sorted(growth, key=growth.get, reverse=True)
+        self.assertEqual([locality for locality, _ in self.aggregates.ranking(self.metric)], ranked)
+        self.assertEqual(len(self.aggregates.ranking(self.metric, 2)), 2)
+        self.assertEqual(self.aggregates.best(['Aundh', 'Nowhere', 'Akurdi'], self.metric)[0],
+                         max(['Aundh', 'Akurdi'], key=growth.get))
+        self.assertEqual(self.aggregates.best(['Nowhere'], self.metric), (None, None))
+
+    def test_year_window(self):
+        cube = self.aggregates.cube
+        window = LocalityAggregates(cube, cube.year_mask(2021, 2023))
+        self.assertEqual(window.years('Wakad'), (2021, 2023))
+        series = cube.series('Wakad', self.metric)
+        self.assertAlmostEqual(window.change('Wakad', self.metric), (series[3] / series[1] - 1) * 100)
+        self.assertIsNone(window.updated(cube, np.array([0])))
+
+    def test_updated_matches_a_full_rebuild(self):
+        extra = self.df[self.df['final location'] == 'Wakad'].assign(**{'final location': 'Baner'})
+        extra[self.metric] *= 2
+        changed = pd.concat([self.df, extra], ignore_index=True)
+        changed.loc[changed['final location'] == 'Aundh', self.metric] += 100
+        cube = LocalityYearCube(changed)
+        codes = np.array([cube.locality_codes['Aundh'], cube.locality_codes['Baner']])
+        updated, rebuilt = self.aggregates.updated(cube, codes), LocalityAggregates(cube)
+        for name in ('has_data', 'first_values', 'last_values', 'growth', 'totals', 'growth_rank'):
+            np.testing.assert_array_equal(getattr(updated, name), getattr(rebuilt, name), name)
+
+    def test_updated_reranks_only_what_moved(self):
+        df = normalize_dataframe(make_dataframe(500))
+        aggregates = LocalityAggregates(LocalityYearCube(df))
+        rng = np.random.default_rng(0)
+        last = df['year'] == df['year'].max()
+
+        def update(changed, codes):
+            nonlocal aggregates
+            cube = LocalityYearCube(changed)
+            updated, rebuilt = aggregates.updated(cube, codes), LocalityAggregates(cube)
+            for name in ('growth', 'growth_order', 'growth_rank'):
+                np.testing.assert_array_equal(getattr(updated, name), getattr(rebuilt, name), name)
+            aggregates = updated
+            return updated
+
+        # A change too small to pass a neighbour keeps the ranks
+        before = aggregates
+        codes = np.array([3, 40, 77])
+        selected = df['final location'].isin([df['final location'].unique()[code] for code in codes]) & last
+        df.loc[selected, self.metric] *= 1 + 1e-12
+        self.assertIs(update(df, codes).growth_rank, before.growth_rank)
+
+        # Large moves, ties, gaps and infinite growth
+        for _ in range(5):
+            codes = np.sort(rng.choice(100, 12, replace=False))
+            names = df['final location'].unique()[codes]
+            rows = df['final location'].isin(names) & last
+            df.loc[rows, self.metric] = rng.choice([np.nan, 5000.0, 9000.0], rows.sum())
+            df.loc[df['final location'].isin(names[:2]) & (df['year'] == df['year'].min()), self.metric] = 0.0
+            update(df, codes)
+
+        # New localities and a new year
+        extra = df[df['final location'] == df['final location'].iloc[0]].assign(**{'final location': 'Newtown', 'year': 2030})
+        update(pd.concat([df, extra], ignore_index=True), np.array([100]))
+
+
+class SchemaTests(SimpleTestCase):
+    def setUp(self):
+        self.df = pd.read_excel(settings.DATASET_PATH).rename(columns=str.strip)
+
+    def test_shipped_dataset_types(self):
+        df = normalize_dataframe(self.df)
+        self.assertEqual(df['final location'].dtype, 'category')
+        self.assertEqual(df['city'].dtype, 'category')
+        self.assertTrue(pd.api.types.is_integer_dtype(df['year']))
+        self.assertLess(df['flat_sold - igr'].dtype.itemsize, 8)
+        self.assertEqual(df['flat - weighted average rate'].dtype, np.float64)
+        self.assertNotIn('flat - most prevailing rate - range', df.columns)
+        low, high = self.df['flat - most prevailing rate - range'].iloc[0].split('-')
+        self.assertEqual((df['flat - most prevailing rate - low'].iloc[0], df['flat - most prevailing rate - high'].iloc[0]),
+                         (float(low), float(high)))
+
+    def test_numbers_stored_as_text(self):
+        self.df['total sold - igr'] = self.df['total sold - igr'].map('{:,}'.format)
+        self.df.loc[0, 'total sold - igr'] = '1,234'
+        df = normalize_dataframe(self.df)
+        self.assertTrue(pd.api.types.is_integer_dtype(df['total sold - igr']))
+        self.assertEqual(df['total sold - igr'].iloc[0], 1234)
+
+    def test_reports_every_problem(self):
+        self.df['total sold - igr'] = self.df['total sold - igr'].astype(object)
+        self.df.loc[0, 'total sold - igr'] = 'n/a'
+        self.df.loc[1, 'flat - most prevailing rate - range'] = 'about 9000'
+        self.df.loc[2, 'city'] = None
+        with self.assertRaises(DatasetValidationError) as raised:
+            normalize_dataframe(self.df)
+        problems = raised.exception.problems
+        self.assertEqual(len(problems), 3)
+        self.assertIn("column 'total sold - igr' has 1 non-numeric value(s), e.g. 'n/a' in sheet row 2", problems)
+        self.assertIn("column 'flat - most prevailing rate - range' has 1 malformed range(s), e.g. 'about 9000' in sheet row 3", problems)
+        self.assertIn("column 'city' has 1 empty value(s)", problems)
+
+    def test_missing_columns(self):
+        with self.assertRaises(DatasetValidationError) as raised:
+            normalize_dataframe(self.df.drop(columns=['city', 'year']))
+        self.assertEqual(raised.exception.problems, ['missing column(s): year, city'])
+
+
+class LocalityMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.matcher = LocalityMatcher(['Pimple Saudagar', 'Wakad', 'Aundh', 'Ambegaon Budruk', 'Hinjewadi'])
+
+    def test_exact_matches_in_query_order(self):
+        self.assertEqual(self.matcher.find('Compare Wakad and Aundh'), ['Wakad', 'Aundh'])
+
+    def test_aliases_and_transliterations(self):
+        self.assertEqual(self.matcher.find('Analyze Ambegaon Bk'), ['Ambegaon Budruk'])
+        self.assertEqual(self.matcher.find('Analyze Vakad'), ['Wakad'])
+
+    def test_one_typo(self):
+        self.assertEqual(self.matcher.find('Analyze Wakkad'), ['Wakad'])
+        self.assertEqual(self.matcher.find('Analyze Hinjawadi'), ['Hinjewadi'])
+
+    def test_two_typos_in_a_long_name(self):
+        self.assertEqual(edit_distance('pimpli saudagor', 'pimple saudagar', 2), 2)
+        self.assertEqual(self.matcher.find('Analyze Pimpli Saudagor prices'), ['Pimple Saudagar'])
+
+    def test_short_names_allow_one_typo_only(self):
+        self.assertEqual(self.matcher.find('Analyze Wxkxd'), [])
+
+    def test_stopwords_never_match(self):
+        self.assertEqual(self.matcher.find('Compare prices and demand'), [])
+
+
+class IntentCacheTests(ApiTestCase):
+    def test_phrasings_share_one_parse(self):
+        snapshot = dataset.get_snapshot()
+        parse, hits, misses = utils.parse_query_intent, intent_cache.hits, intent_cache.misses
+        with mock.patch.object(utils, 'parse_query_intent', side_effect=parse) as parsed:
+            first = utils.get_query_intent('Analyze  Wakad', snapshot)
+            second = utils.get_query_intent('analyze wakad ', snapshot)
+        self.assertEqual(parsed.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual((intent_cache.hits - hits, intent_cache.misses - misses), (1, 1))
+
+    def test_returns_copies(self):
+        snapshot = dataset.get_snapshot()
+        utils.get_query_intent('Analyze Wakad', snapshot)['localities'].append('Aundh')
+        self.assertEqual(utils.get_query_intent('Analyze Wakad', snapshot)['localities'], ['Wakad'])
+
+    def test_keyed_by_dataset_version(self):
+        snapshot = dataset.get_snapshot()
+        utils.get_query_intent('Analyze Wakad', snapshot)
+        with mock.patch.object(snapshot, 'version', 'other'):
+            utils.get_query_intent('Analyze Wakad', snapshot)
+        self.assertEqual(len(intent_cache), 2)
+
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(cache.stats(), {'size': 2, 'maxsize': 2, 'hits': 3, 'misses': 1, 'hit_rate': 0.75})
+        disabled = LRUCache(0)
+        disabled.set('a', 1)
+        self.assertEqual(len(disabled), 0)
+
+
+class QueryIntentTests(SimpleTestCase):
+    def parse(self, query):
+        return utils.parse_query_intent(query, dataset.get_snapshot().matcher, ['Pune'], (2020, 2024))
+
+    def test_year_filters(self):
+        cases = {
+            'Wakad prices 2021-2023': {'start': 2021, 'end': 2023},
+            'Wakad between 2023 and 2021': {'start': 2021, 'end': 2023},
+            'Wakad demand last 2 years': {'last': 2},
+            'Wakad after 2021': {'start': 2022},
+            'Wakad before 2023': {'end': 2022},
+            'Wakad prices in 2023': {'start': 2023, 'end': 2023},
+            'Wakad 2022 prices': {'start': 2022, 'end': 2022},
+            'Wakad year 2019': {'start': 2019, 'end': 2019},
+        }
+        for query, years in cases.items():
+            self.assertEqual(self.parse(query)['years'], years, query)
+
+    def test_numbers_are_not_years(self):
+        for query in ['Analyze Wakad within 2000 m', 'Wakad budget 1950 per sqft', 'Wakad prices 2030']:
+            self.assertIsNone(self.parse(query)['years'], query)
+        intent = utils.parse_query_intent('Wakad prices 2022', dataset.get_snapshot().matcher)
+        self.assertIsNone(intent['years'])
+
+    def test_forecast_year_is_the_target(self):
+        intent = self.parse('forecast Wakad 2026')
+        self.assertIsNone(intent['years'])
+        self.assertEqual(intent['forecast'], {'year': 2026, 'horizon': 1, 'model': None})
+        self.assertEqual(self.parse('Aundh prices in the next 3 years with exponential smoothing')['forecast'],
+                         {'year': None, 'horizon': 3, 'model': 'exponential'})
+
+    def test_rankings(self):
+        intent = self.parse('top 3 localities by price growth in pune')
+        self.assertEqual((intent['type'], intent['city']), ('ranking', 'Pune'))
+        self.assertEqual(intent['ranking'], {'by': 'price', 'measure': 'growth', 'order': 'desc', 'limit': 3})
+        intent = self.parse('cheapest offices')
+        self.assertEqual(intent['property_type'], 'office')
+        self.assertEqual(intent['ranking']['order'], 'asc')
+
+    def test_comparison(self):
+        intent = self.parse('Compare Aundh and Akurdi shop demand')
+        self.assertEqual((intent['type'], intent['localities']), ('comparison', ['Aundh', 'Akurdi']))
+        self.assertEqual((intent['metrics'], intent['property_type']), (['demand'], 'shop'))
+
+    def test_nearby_and_similar(self):
+        self.assertEqual(self.parse('localities near Wakad within 3 km')['nearby'], {'limit': None, 'radius_km': 3.0})
+        self.assertEqual(self.parse('3 localities similar to Aundh')['similar'], {'limit': 3, 'metric': 'cosine'})
+
+
+class QueryEngineTests(ApiTestCase):
+    def test_rankings_match_a_sort(self):
+        snapshot = dataset.get_snapshot()
+        metric = 'flat - weighted average rate'
+        series = {locality: snapshot.cube.series(locality, metric) for locality in snapshot.localities}
+        growth = {locality: (values[3] / values[1] - 1) * 100 for locality, values in series.items()}
+        ranking = {'by': 'price', 'measure': 'growth', 'order': 'desc', 'limit': 3}
+        ranked = rank_localities(snapshot, ranking, start=2021, end=2023)
+        self.assertEqual([name for name, _ in ranked], sorted(growth, key=growth.get, reverse=True)[:3])
+        for name, score in ranked:
+            self.assertAlmostEqual(score, growth[name])
+
+        levels = rank_localities(snapshot, {'by': 'price', 'measure': 'level', 'order': 'asc', 'limit': None})
+        self.assertEqual([name for name, _ in levels], sorted(series, key=lambda name: series[name][-1]))
+        self.assertEqual(rank_localities(snapshot, ranking, localities=['Wakad', 'Nowhere']), [('Wakad', mock.ANY)])
+        self.assertEqual(rank_localities(snapshot, ranking, city='Atlantis'), [])
+
+    def test_last_years(self):
+        snapshot = dataset.get_snapshot()
+        self.assertEqual(resolve_years(snapshot, {'last': 2}), (2023, 2024))
+        self.assertEqual(resolve_years(snapshot, {'last': 10}), (2020, 2024))
+        self.assertEqual(resolve_years(snapshot, None), (None, None))
+
+    def test_ranking_query(self):
+        body = self.post('/api/query/', {'query': 'top 2 localities by price growth'}).json()
+        self.assertEqual(body['type'], 'ranking')
+        self.assertEqual(body['localities'], [entry['locality'] for entry in body['ranking']])
+        self.assertEqual(len(body['localities']), 2)
+        self.assertEqual(set(body['chartData']['prices_by_locality']), set(body['localities']))
+
+    def test_year_range_query(self):
+        body = self.post('/api/query/', {'query': 'Wakad prices 2021-2023'}).json()
+        self.assertEqual((body['yearRange'], body['chartData']['years']), ([2021, 2023], [2021, 2022, 2023]))
+        self.assertEqual(body['tablePage']['total'], 3)
+        body = self.post('/api/query/', {'query': 'Wakad prices within 2000 m'}).json()
+        self.assertIsNone(body['yearRange'])
+        self.assertEqual(body['tablePage']['total'], 5)
+
+    def test_property_type_query(self):
+        body = self.post('/api/query/', {'query': 'cheapest shops'}).json()
+        self.assertEqual(body['propertyType'], 'shop')
+        prices = [entry['value'] for entry in body['ranking']]
+        self.assertEqual(prices, sorted(prices))
+
+    def test_count_rankings_are_whole_numbers(self):
+        snapshot = dataset.get_snapshot()
+        for measure in ('level', 'total'):
+            ranked = rank_localities(snapshot, {'by': 'demand', 'measure': measure, 'order': 'desc', 'limit': None})
+            self.assertTrue(all(type(score) is int for _, score in ranked), measure)
+        ranked = rank_localities(snapshot, {'by': 'demand', 'measure': 'growth', 'order': 'desc', 'limit': None})
+        self.assertTrue(all(type(score) is float for _, score in ranked))
+        body = self.post('/api/query/', {'query': 'top 2 localities by demand'}).content.decode()
+        self.assertNotRegex(body, r'"value":\s*\d+\.0\b')
+
+    def test_single_year_summary(self):
+        summary = self.post('/api/query/', {'query': 'Wakad prices and demand in 2020'}).json()['summary']
+        self.assertIn('in 2020', summary)
+        self.assertNotIn('2020-2020', summary)
+        self.assertNotIn('0.0%', summary)
+
+
+class ResponseCacheTests(ApiTestCase):
+    def test_same_intent_is_built_once(self):
+        build = views._build_analysis
+        with mock.patch.object(views, '_build_analysis', side_effect=build) as built:
+            first = self.post('/api/query/', {'query': 'Compare Aundh and Akurdi'})
+            second = self.post('/api/query/', {'query': 'compare  aundh and akurdi prices and demand'})
+        self.assertEqual(built.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_not_modified(self):
+        response = self.post('/api/query/', {'query': 'Analyze Wakad'})
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        response = self.post('/api/query/', {'query': 'Analyze Wakad'}, HTTP_IF_NONE_MATCH=f'"other", {etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((response.content, response['ETag']), (b'', etag))
+        response = self.post('/api/query/', {'query': 'Analyze Wakad'}, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_each_page_has_its_own_etag(self):
+        first = self.post('/api/query/', {'query': 'Analyze Wakad', 'limit': 2})
+        second = self.post('/api/query/', {'query': 'Analyze Wakad', 'limit': 2, 'offset': 2})
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        response = self.post('/api/query/', {'query': 'Analyze Wakad', 'limit': 2, 'offset': 2}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_key_follows_intent_and_version(self):
+        intent = {'type': 'single', 'localities': ['Wakad'], 'metrics': ['price', 'demand']}
+        key = utils.response_cache_key(intent, 'v1')
+        self.assertEqual(utils.response_cache_key({**intent, 'metrics': ['demand', 'price']}, 'v1'), key)
+        self.assertNotEqual(utils.response_cache_key(intent, 'v2'), key)
+        self.assertNotEqual(utils.response_cache_key({**intent, 'localities': ['Aundh']}, 'v1'), key)
+        self.assertTrue(utils.etag_matches('*', key))
+        self.assertFalse(utils.etag_matches('', key))
+
+
+class ComparisonPivotTests(ApiTestCase):
+    def test_matches_the_per_locality_loops(self):
+        df = normalize_dataframe(make_dataframe(2000))
+        # Gaps: some localities miss some years
+        df = df.drop(index=df.index[::7]).reset_index(drop=True)
+        cube = LocalityYearCube(df)
+        localities = cube.localities[:300] + ['Nowhere']
+        chart = json.loads(dumps(extract_chart_data(cube, localities, ['price', 'demand'])))
+        expected = legacy_comparison(df, localities, ['price', 'demand'])
+        self.assertEqual(chart['years'], [int(year) for year in expected['years']])
+        self.assertEqual(chart['demand_by_locality'], expected['demand_by_locality'])
+        for locality, prices in expected['prices_by_locality'].items():
+            np.testing.assert_allclose(np.array(chart['prices_by_locality'][locality], dtype=float), np.array(prices, dtype=float))
+
+    def test_block_and_year_range(self):
+        cube = dataset.get_snapshot().cube
+        localities = ['Wakad', 'Aundh', 'Akurdi']
+        chart = extract_chart_data(cube, localities, ['demand'], 'office', [2021, 2022])
+        from_block = extract_chart_data(cube, localities, ['demand'], 'office', [2021, 2022],
+                                        cube.block(localities, ['office_sold - igr']))
+        self.assertEqual(json.loads(dumps(chart)), json.loads(dumps(from_block)))
+        self.assertEqual(list(chart['years']), [2021, 2022])
+        self.assertEqual(chart['demand_by_locality']['Wakad'].tolist(), cube.series('Wakad', 'office_sold - igr')[1:3].tolist())
+
+    def test_comparison_query(self):
+        body = self.post('/api/query/', {'query': 'Compare Wakad, Aundh and Akurdi demand'}).json()
+        self.assertEqual(body['localities'], ['Wakad', 'Aundh', 'Akurdi'])
+        self.assertEqual(list(body['chartData']['demand_by_locality']), ['Wakad', 'Aundh', 'Akurdi'])
+        self.assertEqual(body['chartData']['demand_by_locality']['Wakad'], [3244, 4548, 6378, 4614, 3232])
+
+
+class TablePagingTests(ApiTestCase):
+    def test_pages_follow_the_cursor(self):
+        first = self.post('/api/query/', {'query': 'Compare Aundh and Wakad', 'limit': 3}).json()
+        self.assertEqual(len(first['tableData']), 3)
+        self.assertEqual(first['tablePage']['total'], 10)
+
+        rows = list(first['tableData'])
+        cursor = first['tablePage']['nextCursor']
+        while cursor:
+            page = self.post('/api/query/', {'query': 'Compare Aundh and Wakad', 'limit': 3, 'cursor': cursor}).json()
+            rows += page['tableData']
+            cursor = page['tablePage']['nextCursor']
+        everything = self.post('/api/query/', {'query': 'Compare Aundh and Wakad'}).json()
+        self.assertEqual(rows, everything['tableData'])
+
+    def test_fields_projection(self):
+        body = self.post('/api/query/', {'query': 'Analyze Wakad', 'fields': 'year,total units'}).json()
+        self.assertEqual(set(body['tableData'][0]), {'year', 'total units'})
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.post('/api/query/', {'query': 'Analyze Wakad', 'fields': ['nope']}).status_code, 400)
+        self.assertEqual(self.post('/api/query/', {'query': 'Analyze Wakad', 'offset': -1}).status_code, 400)
+        self.assertEqual(self.post('/api/query/', {'query': 'Analyze Wakad', 'cursor': 'garbage'}).status_code, 400)
+
+    def test_oversize_offset_and_limit(self):
+        for params in ({'offset': 1e30}, {'offset': 10 ** 30}, {'limit': 1e30}, {'limit': 10 ** 30, 'stream': True}):
+            with self.subTest(params=params):
+                response = self.post('/api/query/', {'query': 'Analyze Wakad', **params})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('must be at most', response.json()['error'])
+        body = self.post('/api/query/', {'query': 'Analyze Wakad', 'offset': views.MAX_TABLE_ROWS}).json()
+        self.assertEqual((body['tableData'], body['tablePage']['offset']), ([], views.MAX_TABLE_ROWS))
+
+    def test_ndjson_stream(self):
+        response = self.post('/api/query/', {'query': 'Compare Aundh and Wakad', 'stream': True, 'offset': 2, 'limit': 5})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(lines[0]['tablePage']['total'], 10)
+        self.assertNotIn('tableData', lines[0])
+
+        page = self.post('/api/query/', {'query': 'Compare Aundh and Wakad', 'offset': 2, 'limit': 5}).json()
+        self.assertEqual(lines[1:], page['tableData'])
+
+    def test_ndjson_by_accept_header(self):
+        response = self.post('/api/query/', {'query': 'Analyze Wakad'}, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 6)
+        response = self.post('/api/query/', {'query': ''}, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual((response.status_code, response['Content-Type']), (400, 'application/json'))
+
+    def test_window_without_data_has_an_empty_table(self):
+        for query in ('Wakad prices in 1999', 'Wakad prices 2030-2031'):
+            with self.subTest(query=query):
+                body = self.post('/api/query/', {'query': query}).json()
+                self.assertIn('No data found', body['summary'])
+                self.assertEqual((body['tableData'], body['tablePage']['total']), ([], 0))
+                response = self.post('/api/query/', {'query': query, 'stream': True})
+                lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+                self.assertEqual((len(lines), lines[0]['tablePage']['total']), (1, 0))
+
+    def test_ndjson_reads_rows_in_chunks(self):
+        snapshot = dataset.get_snapshot()
+        with mock.patch.object(snapshot.store, 'rows', side_effect=AssertionError('whole selection loaded')), \
+                self.settings(EXPORT_CHUNK_ROWS=2):
+            response = self.post('/api/query/', {'query': 'Compare Aundh and Wakad', 'stream': True})
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 11)
+
+
+class ExportTests(ApiTestCase):
+    def export(self, body):
+        response = self.post('/api/export/', body)
+        self.assertEqual(response.status_code, 200, getattr(response, 'content', b''))
+        return response, b''.join(response.streaming_content)
+
+    def expected(self, localities, columns):
+        df = dataset.get_snapshot().store.rows(localities)
+        return df[columns].reset_index(drop=True)
+
+    def test_csv_of_a_query(self):
+        response, content = self.export({'query': 'Compare Wakad and Aundh', 'format': 'csv'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="real_estate_data.csv"')
+        self.assertEqual(response['X-Dataset-Version'], dataset.get_snapshot().version)
+        exported = pd.read_csv(io.BytesIO(content))
+        self.assertEqual(len(exported), 10)
+        self.assertEqual(set(exported['final location']), {'Wakad', 'Aundh'})
+        self.assertEqual(list(exported.columns), table_columns(dataset.get_snapshot().store.schema))
+
+    spec = {'localities': ['Wakad', 'Akurdi'], 'years': {'start': 2021}, 'metrics': ['price']}
+    columns = ['final location', 'year', 'city', 'flat - weighted average rate']
+
+    def expected_spec(self):
+        expected = self.expected(['Wakad', 'Akurdi'], self.columns)
+        return expected[expected['year'] >= 2021].reset_index(drop=True)
+
+    def test_jsonl_whatever_the_chunk_size(self):
+        with self.settings(EXPORT_CHUNK_ROWS=3):
+            _, jsonl = self.export({**self.spec, 'format': 'jsonl'})
+            _, gzipped = self.export({**self.spec, 'format': 'jsonl', 'gzip': True})
+        rows = [json.loads(line) for line in jsonl.splitlines()]
+        self.assertEqual(rows, json.loads(self.expected_spec().to_json(orient='records')))
+        self.assertEqual(gzip.decompress(gzipped), jsonl)
+
+    @skipUnless(PYARROW_AVAILABLE, 'pyarrow is not installed')
+    def test_parquet_and_arrow(self):
+        expected = self.expected_spec()
+        with self.settings(EXPORT_CHUNK_ROWS=3):
+            _, parquet = self.export({**self.spec, 'format': 'parquet'})
+            _, arrow = self.export({**self.spec, 'format': 'arrow'})
+        for table in (pq.read_table(io.BytesIO(parquet)), pa.ipc.open_stream(arrow).read_all()):
+            self.assertEqual(table.column_names, self.columns)
+            self.assertEqual(table.column('year').to_pylist(), expected['year'].tolist())
+
+    def test_empty_selection_keeps_the_header(self):
+        _, content = self.export({'localities': ['Wakad'], 'years': [2030, 2031], 'fields': 'year,city'})
+        self.assertEqual(content.decode().splitlines(), ['year,city'])
+
+    def test_rejects_bad_specs(self):
+        for body, error in [({'format': 'xml'}, 'Invalid format'), ({'localities': ['Nowhere']}, 'Unknown localities: Nowhere'),
+                            ({'fields': ['nope']}, 'Unknown field(s): nope'), ({'years': 2021}, 'years must be'),
+                            ({'property_type': 'villa'}, 'property_type must be one of')]:
+            response = self.post('/api/export/', body)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(error, response.json()['error'])
+
+
+class RendererTests(SimpleTestCase):
+    data = {
+        'floats': np.array([1.5, np.nan, 3.0]),
+        'ints': np.arange(3, dtype=np.int16),
+        'strided': np.arange(12, dtype=np.float64).reshape(3, 4)[:, 1],
+        'matrix': np.array([[1.0, np.nan], [2.0, 3.0]]),
+        'scalars': [np.int64(7), np.float32(0.5), np.bool_(True), float('nan')],
+        'pandas': [pd.Series([1, 2]), pd.NA, pd.Timestamp('2024-01-02')],
+        'text': 'Wakad ₹',
+        2024: 'non-string key',
+    }
+    expected = {
+        'floats': [1.5, None, 3.0],
+        'ints': [0, 1, 2],
+        'strided': [1.0, 5.0, 9.0],
+        'matrix': [[1.0, None], [2.0, 3.0]],
+        'scalars': [7, 0.5, True, None],
+        'pandas': [[1, 2], None, '2024-01-02T00:00:00'],
+        'text': 'Wakad ₹',
+        '2024': 'non-string key',
+    }
+
+    def test_numpy_and_pandas_values(self):
+        self.assertEqual(json.loads(dumps(self.data)), self.expected)
+
+    @skipUnless(renderers.ORJSON_AVAILABLE, 'orjson is not installed')
+    def test_stdlib_fallback_agrees(self):
+        with mock.patch.object(renderers, 'ORJSON_AVAILABLE', False):
+            fallback = dumps(self.data)
+        self.assertEqual(json.loads(fallback), self.expected)
+        self.assertIn('₹'.encode(), fallback)
+
+    def test_rejects_unknown_objects(self):
+        with self.assertRaises(TypeError):
+            dumps({'value': object()})
+
+    def test_values_orjson_rejects_use_the_stdlib_encoder(self):
+        data = {'n': 10 ** 30, 'floats': np.array([1.0, np.nan]), 'strided': self.data['strided']}
+        self.assertEqual(json.loads(dumps(data)), {'n': 10 ** 30, 'floats': [1.0, None], 'strided': [1.0, 5.0, 9.0]})
+        response = renderers.ORJSONRenderer().render({'offset': 10 ** 30})
+        self.assertEqual(response, b'{"offset":1000000000000000000000000000000}')
+
+    def test_api_responses_use_it(self):
+        response = self.client.get('/api/forecast/', {'localities': 'Wakad'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, dumps(response.json()))
+
+
+class WireFormatTests(ApiTestCase):
+    query = {'query': 'Compare Aundh and Wakad'}
+
+    def test_columnar_table(self):
+        records = self.post('/api/query/', self.query).json()
+        columnar = self.post('/api/query/', {**self.query, 'table_format': 'columnar'}).json()
+        table = columnar.pop('tableData')
+        self.assertEqual(list(table['data']), table['columns'])
+        rows = [dict(zip(table['columns'], values)) for values in zip(*table['data'].values())]
+        self.assertEqual(rows, records.pop('tableData'))
+        self.assertEqual(columnar, records)
+
+    @skipUnless(PYARROW_AVAILABLE, 'pyarrow is not installed')
+    def test_arrow_table(self):
+        records = self.post('/api/query/', {**self.query, 'limit': 4}).json()
+        for response in (self.post('/api/query/', {**self.query, 'limit': 4, 'table_format': 'arrow'}),
+                         self.post('/api/query/', {**self.query, 'limit': 4}, HTTP_ACCEPT='application/vnd.apache.arrow.stream')):
+            self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+            table = pa.ipc.open_stream(response.content).read_all()
+            self.assertEqual(table.to_pylist(), records['tableData'])
+            analysis = json.loads(table.schema.metadata[b'analysis'])
+            self.assertEqual(analysis['tablePage'], records['tablePage'])
+            self.assertEqual(analysis['chartData'], records['chartData'])
+
+    def test_gzip(self):
+        plain = self.post('/api/query/', self.query)
+        with mock.patch.object(middleware, 'BROTLI_AVAILABLE', False):
+            response = self.post('/api/query/', self.query, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+
+        revalidated = self.post('/api/query/', self.query, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+
+    @skipUnless(middleware.BROTLI_AVAILABLE, 'brotli is not installed')
+    def test_brotli(self):
+        plain = self.post('/api/query/', self.query)
+        response = self.post('/api/query/', self.query, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(response.content), plain.content)
+
+    def test_left_uncompressed(self):
+        for headers in ({}, {'HTTP_ACCEPT_ENCODING': 'gzip;q=0'}):
+            self.assertFalse(self.post('/api/query/', self.query, **headers).has_header('Content-Encoding'))
+        with self.settings(COMPRESSION_MIN_SIZE=10 ** 9):
+            self.assertFalse(self.post('/api/query/', self.query, HTTP_ACCEPT_ENCODING='gzip').has_header('Content-Encoding'))
+        streamed = self.post('/api/query/', {**self.query, 'stream': True}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(streamed.has_header('Content-Encoding'))
+
+
+class SummaryCacheTests(FakeOpenAITestCase):
+    def summarize(self, query='Compare Aundh and Wakad'):
+        snapshot = dataset.get_snapshot()
+        intent = utils.get_query_intent(query, snapshot)
+        views.resolve_intent(intent, snapshot)
+        return utils.generate_summary_with_openai(intent, {}, snapshot, 'mock summary')
+
+    def test_miss_then_hit(self):
+        first = self.summarize()
+        self.assertTrue(first.startswith('Stub summary #1'))
+        self.assertEqual(self.summarize(), first)
+        self.assertEqual(FakeOpenAIHandler.calls, 1)
+        # One lookup per request
+        self.assertEqual((self.summary_cache.hits, self.summary_cache.misses), (1, 1))
+
+    def test_through_the_query_endpoint(self):
+        first = self.post('/api/query/', {'query': 'Analyze Wakad'}).json()['summary']
+        response_cache.clear()
+        second = self.post('/api/query/', {'query': 'Analyze Wakad'}).json()['summary']
+        self.assertEqual(first, second)
+        self.assertEqual(FakeOpenAIHandler.calls, 1)
+
+    def test_expired_entries_are_refreshed_and_purged(self):
+        self.summarize()
+        self.summarize('Analyze Aundh')
+        later = time.time() + self.summary_cache.ttl + 1
+        with mock.patch('api.cache.time.time', return_value=later):
+            self.assertTrue(self.summarize().startswith('Stub summary #3'))
+        self.assertEqual(self.summary_cache.purged, 1)
+
+        rows = self.summary_cache._connect().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        self.assertEqual(rows, 1)
+
+    def test_purges_at_most_once_per_interval(self):
+        cache = SQLiteCache(os.path.join(os.path.dirname(self.summary_cache.path), 'other.sqlite3'), ttl=10, purge_interval=60)
+        with mock.patch.object(cache, 'purge', wraps=cache.purge) as purge:
+            cache.set('a', '1')
+            cache.set('b', '2')
+            self.assertEqual(purge.call_count, 1)
+            with mock.patch('api.cache.time.time', return_value=time.time() + 61):
+                cache.set('c', '3')
+                self.assertIsNone(cache.get('a'))
+            self.assertEqual(purge.call_count, 2)
+
+    def test_concurrent_misses_share_one_call(self):
+        FakeOpenAIHandler.latency = 0.3
+        summaries = []
+        threads = [threading.Thread(target=lambda: summaries.append(self.summarize())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(summaries)), 1)
+        self.assertEqual(FakeOpenAIHandler.calls, 1)
+
+    def test_unavailable_upstream_uses_the_mock_summary(self):
+        with mock.patch.dict(os.environ, {'OPENAI_BASE_URL': 'http://127.0.0.1:9/v1'}):
+            self.assertEqual(self.summarize(), 'mock summary')
+        self.assertEqual(self.summary_cache.misses, 1)
+
+        # The failure was not cached
+        llm._client = None
+        self.assertTrue(self.summarize().startswith('Stub summary #1'))
+
+
+def sse_events(response):
+    """(event, data) pairs of a text/event-stream response."""
+    events = []
+    for block in b''.join(response.streaming_content).decode().split('\n\n'):
+        if block:
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class SummaryStreamTests(FakeOpenAITestCase):
+    def test_analysis_first_then_summary_pieces(self):
+        response = self.post('/api/query/stream/', {'query': 'Analyze Wakad', 'limit': 2})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        events = sse_events(response)
+        names = [name for name, _ in events]
+        self.assertEqual((names[0], names[-1]), ('analysis', 'done'))
+        self.assertTrue(set(names[1:-1]) == {'summary'} and len(names) > 3)
+
+        analysis = events[0][1]
+        self.assertIn('Analysis of Wakad', analysis['summary'])
+        self.assertEqual(len(analysis['tableData']), 2)
+        summary = events[-1][1]['summary']
+        self.assertEqual(''.join(data['text'] for _, data in events[1:-1]), summary)
+        self.assertTrue(summary.startswith('Stub summary #1'))
+
+        # The complete response is cached for the other endpoints and the next stream
+        self.assertEqual(self.post('/api/query/', {'query': 'Analyze Wakad'}).json()['summary'], summary)
+        events = sse_events(self.post('/api/query/stream/', {'query': 'Analyze Wakad'}))
+        self.assertEqual([name for name, _ in events], ['analysis', 'done'])
+        self.assertEqual(events[0][1]['summary'], summary)
+        self.assertEqual(FakeOpenAIHandler.calls, 1)
+
+    def test_failed_summary_keeps_the_mock_one(self):
+        with mock.patch.dict(os.environ, {'OPENAI_BASE_URL': 'http://127.0.0.1:9/v1'}):
+            events = sse_events(self.post('/api/query/stream/', {'query': 'Analyze Wakad'}))
+        self.assertEqual([name for name, _ in events], ['analysis', 'error'])
+        self.assertEqual(events[1][1]['summary'], events[0][1]['summary'])
+        # Not cached: the next request asks OpenAI again
+        self.assertEqual(len(response_cache), 0)
+
+    def test_without_openai(self):
+        with mock.patch.dict(os.environ, {'OPENAI_API_KEY': ''}):
+            events = sse_events(self.post('/api/query/stream/', {'query': 'Analyze Wakad'}))
+        self.assertEqual([name for name, _ in events], ['analysis', 'done'])
+        self.assertEqual(events[1][1]['summary'], events[0][1]['summary'])
+        self.assertEqual(FakeOpenAIHandler.calls, 0)
+
+    def test_rejects_arrow_and_bad_queries(self):
+        self.assertEqual(self.post('/api/query/stream/', {'query': 'Analyze Wakad', 'table_format': 'columnar'}).status_code, 200)
+        self.assertEqual(self.post('/api/query/stream/', {'query': ''}).status_code, 400)
+        response = self.post('/api/query/stream/', {'query': 'Analyze Wakad', 'table_format': 'arrow'})
+        self.assertEqual(response.status_code, 400 if PYARROW_AVAILABLE else 406)
+
+
+class AsyncQueryTests(FakeOpenAITestCase):
+    async def test_same_body_as_the_sync_endpoint(self):
+        response = await self.async_client.post('/api/query/async/', {'query': 'Compare Aundh and Wakad'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertTrue(body['summary'].startswith('Stub summary #1'))
+
+        sync_body = self.post('/api/query/', {'query': 'Compare Aundh and Wakad'}).json()
+        self.assertEqual(body, sync_body)
+        self.assertEqual(FakeOpenAIHandler.calls, 1)
+
+        repeat = await self.async_client.post(
+            '/api/query/async/', {'query': 'Compare Aundh and Wakad'},
+            content_type='application/json', headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(repeat.status_code, 304)
+
+    async def test_blocking_work_runs_off_the_event_loop(self):
+        threads = {}
+
+        def off_loop(name, fn):
+            def wrapper(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    threads[name] = 'event loop'
+                except RuntimeError:
+                    threads[name] = 'thread'
+                return fn(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(views, '_build_analysis', off_loop('analysis', views._build_analysis)), \
+                mock.patch.object(views, '_table_page', off_loop('table', views._table_page)), \
+                mock.patch.object(utils, 'build_summary_request', off_loop('prompt', utils.build_summary_request)), \
+                mock.patch.object(views.response_cache, 'get', off_loop('cache', views.response_cache.get)):
+            response = await self.async_client.post('/api/query/async/', {'query': 'Analyze Wakad'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(threads, {'analysis': 'thread', 'table': 'thread', 'prompt': 'thread', 'cache': 'thread'})
+
+    async def test_slow_upstream_falls_back_to_the_mock_summary(self):
+        FakeOpenAIHandler.latency = 0.5
+        with self.settings(OPENAI_TIMEOUT=0.1):
+            response = await self.async_client.post('/api/query/async/', {'query': 'Analyze Wakad'}, content_type='application/json')
+        body = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Analysis of Wakad', body['summary'])
+        self.assertEqual(llm.breaker.failures, 1)
+
+        # The fallback was not cached: the next request asks OpenAI again
+        FakeOpenAIHandler.latency = 0.0
+        response = await self.async_client.post('/api/query/async/', {'query': 'Analyze Wakad'}, content_type='application/json')
+        self.assertTrue(json.loads(response.content)['summary'].startswith('Stub summary #2'))
+
+
+class QueryBatchTests(ApiTestCase):
+    def test_results_in_request_order_with_shared_intents(self):
+        response = self.post('/api/query/batch/', {'queries': ['Analyze Wakad', 'Compare Aundh and Akurdi', 'analyze  wakad']})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['localities'] for result in results], [['Wakad'], ['Aundh', 'Akurdi'], ['Wakad']])
+        self.assertEqual(results[0], results[2])
+
+    def test_invalid_item_fails_alone(self):
+        response = self.post('/api/query/batch/', {'queries': ['Analyze Wakad', '', {'query': 'Analyze Aundh', 'limit': 0}]})
+        results = response.json()['results']
+        self.assertEqual(results[0]['localities'], ['Wakad'])
+        self.assertEqual(results[1], {'error': 'Query parameter is required', 'status': 400})
+        self.assertEqual(results[2], {'error': 'limit must be positive', 'status': 400})
+
+    def test_failing_intent_fails_alone(self):
+        resolve = views.resolve_intent
+
+        def failing(intent, snapshot):
+            if 'Aundh' in intent['localities']:
+                raise KeyError('flat - weighted average rate')
+            return resolve(intent, snapshot)
+
+        with mock.patch.object(views, 'resolve_intent', failing):
+            response = self.post('/api/query/batch/', {'queries': ['Analyze Wakad', 'Compare Aundh and Akurdi']})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[0]['localities'], ['Wakad'])
+        self.assertEqual(results[1]['status'], 500)
+        self.assertIn('flat - weighted average rate', results[1]['error'])
+
+    def test_rejects_empty_batch(self):
+        self.assertEqual(self.post('/api/query/batch/', {'queries': []}).status_code, 400)
+
+
+class AnalyticsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        df = normalize_dataframe(make_dataframe(200))
+        # Gaps, and a series that starts at zero
+        df = df.drop(index=df.index[::6]).reset_index(drop=True)
+        first = df['final location'] == df['final location'].iloc[0]
+        df.loc[first, 'flat_sold - igr'] = np.arange(first.sum(), dtype=df['flat_sold - igr'].dtype) * 3
+        self.cube = LocalityYearCube(df)
+        self.analytics = LocalityAnalytics(self.cube, window=3)
+
+    def frame(self, locality, metric):
+        return pd.Series(self.cube.series(locality, metric), index=self.cube.years)
+
+    def test_matches_pandas(self):
+        for metric in ('flat - weighted average rate', 'flat_sold - igr'):
+            m = self.cube.metric_codes[metric]
+            for code, locality in enumerate(self.cube.localities):
+                series = self.frame(locality, metric)
+                known = series.dropna()
+                cagr = np.nan
+                if known.iloc[0] > 0:
+                    cagr = (known.iloc[-1] / known.iloc[0]) ** (1 / (known.index[-1] - known.index[0])) * 100 - 100
+                yoy = (series / series.shift(1) - 1) * 100
+                yoy[~np.isfinite(yoy)] = np.nan
+                rolling = series.rolling(3, min_periods=1).mean().where(series.notna())
+                np.testing.assert_allclose(self.analytics.cagr[code, m], cagr)
+                np.testing.assert_allclose(self.analytics.yoy[code, :, m], yoy.to_numpy())
+                np.testing.assert_allclose(self.analytics.rolling[code, :, m], rolling.to_numpy())
+                volatility = yoy.std() if yoy.count() >= 2 else np.nan
+                np.testing.assert_allclose(self.analytics.volatility[code, m], volatility)
+
+    def test_correlation_matches_pandas(self):
+        p = self.analytics.property_types.index('flat')
+        for code, locality in enumerate(self.cube.localities):
+            price, demand = self.frame(locality, 'flat - weighted average rate'), self.frame(locality, 'flat_sold - igr')
+            expected = price.corr(demand, min_periods=3)
+            np.testing.assert_allclose(self.analytics.correlation[code, p], expected, atol=1e-12)
+
+    def test_updated_matches_a_full_rebuild(self):
+        values = self.cube.values.copy()
+        values[[1, 4]] *= 1.5
+        cube = SimpleNamespace(**{**vars(self.cube), 'values': values})
+        updated, rebuilt = self.analytics.updated(cube, np.array([1, 4])), LocalityAnalytics(cube, window=3)
+        for name in LocalityAnalytics.STATISTICS:
+            np.testing.assert_allclose(getattr(updated, name), getattr(rebuilt, name), err_msg=name)
+
+    def test_endpoint(self):
+        body = self.client.get('/api/analytics/', {'localities': 'Wakad,Aundh', 'series': 'true', 'end': 2023}).json()
+        self.assertEqual(body['years'], [2020, 2021, 2022, 2023])
+        wakad = body['localities'][0]
+        self.assertEqual(wakad['locality'], 'Wakad')
+        self.assertEqual(wakad['demand']['yoy'][:2], [None, round((4548 / 3244 - 1) * 100, 2)])
+        self.assertAlmostEqual(wakad['demand']['cagr'], ((4614 / 3244) ** (1 / 3) - 1) * 100, places=2)
+
+        body = self.client.get('/api/analytics/', {'sort': 'price_cagr', 'order': 'asc', 'limit': 2}).json()
+        cagrs = [entry['price']['cagr'] for entry in body['localities']]
+        self.assertEqual((len(cagrs), cagrs), (2, sorted(cagrs)))
+        self.assertEqual(self.client.get('/api/analytics/', {'sort': 'nope'}).status_code, 400)
+
+
+class StoreTests(SimpleTestCase):
+    """The memory and SQLite stores select the same rows."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.memory = MemoryStore(dataset.get_snapshot().store.df)
+        cls.sqlite, _ = dataset.load_store(settings.DATASET_PATH, cls.directory.name, 'sqlite')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def test_counts_and_pages(self):
+        for store in (self.memory, self.sqlite):
+            with self.subTest(store=store.kind):
+                self.assertEqual(store.count(['Wakad', 'Aundh'], [2021, 2023]), 6)
+                page = store.rows(['Wakad', 'Aundh'], None, ['final location', 'year'], 2, 3)
+                self.assertEqual(page['year'].tolist(), [2022, 2023, 2024])
+
+    def test_iter_rows_with_offset_and_limit(self):
+        for store in (self.memory, self.sqlite):
+            with self.subTest(store=store.kind):
+                expected = store.rows(['Wakad', 'Aundh'], None, ['final location', 'year'], 3, 6)
+                chunks = list(store.iter_rows(['Wakad', 'Aundh'], None, ['final location', 'year'], 4, 3, 6))
+                self.assertEqual([len(chunk) for chunk in chunks], [4, 2])
+                self.assertEqual(sum((chunk['year'].tolist() for chunk in chunks), []), expected['year'].tolist())
+                self.assertEqual(list(store.iter_rows(['Wakad'], None, ['year'], 4, 0, 0)), [])
+
+    def test_same_cube(self):
+        memory, sqlite = self.memory.cube, self.sqlite.cube
+        self.assertEqual((sqlite.localities, sqlite.metrics, sqlite.cities), (memory.localities, memory.metrics, memory.cities))
+        self.assertEqual(sqlite.integer_metrics, memory.integer_metrics)
+        np.testing.assert_array_equal(sqlite.years, memory.years)
+        np.testing.assert_array_equal(sqlite.row_index, memory.row_index)
+        np.testing.assert_array_equal(sqlite.values, memory.values)
+        self.assertEqual(sqlite.locality_rows('Aundh').tolist(), memory.locality_rows('Aundh').tolist())
+
+    def test_sqlite_file_is_reused(self):
+        path = dataset.ensure_sqlite(settings.DATASET_PATH, self.directory.name)
+        with mock.patch.object(dataset, 'read_source', side_effect=AssertionError('workbook read')):
+            self.assertEqual(dataset.ensure_sqlite(settings.DATASET_PATH, self.directory.name), path)
+        with self.assertRaises(ValueError):
+            dataset.load_store(settings.DATASET_PATH, self.directory.name, 'parquet')
+
+
+class SQLiteStorageTests(ApiTestCase):
+    """The API answers the same from a SQLite-backed snapshot."""
+
+    def test_same_responses(self):
+        queries = ['Analyze Wakad', 'Compare Aundh and Akurdi office prices since 2021', 'top 3 localities by demand growth']
+        memory = [self.post('/api/query/', {'query': query, 'limit': 4}).json() for query in queries]
+        memory.append(b''.join(self.post('/api/export/', {'localities': ['Wakad'], 'format': 'jsonl'}).streaming_content))
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = dataset.build_snapshot(str(settings.DATASET_PATH), directory, 'sqlite')
+            with mock.patch.object(dataset, '_snapshot', snapshot):
+                response_cache.clear()
+                sqlite = [self.post('/api/query/', {'query': query, 'limit': 4}).json() for query in queries]
+                sqlite.append(b''.join(self.post('/api/export/', {'localities': ['Wakad'], 'format': 'jsonl'}).streaming_content))
+                health = self.client.get('/api/health/').json()
+        self.assertEqual(sqlite, memory)
+        self.assertEqual(health['storage'], 'sqlite')
+
+
+class IncrementalIngestTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store, _ = dataset.load_store(settings.DATASET_PATH, directory.name, 'sqlite')
+
+    def ingest(self, df, mode='upsert'):
+        ingest_sqlite(self.store.path, df, mode)
+
+    def test_matches_a_full_rebuild(self):
+        # A repeated (locality, year) row, then a new year with whole numbers sent as floats
+        self.ingest(self.store.rows(['Aundh'], [2020, 2020]), mode='append')
+        batch = self.store.rows(['Wakad'], [2024, 2024])
+        batch['year'] = 2025
+        batch['flat_sold - igr'] = batch['flat_sold - igr'].astype(float) + 10
+        self.ingest(batch)
+
+        updated = SQLiteStore(self.store.path, previous=self.store)
+        rebuilt = SQLiteStore(self.store.path)
+        self.assertIsNotNone(updated.changed)
+        for name in ('values', 'row_index', 'years', 'locality_city'):
+            np.testing.assert_array_equal(getattr(updated.cube, name), getattr(rebuilt.cube, name))
+        for locality in updated.cube.localities:
+            np.testing.assert_array_equal(updated.cube.locality_rows(locality), rebuilt.cube.locality_rows(locality))
+        self.assertEqual(len(updated.cube.locality_rows('Aundh')), 6)
+
+        # Still rendered as integers, in the batch's columns and the others
+        self.assertIn('flat_sold - igr', updated.cube.integer_metrics)
+        self.assertEqual(updated.cube.integer_metrics, self.store.cube.integer_metrics)
+        self.assertEqual(updated.cube.to_list(updated.cube.series('Wakad', 'flat_sold - igr'), 'flat_sold - igr')[-1], 3242)
+
+    def test_fractions_make_a_column_float(self):
+        batch = self.store.rows(['Wakad'], [2024, 2024])
+        batch['total units'] = 0.5
+        self.ingest(batch)
+        updated = SQLiteStore(self.store.path, previous=self.store)
+        self.assertNotIn('total units', updated.cube.integer_metrics)
+        self.assertIn('flat_sold - igr', updated.cube.integer_metrics)
+
+    def test_open_store_counts_ingested_rows(self):
+        batch = self.store.rows(['Wakad'], [2024, 2024])
+        batch['year'] = 2025
+        self.ingest(batch)
+        self.ingest(self.store.rows(['Aundh'], [2020, 2020]), mode='append')
+        self.assertEqual(self.store.count(), 22)
+        self.assertEqual(self.store.count(), len(self.store.rows()))
+        self.assertEqual(self.store.count(['Wakad']), 6)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0088 * np.arcsin(np.sqrt(a))
+
+
+class GeoIndexTests(ApiTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        df = normalize_dataframe(make_dataframe(10000))
+        # One locality without coordinates
+        df.loc[df['final location'] == df['final location'].iloc[0], ['loc_lat', 'loc_lng']] = np.nan
+        cls.df = df
+        cls.cube = LocalityYearCube(df)
+        cls.index = LocalityGeoIndex(cls.cube)
+
+    def brute_force(self, lat, lng):
+        distances = haversine_km(lat, lng, self.index.latitudes, self.index.longitudes)
+        order = [code for code in np.argsort(distances, kind='stable') if np.isfinite(distances[code])]
+        return [(self.cube.localities[code], distances[code]) for code in order]
+
+    def assertSameResults(self, found, expected):
+        self.assertEqual([name for name, _ in found], [name for name, _ in expected])
+        np.testing.assert_allclose([distance for _, distance in found], [distance for _, distance in expected], rtol=1e-6)
+
+    def test_matches_a_brute_force_scan(self):
+        rng = np.random.default_rng(1)
+        self.assertEqual(len(self.index), len(self.cube.localities) - 1)
+        for lat, lng in zip(rng.uniform(17, 22, 20), rng.uniform(72, 80, 20)):
+            expected = self.brute_force(lat, lng)
+            self.assertSameResults(self.index.nearest_to(lat, lng, k=7), expected[:7])
+            within = [(name, distance) for name, distance in expected if distance <= 40]
+            self.assertSameResults(self.index.nearest_to(lat, lng, k=None, radius_km=40), within)
+            self.assertSameResults(self.index.nearest_to(lat, lng, k=3, radius_km=40), within[:3])
+
+    def test_nearest_to_a_locality(self):
+        locality = self.cube.localities[5]
+        expected = [(name, distance) for name, distance in self.brute_force(*self.index.coordinates(locality)) if name != locality]
+        self.assertSameResults(self.index.nearest(locality, k=4), expected[:4])
+        self.assertEqual(self.index.nearest(self.cube.localities[0]), [])
+        self.assertEqual(self.index.nearest_to(19, 75, k=0), [])
+        with self.assertRaises(ValueError):
+            self.index.nearest_to(19, 75, k=None)
+
+    def test_updated_reuses_the_tree_unless_coordinates_move(self):
+        df = self.df.copy()
+        locality = self.cube.localities[5]
+        rows = df['final location'] == locality
+        code = np.array([5])
+        df.loc[rows, 'flat_sold - igr'] = df.loc[rows, 'flat_sold - igr'] + 1
+        index = self.index.updated(LocalityYearCube(df), code)
+        self.assertIs(index._points, self.index._points)
+
+        df.loc[rows, 'loc_lat'] = df.loc[rows, 'loc_lat'] + 1
+        cube = LocalityYearCube(df)
+        index = self.index.updated(cube, code)
+        self.assertIsNot(index._points, self.index._points)
+        self.assertEqual(index.coordinates(locality)[0], df.loc[rows, 'loc_lat'].iloc[0])
+        self.assertEqual(index.nearest(locality, k=3), LocalityGeoIndex(cube).nearest(locality, k=3))
+
+    def test_endpoint(self):
+        body = self.client.get('/api/nearby/', {'locality': 'Wakad', 'k': 2}).json()
+        self.assertEqual(body['center']['locality'], 'Wakad')
+        self.assertEqual(body['count'], 2)
+        center = body['center']
+        for entry in body['localities']:
+            self.assertAlmostEqual(entry['distanceKm'], haversine_km(center['lat'], center['lng'], entry['lat'], entry['lng']), places=2)
+        distances = [entry['distanceKm'] for entry in body['localities']]
+        self.assertEqual(distances, sorted(distances))
+
+        body = self.client.get('/api/nearby/', {'lat': center['lat'], 'lng': center['lng'], 'radius_km': 10 ** 4}).json()
+        self.assertEqual([entry['locality'] for entry in body['localities']][0], 'Wakad')
+        self.assertEqual(body['count'], 4)
+
+    def test_endpoint_rejects_bad_parameters(self):
+        for params, error in [({}, 'Give a locality, or lat and lng'), ({'locality': 'Nowhere'}, 'Unknown locality: Nowhere'),
+                              ({'lat': 91, 'lng': 0}, 'lat must be within'), ({'locality': 'Wakad', 'k': 0}, 'k must be positive'),
+                              ({'locality': 'Wakad', 'radius_km': -1}, 'radius_km must be positive')]:
+            response = self.client.get('/api/nearby/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(error, response.json()['error'])
+
+
+class SimilarLocalitiesTests(ApiTestCase):
+    def test_nearest_first_without_the_locality_itself(self):
+        response = self.client.get('/api/similar/', {'locality': 'Aundh', 'k': 2})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['count'], 2)
+        scores = [entry['score'] for entry in body['localities']]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertNotIn('Aundh', [entry['locality'] for entry in body['localities']])
+        self.assertEqual({entry['city'] for entry in body['localities']}, {'Pune'})
+
+    def test_euclidean_scores_are_distances(self):
+        body = self.client.get('/api/similar/', {'locality': 'Wakad', 'metric': 'euclidean', 'k': 10}).json()
+        scores = [entry['score'] for entry in body['localities']]
+        self.assertEqual(len(scores), 3)
+        self.assertEqual(scores, sorted(scores))
+
+    def test_city_filter(self):
+        body = self.client.get('/api/similar/', {'locality': 'Wakad', 'city': 'Pune'}).json()
+        self.assertEqual(body['count'], 3)
+
+    def test_rejects_bad_parameters(self):
+        for params, error in [({'locality': 'Wakad', 'city': 'Atlantis'}, 'Unknown city: Atlantis'),
+                              ({'locality': 'Nowhere'}, 'Unknown locality: Nowhere'), ({}, 'Give a locality'),
+                              ({'locality': 'Wakad', 'k': 0}, 'k must be positive'),
+                              ({'locality': 'Wakad', 'metric': 'manhattan'}, 'metric must be one of')]:
+            response = self.client.get('/api/similar/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(error, response.json()['error'])
+
+
+def holt(years, values, alpha, beta, damping):
+    """Scalar damped Holt smoothing started from the least-squares slope, as a reference."""
+    points = [(year, value) for year, value in zip(years, values) if not np.isnan(value)]
+    slope = np.polyfit([year for year, _ in points], [value for _, value in points], 1)[0]
+    (seen, level), trend = points[0], slope
+    for year, value in points[1:]:
+        gap = year - seen
+        carried = sum(damping ** step for step in range(1, gap + 1))
+        smoothed = alpha * value + (1 - alpha) * (level + carried * trend)
+        trend = beta * (smoothed - level) / gap + (1 - beta) * damping ** gap * trend
+        level, seen = smoothed, year
+    return lambda year: level + trend * sum(damping ** step for step in range(1, year - seen + 1))
+
+
+class ForecastTests(ApiTestCase):
+    years = np.arange(2020, 2025)
+
+    def fit(self, rows, model='exponential', smoothing=(0.5, 0.3, 0.8)):
+        cube = SimpleNamespace(years=self.years, values=np.array(rows, dtype=np.float64)[:, :, None])
+        return LocalityForecast(cube, model, smoothing)
+
+    def test_exponential_matches_scalar_reference(self):
+        rows = [[100, 180, np.nan, 420, 470], [3244, 4548, 6378, 4614, 3232], [50, 40, 35, 30, 28]]
+        for smoothing in [(0.5, 0.3, 0.8), (0.8, 0.1, 1.0)]:
+            forecast = self.fit(rows, smoothing=smoothing)
+            for year in (2025, 2027):
+                expected = [holt(self.years.tolist(), row, *smoothing)(year) for row in rows]
+                np.testing.assert_allclose(forecast.predict(year)[:, 0], expected)
+
+    def test_early_jump_does_not_set_the_trend(self):
+        forecast = self.fit([[3244, 4548, 6378, 4614, 3232], [100, 200, 100, 100, 100]])
+        wakad, flat = forecast.predict(2025)[:, 0]
+        self.assertLess(wakad, 4548)
+        self.assertLess(forecast.predict(2026)[0, 0], wakad)
+        self.assertAlmostEqual(flat, 100, delta=10)
+
+    def test_damped_trend_levels_off(self):
+        forecast = self.fit([[100, 200, 300, 400, 500]])
+        steps = np.diff([forecast.predict(year)[0, 0] for year in range(2024, 2030)])
+        self.assertTrue(np.all(steps > 0) and np.all(np.diff(steps) < 0))
+        undamped = self.fit([[100, 200, 300, 400, 500]], smoothing=(0.5, 0.3, 1.0))
+        self.assertAlmostEqual(undamped.predict(2026)[0, 0], 700)
+
+    def test_rejects_factors_out_of_range(self):
+        with self.assertRaises(ValueError):
+            self.fit([[1, 2, 3, 4, 5]], smoothing=(0.5, 0.0, 0.8))
+
+    def test_short_series_has_no_projection(self):
+        forecast = self.fit([[np.nan, np.nan, np.nan, np.nan, 7]])
+        self.assertTrue(np.isnan(forecast.predict(2025)[0, 0]))
+
+    def test_endpoint(self):
+        response = self.client.get('/api/forecast/', {'localities': 'Wakad,Aundh', 'year': 2025, 'model': 'exponential'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([entry['locality'] for entry in body['localities']], ['Wakad', 'Aundh'])
+        wakad = body['localities'][0]['demand']
+        self.assertEqual((wakad['lastYear'], wakad['last']), (2024, 3232))
+        self.assertLess(wakad['change'], 40)
+
+    def test_endpoint_rejects_bad_parameters(self):
+        for params, error in [({'model': 'arima'}, 'model must be one of'), ({'city': 'Atlantis'}, 'Unknown city: Atlantis'),
+                              ({'localities': 'Nowhere'}, 'Unknown localities: Nowhere'), ({'limit': 0}, 'limit must be positive')]:
+            response = self.client.get('/api/forecast/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(error, response.json()['error'])
+
+
+class WarmupTests(FakeOpenAITestCase):
+    def test_derives_the_default_tables_without_openai(self):
+        current = dataset.get_snapshot()
+        snapshot = dataset.DatasetSnapshot(
+            current.version, MemoryStore(current.store.df), current.source_path, current.source_fingerprint
+        )
+        with mock.patch.object(dataset, 'get_snapshot', return_value=snapshot):
+            self.assertGreaterEqual(warmup.warm_up(), 0)
+        self.assertEqual(FakeOpenAIHandler.calls, 0)
+        for key in (('analytics', settings.ANALYTICS_ROLLING_WINDOW), 'similarity', ('forecast', settings.FORECAST_MODEL)):
+            self.assertIn(key, snapshot._derived)
+
+    def test_without_a_dataset(self):
+        with mock.patch.object(dataset, 'get_snapshot', return_value=None):
+            self.assertGreaterEqual(warmup.warm_up(), 0)
+
+
+class GunicornConfigTests(SimpleTestCase):
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            for name in [name for name in os.environ if name.startswith(('GUNICORN_', 'WEB_CONCURRENCY')) and name not in environ]:
+                del os.environ[name]
+            config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+            return config, os.environ.get('DATASET_WATCH_AFTER_FORK')
+
+    def test_defaults(self):
+        config, watch_after_fork = self.load(OPENAI_TIMEOUT='20', OPENAI_MAX_CONCURRENCY='8')
+        self.assertTrue(config['preload_app'])
+        self.assertEqual(watch_after_fork, 'True')
+        self.assertEqual(config['worker_class'], 'gthread')
+        self.assertEqual(config['wsgi_app'], 'backend.wsgi:application')
+        self.assertEqual(config['threads'], 12)
+        self.assertEqual(config['timeout'], 40)
+        self.assertEqual(config['graceful_timeout'], 30)
+        self.assertGreaterEqual(config['workers'], 2)
+
+    def test_environment_overrides(self):
+        config, _ = self.load(GUNICORN_WORKER_CLASS='uvicorn', GUNICORN_THREADS='3', GUNICORN_PRELOAD='False',
+                              GUNICORN_MAX_REQUESTS='500', WEB_CONCURRENCY='1')
+        self.assertEqual(config['worker_class'], 'uvicorn.workers.UvicornWorker')
+        self.assertEqual(config['wsgi_app'], 'backend.asgi:application')
+        self.assertEqual((config['threads'], config['workers']), (3, 1))
+        self.assertEqual((config['max_requests'], config['max_requests_jitter']), (500, 50))
+        self.assertFalse(config['preload_app'])
+
+    def test_master_warms_up_and_freezes_before_forking(self):
+        config, _ = self.load(GUNICORN_PRELOAD='True')
+        server = SimpleNamespace(log=mock.Mock())
+        self.addCleanup(gc.unfreeze)
+        with mock.patch.object(warmup, 'warm_up', return_value=0.5) as warm:
+            config['when_ready'](server)
+        warm.assert_called_once_with()
+        self.assertGreater(gc.get_freeze_count(), 0)
+        server.log.info.assert_called_once()
+
+        with mock.patch.object(apps, 'start_dataset_watcher') as start:
+            config['post_fork'](server, None)
+        start.assert_called_once_with()
+
+    def test_no_warmup_without_preload(self):
+        config, _ = self.load(GUNICORN_PRELOAD='False')
+        with mock.patch.object(warmup, 'warm_up') as warm, mock.patch.object(apps, 'start_dataset_watcher') as start:
+            config['when_ready'](SimpleNamespace(log=mock.Mock()))
+            config['post_fork'](None, None)
+        warm.assert_not_called()
+        start.assert_not_called()
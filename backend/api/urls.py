@@ -6,7 +6,17 @@ from . import views
 
 urlpatterns = [
     path('query/', views.query_analysis, name='query_analysis'),
+    path('query/stream/', views.query_stream, name='query_stream'),
+    path('query/async/', views.query_analysis_async, name='query_analysis_async'),
+    path('query/batch/', views.query_batch, name='query_batch'),
     path('localities/', views.get_localities, name='get_localities'),
+    path('analytics/', views.locality_analytics, name='locality_analytics'),
+    path('forecast/', views.forecast_localities, name='forecast_localities'),
+    path('nearby/', views.nearby_localities, name='nearby_localities'),
+    path('similar/', views.similar_localities, name='similar_localities'),
     path('health/', views.health_check, name='health_check'),
     path('download/', views.download_data, name='download_data'),
+    path('export/', views.export_data, name='export_data'),
+    path('admin/reload/', views.reload_dataset, name='reload_dataset'),
+    path('admin/ingest/', views.ingest_dataset, name='ingest_dataset'),
 ]
@@ -4,35 +4,246 @@ Utility functions for query parsing and analysis generation
 import re
 import os
 import json
-from typing import List, Dict, Any
+import copy
+import base64
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+import numpy as np
 import pandas as pd
+from . import llm
+from .analytics import window_analytics
+from .cache import AsyncSingleFlight, LRUCache, SQLiteCache, SingleFlight, make_cache
+from .dataset import DatasetSnapshot
+from .index import CubeBlock, LocalityYearCube
+from .engine import PROPERTY_LABELS, metric_column, window_aggregates
+from .matcher import LocalityMatcher, normalize_text
+from .renderers import dumps
 
-# OpenAI integration (optional)
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
 
+# Words that select a property type (default: flat)
+PROPERTY_KEYWORDS = {
+    'flat': ['flat', 'flats', 'apartment', 'apartments', 'residential'],
+    'office': ['office', 'offices'],
+    'shop': ['shop', 'shops', 'retail'],
+    'others': ['others', 'other property', 'other properties'],
+}
 
-def parse_query_intent(query: str, available_localities: List[str]) -> Dict[str, Any]:
+YEAR_PATTERN = r'((?:19|20)\d{2})'
+# Words after which a lone number is a year ("in 2023", "year 2023")
+YEAR_WORDS = r'(?:in|for|during|by|year|fy)'
+RANKING_LIMIT_PATTERN = re.compile(r'\b(top|bottom)\s+(\d+)\b')
+RANKING_WORDS = re.compile(
+    r'\b(top|bottom|rank|ranking|ranked|highest|lowest|best|worst|fastest|slowest|'
+    r'most|least|cheapest|costliest|priciest)\b'
+)
+ASCENDING_WORDS = re.compile(r'\b(bottom|lowest|worst|slowest|least|cheapest)\b')
+GROWTH_WORDS = re.compile(r'\b(growth|grew|growing|increase|appreciation|change|rise|fastest|slowest)\b')
+TOTAL_WORDS = re.compile(r'\b(total|overall|cumulative)\b')
+DEFAULT_RANKING_LIMIT = 5
+NEARBY_WORDS = re.compile(r'\b(near|nearby|nearest|closest|neighbou?rs?|neighbou?ring|neighbou?rhood|surrounding|close to)\b')
+NEARBY_RADIUS_PATTERN = re.compile(r'\bwithin\s+(\d+(?:\.\d+)?)\s*(km|kms|kilomet(?:er|re)s?|m|meters?|metres?)\b')
+NEARBY_COUNT_PATTERN = re.compile(
+    r'\b(\d+)\s+(?:nearest|closest|nearby|neighbou?ring|neighbou?rs?)\b|\b(?:nearest|closest)\s+(\d+)\b'
+)
+DEFAULT_NEARBY_LIMIT = 5
+SIMILAR_WORDS = re.compile(
+    r'\b(?:similar|comparable|resembl\w*|alike)\b'
+    r'|\b(?:localities|locality|areas|area|places|ones|are|is|looks?)\s+(?:just\s+)?like\b'
+)
+SIMILAR_COUNT_PATTERN = re.compile(r'\b(\d+)\s+(?:most\s+)?(?:similar|comparable|localities|areas|places)\b')
+DEFAULT_SIMILAR_LIMIT = 5
+FORECAST_WORDS = re.compile(
+    r'\b(?:forecast\w*|predict\w*|projections?|projected|outlook|future|next\s+(?:\d+\s+)?years?|coming\s+years?)\b'
+)
+FORECAST_HORIZON_PATTERN = re.compile(r'\bnext\s+(\d+)\s+years\b')
+# Words that pick a trend model (default: FORECAST_MODEL)
+FORECAST_MODEL_WORDS = {
+    'log_linear': re.compile(r'\blog[\s-]?linear\b|\bcompound(?:ed|ing)?\b|\bexponential\s+growth\b'),
+    'exponential': re.compile(r'\bsmoothing\b|\bholt\b'),
+    'linear': re.compile(r'\blinear\b'),
+}
+FORECAST_LABELS = {'linear': 'linear trend', 'log_linear': 'compound growth trend', 'exponential': 'exponential smoothing'}
+
+
+def _find_property_type(query_lower: str) -> str:
+    """Property type mentioned first in the query (flat if none)."""
+    best, best_position = 'flat', None
+    for property_type, words in PROPERTY_KEYWORDS.items():
+        for word in words:
+            match = re.search(rf'\b{word}\b', query_lower)
+            if match and (best_position is None or match.start() < best_position):
+                best, best_position = property_type, match.start()
+    return best
+
+
+def _find_years(query_lower: str, known_years: Optional[Tuple[int, int]] = None, forecast: bool = False) -> Optional[Dict[str, int]]:
+    """
+    Year filter mentioned in the query.
+    
+    Understands "2021-2024", "between 2021 and 2024", "since 2022",
+    "before 2023", "last 3 years" and a single year ("in 2023").
+    
+    A lone number is only a year after a year word ("in 2023", "year
+    2023") or within ``known_years``, the dataset's (first, last) year;
+    forecasts also take later ones ("forecast Wakad 2025"). So "within
+    2000 m" or "budget 1950 per sqft" are not years.
+    """
+    match = re.search(rf'\b{YEAR_PATTERN}\s*(?:-|–|to|until|till|through)\s*{YEAR_PATTERN}\b', query_lower) \
+        or re.search(rf'\bbetween\s+{YEAR_PATTERN}\s+and\s+{YEAR_PATTERN}\b', query_lower)
+    if match:
+        first, second = sorted((int(match.group(1)), int(match.group(2))))
+        return {'start': first, 'end': second}
+    
+    match = re.search(r'\b(?:last|past|previous)\s+(\d+)\s+years?\b', query_lower)
+    if match:
+        return {'last': int(match.group(1))}
+    
+    match = re.search(rf'\b(since|from|after)\s+{YEAR_PATTERN}\b', query_lower)
+    if match:
+        return {'start': int(match.group(2)) + (1 if match.group(1) == 'after' else 0)}
+    
+    match = re.search(rf'\b(before|until|till|upto|up to)\s+{YEAR_PATTERN}\b', query_lower)
+    if match:
+        return {'end': int(match.group(2)) - (1 if match.group(1) == 'before' else 0)}
+    
+    match = re.search(rf'\b{YEAR_WORDS}\s+{YEAR_PATTERN}\b', query_lower)
+    if match:
+        return {'start': int(match.group(1)), 'end': int(match.group(1))}
+    
+    if known_years is not None:
+        first, last = known_years
+        for match in re.finditer(rf'\b{YEAR_PATTERN}\b', query_lower):
+            year = int(match.group(1))
+            if first <= year and (year <= last or forecast):
+                return {'start': year, 'end': year}
+    
+    return None
+
+
+def _find_ranking(query_lower: str, metrics: List[str], has_localities: bool) -> Optional[Dict[str, Any]]:
+    """
+    Ranking request in the query ("top 5 localities by price growth"), if any.
+    
+    Superlatives alone ("highest demand") only rank when no locality is
+    named; with localities they stay a normal comparison.
+    """
+    limit_match = RANKING_LIMIT_PATTERN.search(query_lower)
+    explicit = limit_match is not None or re.search(r'\b(top|bottom|rank|ranking|ranked)\b', query_lower)
+    if not explicit and (has_localities or not RANKING_WORDS.search(query_lower)):
+        return None
+    
+    price_words = 'price' in query_lower or 'rate' in query_lower or 'cost' in query_lower
+    by = 'demand' if 'demand' in metrics and not price_words else 'price'
+    
+    if GROWTH_WORDS.search(query_lower):
+        measure = 'growth'
+    elif TOTAL_WORDS.search(query_lower) and by == 'demand':
+        measure = 'total'
+    else:
+        measure = 'level'
+    
+    return {
+        'by': by,
+        'measure': measure,
+        'order': 'asc' if ASCENDING_WORDS.search(query_lower) else 'desc',
+        'limit': int(limit_match.group(2)) if limit_match else (
+            1 if re.search(r'\blocality\b', query_lower) else DEFAULT_RANKING_LIMIT
+        ),
+    }
+
+
+def _find_nearby(query_lower: str) -> Optional[Dict[str, Any]]:
+    """
+    Neighbourhood request in the query, if any: "localities near Wakad within
+    5 km" ({'limit': None, 'radius_km': 5.0}), "Aundh and its 3 nearest
+    neighbours" ({'limit': 3, 'radius_km': None}).
+    """
+    radius_match = NEARBY_RADIUS_PATTERN.search(query_lower)
+    if radius_match is None and not NEARBY_WORDS.search(query_lower):
+        return None
+    
+    radius_km = None
+    if radius_match:
+        radius_km = float(radius_match.group(1))
+        if radius_match.group(2).startswith('m'):
+            radius_km /= 1000
+    
+    count_match = NEARBY_COUNT_PATTERN.search(query_lower)
+    if count_match:
+        limit = int(count_match.group(1) or count_match.group(2))
+    else:
+        limit = None if radius_km is not None else DEFAULT_NEARBY_LIMIT
+    
+    return {'limit': limit, 'radius_km': radius_km}
+
+
+def _find_similar(query_lower: str) -> Optional[Dict[str, Any]]:
+    """
+    Similarity request in the query, if any: "which localities are like
+    Aundh" ({'limit': 5, 'metric': 'cosine'}), "3 localities similar to Wakad".
+    """
+    if not SIMILAR_WORDS.search(query_lower):
+        return None
+    count_match = SIMILAR_COUNT_PATTERN.search(query_lower) or RANKING_LIMIT_PATTERN.search(query_lower)
+    return {
+        'limit': int(count_match.group(count_match.lastindex)) if count_match else DEFAULT_SIMILAR_LIMIT,
+        'metric': 'euclidean' if re.search(r'\beuclidean\b', query_lower) else 'cosine',
+    }
+
+
+def _find_forecast(query_lower: str) -> Optional[Dict[str, Any]]:
+    """
+    Forecast request in the query, if any: "forecast Wakad" ({'year': None,
+    'horizon': 1, 'model': None}), "Aundh prices in the next 3 years with
+    exponential smoothing" ({'horizon': 3, 'model': 'exponential'}).
+    
+    The target year itself ("forecast Wakad 2025") is taken from the year
+    filter by ``parse_query_intent``.
+    """
+    if not FORECAST_WORDS.search(query_lower):
+        return None
+    horizon_match = FORECAST_HORIZON_PATTERN.search(query_lower)
+    model = next((model for model, words in FORECAST_MODEL_WORDS.items() if words.search(query_lower)), None)
+    return {'year': None, 'horizon': int(horizon_match.group(1)) if horizon_match else 1, 'model': model}
+
+
+def parse_query_intent(
+    query: str,
+    matcher: LocalityMatcher,
+    cities: List[str] = (),
+    known_years: Optional[Tuple[int, int]] = None
+) -> Dict[str, Any]:
     """
     Parse the user query to extract intent and localities.
     
+    Localities are found by the snapshot's compiled matcher (exact names,
+    aliases and near-miss spellings), in the order they appear in the query.
+    ``known_years`` is the dataset's (first, last) year, within which a
+    lone number in the query counts as a year.
+    
     Returns:
         {
-            'type': 'single' or 'comparison',
+            'type': 'single', 'comparison' or 'ranking',
             'localities': list of locality names,
-            'metrics': list of metrics to show (price, demand, etc.)
+            'metrics': list of metrics to show (price, demand, etc.),
+            'property_type': 'flat', 'office', 'shop' or 'others',
+            'years': year filter ({'start', 'end'} or {'last'}) or None,
+            'ranking': {'by', 'measure', 'order', 'limit'} or None,
+            'city': city to rank within, or None,
+            'nearby': {'limit', 'radius_km'} to add the first locality's
+                nearest neighbours, or None,
+            'similar': {'limit', 'metric'} to add the localities most like
+                the first one, or None,
+            'forecast': {'year', 'horizon', 'model'} to project the
+                localities' trends, or None
         }
     """
     query_lower = query.lower()
     
     # Find mentioned localities
-    found_localities = []
-    for locality in available_localities:
-        if locality.lower() in query_lower:
-            found_localities.append(locality)
+    found_localities = matcher.find(query)
     
     # Determine metrics to show
     metrics = []
@@ -41,28 +252,162 @@ def parse_query_intent(query: str, available_localities: List[str]) -> Dict[str,
     if 'demand' in query_lower or 'sold' in query_lower or 'sales' in query_lower:
         metrics.append('demand')
     
-    # If no specific metric mentioned, show both
+    nearby = _find_nearby(query_lower)
+    similar = _find_similar(query_lower)
+    # "cheapest locality near Wakad" ranks the neighbourhood; "top 3 like Aundh" is a similarity count
+    ranking = None if similar else _find_ranking(query_lower, metrics, bool(found_localities) and nearby is None)
+    
+    # If no specific metric mentioned, show both (or just the ranked one)
     if not metrics:
-        metrics = ['price', 'demand']
+        metrics = [ranking['by']] if ranking else ['price', 'demand']
     
     # Determine type
-    intent_type = 'comparison' if len(found_localities) > 1 else 'single'
+    if ranking:
+        intent_type = 'ranking'
+    else:
+        intent_type = 'comparison' if len(found_localities) > 1 else 'single'
+    
+    forecast = _find_forecast(query_lower)
+    years = _find_years(query_lower, known_years, forecast is not None)
+    if forecast and years and years.get('start') is not None and years.get('start') == years.get('end'):
+        # "forecast Wakad 2025": the year is the one to project to, not a filter
+        forecast['year'], years = years['start'], None
+    
+    normalized = normalize_text(query)
+    city = next((name for name in cities if re.search(rf'\b{re.escape(normalize_text(name))}\b', normalized)), None)
     
     return {
         'type': intent_type,
         'localities': found_localities,
-        'metrics': metrics
+        'metrics': metrics,
+        'property_type': _find_property_type(query_lower),
+        'years': years,
+        'ranking': ranking,
+        'city': city,
+        'nearby': nearby,
+        'similar': similar,
+        'forecast': forecast
     }
 
 
-def filter_data_by_locality(df: pd.DataFrame, locality: str) -> pd.DataFrame:
-    """Filter DataFrame by locality name."""
-    return df[df['final location'] == locality].sort_values('year')
+# Parsed intents keyed by (dataset version, normalized query text)
+intent_cache = LRUCache(settings.INTENT_CACHE_SIZE)
+
 
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as cache key."""
+    return ' '.join(query.lower().split())
 
-def extract_chart_data(df: pd.DataFrame, localities: List[str], metrics: List[str]) -> Dict[str, Any]:
+
+def get_query_intent(query: str, snapshot: DatasetSnapshot) -> Dict[str, Any]:
+    """
+    Parse the query intent, memoized per dataset version.
+    
+    Repeated phrasings ("Analyze Wakad") skip parsing entirely. Returns a
+    copy, so callers are free to modify it.
     """
-    Extract chart data from the filtered DataFrame.
+    key = (snapshot.version, normalize_query(query))
+    intent = intent_cache.get(key)
+    
+    if intent is None:
+        years = snapshot.cube.years
+        known_years = (int(years[0]), int(years[-1])) if len(years) else None
+        intent = parse_query_intent(query, snapshot.matcher, snapshot.cube.cities, known_years)
+        intent_cache.set(key, intent)
+    
+    return copy.deepcopy(intent)
+
+
+response_cache = make_cache(
+    settings.RESPONSE_CACHE_BACKEND,
+    maxsize=settings.RESPONSE_CACHE_SIZE,
+    alias=settings.RESPONSE_CACHE_ALIAS,
+    timeout=settings.RESPONSE_CACHE_TIMEOUT
+)
+
+# Intent fields that determine the response
+RESPONSE_KEY_FIELDS = ['type', 'localities', 'metrics', 'property_type', 'years', 'ranking', 'city', 'nearby', 'similar', 'forecast']
+
+
+def response_cache_key(intent: Dict[str, Any], version: str) -> str:
+    """
+    Cache key of the response to a parsed intent on one dataset version.
+    
+    Differently worded queries with the same intent share a key. Localities
+    keep their query order, which is visible in the response; metrics are
+    sorted. The version prefix retires every entry when the dataset changes.
+    """
+    canonical = {field: intent.get(field) for field in RESPONSE_KEY_FIELDS}
+    canonical['metrics'] = sorted(canonical['metrics'] or [])
+    digest = hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+    return f'query:{version}:{digest[:32]}'
+
+
+def make_etag(data: Dict[str, Any]) -> str:
+    """Strong ETag of a response body, as rendered to JSON."""
+    return '"' + hashlib.sha256(dumps(data)).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag`` (strong comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def encode_cursor(version: str, offset: int) -> str:
+    """Opaque tableData cursor: a row offset bound to one dataset version."""
+    return base64.urlsafe_b64encode(f'{version}:{offset}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, version: str) -> int:
+    """
+    Row offset of a cursor made by ``encode_cursor``.
+    
+    Raises:
+        ValueError: if the cursor is malformed or from another dataset version
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_version, offset = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if cursor_version != version:
+        raise ValueError('Cursor is from an older dataset version; repeat the query')
+    return max(0, offset)
+
+
+def make_page_etag(etag: str, version: str, *page: Any) -> str:
+    """Strong ETag of one table page of a cached response (the page is a function of its inputs)."""
+    digest = hashlib.sha256(repr((etag, version) + page).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def filter_data_by_locality(df: pd.DataFrame, cube: LocalityYearCube, locality: str) -> pd.DataFrame:
+    """Rows of one locality, sorted by year (looked up through the cube index)."""
+    return df.iloc[cube.locality_rows(locality)]
+
+
+def filter_data(snapshot: DatasetSnapshot, localities: Optional[List[str]], year_range: Optional[List[int]] = None) -> pd.DataFrame:
+    """Rows of ``localities`` (all rows if None), optionally within ``year_range``, in dataset order."""
+    return snapshot.store.rows(localities, year_range)
+
+
+def extract_chart_data(
+    cube: LocalityYearCube,
+    localities: List[str],
+    metrics: List[str],
+    property_type: str = 'flat',
+    year_range: Optional[List[int]] = None,
+    block: Optional[CubeBlock] = None
+) -> Dict[str, Any]:
+    """
+    Extract chart data from the dataset's cube index.
+    
+    Values are read from ``block`` instead when given (batches, see
+    ``LocalityYearCube.block``); it must cover these localities and metrics.
     
     Returns:
         {
@@ -75,55 +420,49 @@ def extract_chart_data(df: pd.DataFrame, localities: List[str], metrics: List[st
         'years': []
     }
     
+    # Weighted average rate is the price metric, units sold the demand metric
+    price_metric = metric_column('price', property_type)
+    demand_metric = metric_column('demand', property_type)
+    in_range = cube.year_mask(*year_range) if year_range else np.ones(len(cube.years), dtype=bool)
+    source = block if block is not None else cube
+    
+    # Series stay NumPy arrays; the JSON renderer serializes them directly
     if len(localities) == 1:
-        # Single locality
-        locality_df = filter_data_by_locality(df, localities[0])
-        chart_data['years'] = locality_df['year'].tolist()
+        # Single locality - only the years it has data for
+        code = cube.locality_code(localities[0])
+        present = (cube.row_index[code] >= 0) & in_range if code is not None else np.zeros(len(cube.years), dtype=bool)
+        chart_data['years'] = cube.years[present]
         
         if 'price' in metrics:
-            # Use flat weighted average rate as price metric
-            chart_data['prices'] = locality_df['flat - weighted average rate'].round(2).tolist()
+            prices = source.series(localities[0], price_metric)[present] if code is not None else np.empty(0)
+            chart_data['prices'] = cube.to_array(np.round(prices, 2), price_metric)
         
         if 'demand' in metrics:
-            # Use flat_sold - igr as demand metric
-            chart_data['demand'] = locality_df['flat_sold - igr'].tolist()
+            demand = source.series(localities[0], demand_metric)[present] if code is not None else np.empty(0)
+            chart_data['demand'] = cube.to_array(demand, demand_metric)
     
     else:
-        # Multiple localities - comparison
-        years = sorted(df['year'].unique())
-        chart_data['years'] = years
+        # Multiple localities - comparison over all years, null where a locality has no data.
+        # Each metric is one (localities, years) gather from the cube.
+        chart_data['years'] = cube.years[in_range]
         
         if 'price' in metrics:
-            chart_data['prices_by_locality'] = {}
-            for locality in localities:
-                locality_df = filter_data_by_locality(df, locality)
-                prices = []
-                for year in years:
-                    year_data = locality_df[locality_df['year'] == year]
-                    if not year_data.empty:
-                        prices.append(round(year_data['flat - weighted average rate'].iloc[0], 2))
-                    else:
-                        prices.append(None)
-                chart_data['prices_by_locality'][locality] = prices
+            prices = np.round(source.matrix(localities, price_metric, in_range), 2)
+            chart_data['prices_by_locality'] = {
+                locality: cube.to_array(row, price_metric) for locality, row in zip(localities, prices)
+            }
         
         if 'demand' in metrics:
-            chart_data['demand_by_locality'] = {}
-            for locality in localities:
-                locality_df = filter_data_by_locality(df, locality)
-                demands = []
-                for year in years:
-                    year_data = locality_df[locality_df['year'] == year]
-                    if not year_data.empty:
-                        demands.append(int(year_data['flat_sold - igr'].iloc[0]))
-                    else:
-                        demands.append(None)
-                chart_data['demand_by_locality'][locality] = demands
+            demand = source.matrix(localities, demand_metric, in_range)
+            chart_data['demand_by_locality'] = {
+                locality: cube.to_array(row, demand_metric) for locality, row in zip(localities, demand)
+            }
     
     return chart_data
 
 
-def format_table_data(df: pd.DataFrame) -> List[Dict[str, Any]]:
-    """Convert DataFrame to list of dictionaries for JSON response."""
+def table_columns(df: pd.DataFrame, property_type: str = 'flat') -> List[str]:
+    """Columns shown in tableData, in display order."""
     # Select relevant columns
     columns_to_include = [
         'final location', 'year', 'city',
@@ -132,63 +471,137 @@ def format_table_data(df: pd.DataFrame) -> List[Dict[str, Any]]:
         'total units', 'total carpet area supplied (sqft)'
     ]
     
-    # Filter to only existing columns
-    existing_columns = [col for col in columns_to_include if col in df.columns]
+    # Show the requested property type's figures too
+    if property_type != 'flat':
+        columns_to_include[7:7] = [metric_column('demand', property_type), metric_column('price', property_type)]
     
-    # Convert to dict
-    result = df[existing_columns].to_dict('records')
+    # Filter to only existing columns
+    return [col for col in columns_to_include if col in df.columns]
+
+
+def format_table_data(df: pd.DataFrame, property_type: str = 'flat', fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Convert DataFrame to list of dictionaries for JSON response.
     
-    # Clean up the data (remove commas from numbers if they're strings)
-    for row in result:
-        for key, value in row.items():
-            if isinstance(value, str):
-                # Try to clean numeric values
-                cleaned = value.replace(',', '').strip()
-                try:
-                    if '.' in cleaned:
-                        row[key] = float(cleaned)
-                    else:
-                        row[key] = int(cleaned)
-                except ValueError:
-                    row[key] = value
+    ``fields`` projects the rows onto a subset of the table columns.
+    """
+    columns = fields or table_columns(df, property_type)
     
-    return result
+    # Values are already typed at load time (see schema.normalize_dataframe)
+    return df[columns].to_dict('records')
 
 
-def generate_summary_with_openai(intent: Dict[str, Any], chart_data: Dict[str, Any], df: pd.DataFrame, mock_summary: str) -> str:
+def format_table_columns(df: pd.DataFrame, columns: List[str]) -> Dict[str, Any]:
     """
-    Generate summary using OpenAI API if available, otherwise return mock summary.
+    Columnar tableData: ``{"columns": [...], "data": {column: values}}``.
+    
+    Column names are sent once instead of on every row, and numeric columns
+    stay NumPy arrays for the renderer.
     """
-    if not OPENAI_AVAILABLE:
-        return mock_summary
+    data = {}
+    for column in columns:
+        values = df[column].to_numpy()
+        data[column] = values if values.dtype.kind in 'biuf' else values.tolist()
+    return {'columns': columns, 'data': data}
+
+
+def dumps_line(data: Any) -> bytes:
+    """One NDJSON line, encoded like the JSON responses."""
+    return dumps(data) + b'\n'
+
+
+def iter_table_data(df: pd.DataFrame, columns: List[str], chunk_size: int = 1000):
+    """Yield table rows one at a time, converting ``chunk_size`` rows at once."""
+    for start in range(0, len(df), chunk_size):
+        yield from df.iloc[start:start + chunk_size][columns].to_dict('records')
+
+
+summary_cache = SQLiteCache(settings.SUMMARY_CACHE_PATH, settings.SUMMARY_CACHE_TTL, settings.SUMMARY_CACHE_PURGE_INTERVAL)
+summary_flight = SingleFlight()
+async_summary_flight = AsyncSingleFlight()
+
+
+def summary_cache_key(request: Dict[str, Any]) -> str:
+    """Content address of a chat completion request: hash of the prompt and model settings."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+def _request_summary(key: str, request: Dict[str, Any]) -> str:
+    """The stored summary of ``request``, or call OpenAI and store it."""
+    summary = summary_cache.get(key)
+    if summary is not None:
+        return summary
     
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        return mock_summary
+    summary = llm.complete(request)
+    summary_cache.set(key, summary)
+    return summary
+
+
+async def _arequest_summary(key: str, request: Dict[str, Any]) -> str:
+    """Async ``_request_summary``; the cache is read and written off the event loop."""
+    summary = await sync_to_async(summary_cache.get, thread_sensitive=False)(key)
+    if summary is not None:
+        return summary
     
-    try:
-        client = OpenAI(api_key=api_key)
-        
-        # Prepare data context for OpenAI
-        localities = intent['localities']
-        data_context = []
-        
-        for locality in localities:
-            locality_df = filter_data_by_locality(df, locality)
-            if not locality_df.empty:
-                data_context.append({
-                    'locality': locality,
-                    'years': locality_df['year'].tolist(),
-                    'prices': locality_df['flat - weighted average rate'].tolist(),
-                    'demand': locality_df['flat_sold - igr'].tolist(),
-                    'total_sales': locality_df['total_sales - igr'].sum()
-                })
-        
-        prompt = f"""Analyze the following real estate data and provide a comprehensive, natural language summary:
+    summary = await llm.acomplete(request)
+    await sync_to_async(summary_cache.set, thread_sensitive=False)(key, summary)
+    return summary
+
+
+def openai_enabled() -> bool:
+    """Whether AI summaries are configured."""
+    return llm.OPENAI_AVAILABLE and bool(os.environ.get('OPENAI_API_KEY'))
+
+
+def build_summary_request(intent: Dict[str, Any], snapshot: DatasetSnapshot) -> Dict[str, Any]:
+    """Chat completion request (model settings and prompt) summarizing a resolved intent."""
+    # Prepare data context for OpenAI, restricted to the requested years and property type
+    localities = intent['localities']
+    property_type = intent.get('property_type', 'flat')
+    year_range = intent.get('year_range') or [None, None]
+    cube = snapshot.cube
+    aggregates = window_aggregates(snapshot, *year_range)
+    analytics = window_analytics(snapshot, *year_range)
+    price_metric = metric_column('price', property_type)
+    demand_metric = metric_column('demand', property_type)
+    data_context = []
+    
+    for locality in localities:
+        code = cube.locality_code(locality)
+        if code is None or not aggregates.has(locality):
+            continue
+        in_window = cube.year_mask(*year_range)
+        present = (cube.row_index[code] >= 0) & in_window
+        price_stats = analytics.stats(locality, price_metric, series=True)
+        data_context.append({
+            'locality': locality,
+            'years': cube.years[present].tolist(),
+            'prices': cube.to_list(cube.series(locality, price_metric)[present], price_metric),
+            'demand': cube.to_list(cube.series(locality, demand_metric)[present], demand_metric),
+            'total_sales': aggregates.total(locality, 'total_sales - igr'),
+            'price_cagr_pct': price_stats['cagr'],
+            'price_yoy_pct': [change for change, has in zip(price_stats['yoy'], present[in_window]) if has],
+            'price_volatility_pct_points': price_stats['volatility'],
+            'demand_cagr_pct': analytics.stats(locality, demand_metric)['cagr'],
+            'price_demand_correlation': analytics.correlation_of(locality, property_type)
+        })
+    
+    query_types = {'comparison': 'Comparison', 'ranking': 'Ranking'}
+    nearby = ''
+    if intent.get('nearby_results'):
+        nearby = f"\nDistances from {intent['nearby']['locality']} (km): {json.dumps(intent['nearby_results'])}"
+    if intent.get('similar_results'):
+        nearby += f"\nLocalities most similar to {intent['similar']['locality']}: {json.dumps(intent['similar_results'])}"
+    if intent.get('forecast_results'):
+        forecast = intent['forecast']
+        nearby += f"\nProjections for {forecast['year']} ({FORECAST_LABELS[forecast['model']]}): {json.dumps(intent['forecast_results'])}"
+    
+    prompt = f"""Analyze the following real estate data and provide a comprehensive, natural language summary:
 
 Data: {json.dumps(data_context, indent=2)}
 
-Query Type: {'Comparison' if intent['type'] == 'comparison' else 'Single Analysis'}
+Query Type: {query_types.get(intent['type'], 'Single Analysis')}{nearby}
+Property Type: {PROPERTY_LABELS.get(property_type, property_type)}
 Metrics Requested: {', '.join(intent['metrics'])}
 
 Provide a detailed, professional analysis covering:
@@ -199,75 +612,287 @@ Provide a detailed, professional analysis covering:
 5. Comparative analysis (if multiple localities)
 
 Format the response in a clear, readable manner with proper sections."""
+    
+    return {
+        'model': "gpt-3.5-turbo",
+        'messages': [
+            {"role": "system", "content": "You are a real estate market analyst providing data-driven insights."},
+            {"role": "user", "content": prompt}
+        ],
+        'max_tokens': 500,
+        'temperature': 0.7
+    }
+
+
+def generate_summary_with_openai(intent: Dict[str, Any], chart_data: Dict[str, Any], snapshot: DatasetSnapshot, mock_summary: str) -> str:
+    """
+    Generate summary using OpenAI API if available, otherwise return mock summary.
+    """
+    if not openai_enabled():
+        return mock_summary
+    
+    try:
+        request = build_summary_request(intent, snapshot)
         
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a real estate market analyst providing data-driven insights."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content.strip()
+        # Identical prompts reuse the stored summary; concurrent requests share one lookup and upstream call
+        key = summary_cache_key(request)
+        return summary_flight.do(key, lambda: _request_summary(key, request))
     
     except Exception as e:
         print(f"OpenAI API error: {e}")
         return mock_summary
 
 
-def generate_summary(intent: Dict[str, Any], chart_data: Dict[str, Any], df: pd.DataFrame) -> str:
+async def agenerate_summary_with_openai(intent: Dict[str, Any], snapshot: DatasetSnapshot) -> Optional[str]:
+    """
+    Async OpenAI summary of a resolved intent, or None if it is unavailable
+    (not configured, circuit open, deadline passed, API error).
+    
+    Concurrent requests for the same prompt on one event loop share a call.
+    """
+    if not openai_enabled():
+        return None
+    
+    try:
+        # The prompt is built from NumPy/pandas data: off the event loop
+        request = await sync_to_async(build_summary_request, thread_sensitive=False)(intent, snapshot)
+        key = summary_cache_key(request)
+        return await async_summary_flight.do(key, lambda: _arequest_summary(key, request))
+    
+    except Exception as e:
+        print(f"OpenAI API error: {e!r}")
+        return None
+
+
+def stream_summary_with_openai(intent: Dict[str, Any], snapshot: DatasetSnapshot):
+    """
+    Yield the OpenAI summary of a resolved intent piece by piece.
+    
+    A cached summary comes out as a single piece. A streamed one is stored
+    in the summary cache once it completes. Errors propagate to the caller.
+    """
+    request = build_summary_request(intent, snapshot)
+    key = summary_cache_key(request)
+    
+    summary = summary_cache.get(key)
+    if summary is not None:
+        yield summary
+        return
+    
+    parts = []
+    for delta in llm.stream(request):
+        # Skip leading whitespace, as the non-streamed summary is stripped
+        if not parts:
+            delta = delta.lstrip()
+            if not delta:
+                continue
+        parts.append(delta)
+        yield delta
+    
+    summary_cache.set(key, ''.join(parts).strip())
+
+
+def _period(year_range: Optional[List[int]]) -> str:
+    """Human-readable description of a year window."""
+    if not year_range:
+        return 'all years'
+    start, end = year_range
+    if start is not None and end is not None:
+        return str(start) if start == end else f'{start}-{end}'
+    return f'since {start}' if start is not None else f'up to {end}'
+
+
+def _nearby_note(intent: Dict[str, Any]) -> Optional[str]:
+    """Summary line listing the neighbours a "near X" query added (or why there are none)."""
+    nearby = intent.get('nearby')
+    if not nearby or 'locality' not in nearby:
+        return None
+    anchor = nearby['locality']
+    results = intent.get('nearby_results', [])
+    if results:
+        listed = ', '.join(f"{result['locality']} ({result['distanceKm']:.1f} km)" for result in results)
+        return f"**Nearest to {anchor}:** {listed}\n"
+    if nearby['radius_km'] is not None:
+        return f"No other localities within {nearby['radius_km']:g} km of {anchor}.\n"
+    return f"No coordinates are known for {anchor}, so its neighbours could not be found.\n"
+
+
+def _similar_note(intent: Dict[str, Any]) -> Optional[str]:
+    """Summary line listing the localities a "like X" query added."""
+    similar = intent.get('similar')
+    if not similar or 'locality' not in similar:
+        return None
+    anchor = similar['locality']
+    results = intent.get('similar_results', [])
+    if not results:
+        return f"No localities to compare {anchor} with.\n"
+    label = 'similarity' if similar['metric'] == 'cosine' else 'distance'
+    listed = ', '.join(f"{result['locality']} ({label} {result['score']:.2f})" for result in results)
+    return f"**Most similar to {anchor}** (price, growth, demand, sales mix and supply): {listed}\n"
+
+
+def _forecast_note(intent: Dict[str, Any]) -> Optional[str]:
+    """Summary section projecting each locality's requested metrics (see ``resolve_intent``)."""
+    forecast = intent.get('forecast')
+    if not forecast or 'forecast_results' not in intent:
+        return None
+    label = PROPERTY_LABELS.get(intent.get('property_type', 'flat'), 'flat')
+    lines = [f"**Forecast for {forecast['year']}** ({FORECAST_LABELS[forecast['model']]}):"]
+    for result in intent['forecast_results']:
+        parts = []
+        for kind in ('price', 'demand'):
+            projection = result[kind]
+            if kind not in intent['metrics'] or not projection or projection['forecast'] is None:
+                continue
+            value = projection['forecast']
+            text = f"₹{value:,.2f} per sqft" if kind == 'price' else f"{value:,.0f} {label} units sold"
+            if projection['change'] is not None:
+                text += f" ({'+' if projection['change'] > 0 else ''}{projection['change']:.1f}% on {projection['lastYear']})"
+            parts.append(text)
+        lines.append(f"- {result['locality']}: {', '.join(parts) if parts else 'not enough history for a trend'}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_ranking_summary(intent: Dict[str, Any], chart_data: Dict[str, Any], snapshot: DatasetSnapshot, use_openai: bool = True) -> str:
+    """Summary of a ranking query, listing the ranked localities and their scores."""
+    ranking = intent['ranking']
+    results = intent.get('ranking_results', [])
+    label = PROPERTY_LABELS.get(intent.get('property_type', 'flat'), 'flat')
+    by = f'{label} price' if ranking['by'] == 'price' else f'{label} sales'
+    measure = {'growth': f'{by} growth', 'total': f'total {by}'}.get(ranking['measure'], by)
+    scope = f" in {intent['city']}" if intent.get('city') else ''
+    if intent.get('nearby_results'):
+        scope += f" near {intent['nearby']['locality']}"
+    period = _period(intent.get('year_range'))
+    
+    if not results:
+        return f"No localities{scope} have {by} data for {period}."
+    
+    heading = 'Top' if ranking['order'] == 'desc' else 'Bottom'
+    noun = 'locality' if len(results) == 1 else 'localities'
+    summary_parts = [f"📊 **{heading} {len(results)} {noun}{scope} by {measure} ({period})**\n"]
+    
+    for position, result in enumerate(results, 1):
+        value = result['value']
+        if ranking['measure'] == 'growth':
+            text = f"{'+' if value > 0 else ''}{value:.1f}%"
+        elif ranking['by'] == 'price':
+            text = f"₹{value:,.2f} per sqft"
+        else:
+            text = f"{value:,.0f} units"
+        summary_parts.append(f"{position}. {result['locality']}: {text}")
+    
+    note = _forecast_note(intent)
+    if note:
+        summary_parts.append("\n" + note)
+    
+    mock_summary = "\n".join(summary_parts)
+    
+    # Try OpenAI, fallback to mock
+    if not use_openai:
+        return mock_summary
+    return generate_summary_with_openai(intent, chart_data, snapshot, mock_summary)
+
+
+def generate_summary(intent: Dict[str, Any], chart_data: Dict[str, Any], snapshot: DatasetSnapshot, use_openai: bool = True) -> str:
     """
     Generate a natural language summary of the analysis.
-    Tries OpenAI first, falls back to mock summary.
+    Tries OpenAI first (unless ``use_openai`` is False), falls back to mock summary.
+    
+    Figures come from the snapshot's precomputed per-locality aggregates
+    (per year window), so this is lookups and string formatting only.
     """
+    if intent['type'] == 'ranking':
+        return generate_ranking_summary(intent, chart_data, snapshot, use_openai)
+    
     localities = intent['localities']
     metrics = intent['metrics']
+    property_type = intent.get('property_type', 'flat')
+    label = PROPERTY_LABELS.get(property_type, property_type)
+    aggregates = window_aggregates(snapshot, *(intent.get('year_range') or [None, None]))
+    analytics = window_analytics(snapshot, *(intent.get('year_range') or [None, None]))
+    price_metric = metric_column('price', property_type)
+    demand_metric = metric_column('demand', property_type)
     
     if not localities:
         return "No localities found in the query. Please specify a locality like Wakad, Aundh, Akurdi, or Ambegaon Budruk."
     
     if intent['type'] == 'single':
         locality = localities[0]
-        locality_df = filter_data_by_locality(df, locality)
         
-        if locality_df.empty:
+        if not aggregates.has(locality):
             return f"No data found for {locality}."
         
-        # Get first and last year data
-        first_year = locality_df.iloc[0]
-        last_year = locality_df.iloc[-1]
+        # Get first and last year
+        first_year, last_year = aggregates.years(locality)
         
         summary_parts = [f"📊 **Analysis of {locality}**\n"]
+        summary_parts += [note for note in (_nearby_note(intent), _similar_note(intent)) if note]
         
         if 'price' in metrics:
-            first_price = first_year['flat - weighted average rate']
-            last_price = last_year['flat - weighted average rate']
-            price_change = ((last_price - first_price) / first_price) * 100
+            first_price = aggregates.first(locality, price_metric)
+            last_price = aggregates.last(locality, price_metric)
+            price_change = aggregates.change(locality, price_metric)
             
-            summary_parts.append(
-                f"**Price Trends ({first_year['year']}-{last_year['year']}):**\n"
-                f"The average flat price in {locality} has changed from ₹{first_price:,.2f} per sqft "
-                f"in {first_year['year']} to ₹{last_price:,.2f} per sqft in {last_year['year']}, "
-                f"showing a {'growth' if price_change > 0 else 'decline'} of {abs(price_change):.1f}%.\n"
-            )
+            price_stats = analytics.stats(locality, price_metric)
+            pace = ''
+            if price_stats['cagr'] is not None:
+                pace = f" That is {price_stats['cagr']:.1f}% a year compounded"
+                if price_stats['volatility'] is not None:
+                    pace += f", with yearly changes varying by {price_stats['volatility']:.1f} points"
+                pace += '.'
+            
+            if first_year == last_year:
+                summary_parts.append(
+                    f"**Price in {last_year}:**\n"
+                    f"The average {label} price in {locality} was ₹{last_price:,.2f} per sqft in {last_year}.\n"
+                )
+            else:
+                summary_parts.append(
+                    f"**Price Trends ({first_year}-{last_year}):**\n"
+                    f"The average {label} price in {locality} has changed from ₹{first_price:,.2f} per sqft "
+                    f"in {first_year} to ₹{last_price:,.2f} per sqft in {last_year}, "
+                    f"showing a {'growth' if price_change > 0 else 'decline'} of {abs(price_change):.1f}%.{pace}\n"
+                )
         
         if 'demand' in metrics:
-            first_demand = first_year['flat_sold - igr']
-            last_demand = last_year['flat_sold - igr']
-            demand_change = ((last_demand - first_demand) / first_demand) * 100
+            first_demand = aggregates.first(locality, demand_metric)
+            last_demand = aggregates.last(locality, demand_metric)
+            demand_change = aggregates.change(locality, demand_metric)
             
+            if first_year == last_year:
+                summary_parts.append(
+                    f"**Demand in {last_year}:**\n"
+                    f"{label.capitalize()} sales in {locality} were {last_demand:,} units in {last_year}.\n"
+                )
+            else:
+                summary_parts.append(
+                    f"**Demand Trends ({first_year}-{last_year}):**\n"
+                    f"{label.capitalize()} sales in {locality} changed from {first_demand:,} units "
+                    f"in {first_year} to {last_demand:,} units in {last_year}, "
+                    f"showing a {'growth' if demand_change > 0 else 'decline'} of {abs(demand_change):.1f}%.\n"
+                )
+        
+        correlation = analytics.correlation_of(locality, property_type)
+        if 'price' in metrics and 'demand' in metrics and correlation is not None:
+            if correlation >= 0.5:
+                relation = 'moved together'
+            elif correlation <= -0.5:
+                relation = 'moved in opposite directions'
+            else:
+                relation = 'moved largely independently'
             summary_parts.append(
-                f"**Demand Trends ({first_year['year']}-{last_year['year']}):**\n"
-                f"Flat sales in {locality} changed from {first_demand:,} units "
-                f"in {first_year['year']} to {last_demand:,} units in {last_year['year']}, "
-                f"showing a {'growth' if demand_change > 0 else 'decline'} of {abs(demand_change):.1f}%.\n"
+                f"**Price and Demand:**\n"
+                f"{label.capitalize()} prices and sales in {locality} {relation} (correlation {correlation:.2f}).\n"
             )
         
+        note = _forecast_note(intent)
+        if note:
+            summary_parts.append(note)
+        
         # Add total sales info
-        total_sales = locality_df['total_sales - igr'].sum()
-        total_units = locality_df['total sold - igr'].sum()
+        total_sales = aggregates.total(locality, 'total_sales - igr')
+        total_units = aggregates.total(locality, 'total sold - igr')
         
         summary_parts.append(
             f"**Overall Performance:**\n"
@@ -278,62 +903,71 @@ def generate_summary(intent: Dict[str, Any], chart_data: Dict[str, Any], df: pd.
         mock_summary = "\n".join(summary_parts)
         
         # Try OpenAI, fallback to mock
-        return generate_summary_with_openai(intent, chart_data, df, mock_summary)
+        if not use_openai:
+            return mock_summary
+        return generate_summary_with_openai(intent, chart_data, snapshot, mock_summary)
     
     else:
         # Comparison
         summary_parts = [f"📊 **Comparison: {' vs '.join(localities)}**\n"]
+        summary_parts += [note for note in (_nearby_note(intent), _similar_note(intent)) if note]
         
         if 'price' in metrics and 'prices_by_locality' in chart_data:
             summary_parts.append("**Price Comparison:**")
             for locality in localities:
-                locality_df = filter_data_by_locality(df, locality)
-                if not locality_df.empty:
-                    first_price = locality_df.iloc[0]['flat - weighted average rate']
-                    last_price = locality_df.iloc[-1]['flat - weighted average rate']
-                    price_change = ((last_price - first_price) / first_price) * 100
+                if aggregates.has(locality):
+                    first_price = aggregates.first(locality, price_metric)
+                    last_price = aggregates.last(locality, price_metric)
+                    price_change = aggregates.change(locality, price_metric)
+                    cagr = analytics.stats(locality, price_metric)['cagr']
                     summary_parts.append(
                         f"- {locality}: ₹{first_price:,.2f} → ₹{last_price:,.2f} "
-                        f"({'+' if price_change > 0 else ''}{price_change:.1f}%)"
+                        f"({'+' if price_change > 0 else ''}{price_change:.1f}%"
+                        + (f", {cagr:.1f}% a year)" if cagr is not None else ")")
                     )
             summary_parts.append("")
         
         if 'demand' in metrics and 'demand_by_locality' in chart_data:
             summary_parts.append("**Demand Comparison:**")
             for locality in localities:
-                locality_df = filter_data_by_locality(df, locality)
-                if not locality_df.empty:
-                    first_demand = locality_df.iloc[0]['flat_sold - igr']
-                    last_demand = locality_df.iloc[-1]['flat_sold - igr']
-                    demand_change = ((last_demand - first_demand) / first_demand) * 100
+                if aggregates.has(locality):
+                    first_demand = aggregates.first(locality, demand_metric)
+                    last_demand = aggregates.last(locality, demand_metric)
+                    demand_change = aggregates.change(locality, demand_metric)
                     summary_parts.append(
                         f"- {locality}: {first_demand:,} → {last_demand:,} units "
                         f"({'+' if demand_change > 0 else ''}{demand_change:.1f}%)"
                     )
             summary_parts.append("")
         
-        # Find best performer
-        best_locality = None
-        best_growth = float('-inf')
+        note = _forecast_note(intent)
+        if note:
+            summary_parts.append(note)
         
-        for locality in localities:
-            locality_df = filter_data_by_locality(df, locality)
-            if not locality_df.empty:
-                if 'price' in metrics:
-                    first_price = locality_df.iloc[0]['flat - weighted average rate']
-                    last_price = locality_df.iloc[-1]['flat - weighted average rate']
-                    growth = ((last_price - first_price) / first_price) * 100
-                    if growth > best_growth:
-                        best_growth = growth
-                        best_locality = locality
+        # Find best performer
+        best_locality, best_growth = (None, None)
+        if 'price' in metrics:
+            best_locality, best_growth = aggregates.best(localities, price_metric)
         
         if best_locality:
             summary_parts.append(
                 f"**Key Insight:**\n"
                 f"{best_locality} shows the strongest price growth at {best_growth:.1f}% over the analyzed period."
             )
+            
+            # Steadiest prices, when at least two localities can be compared
+            volatility = [
+                (analytics.stats(locality, price_metric)['volatility'], locality)
+                for locality in localities if aggregates.has(locality)
+            ]
+            volatility = [(points, locality) for points, locality in volatility if points is not None]
+            if len(volatility) > 1:
+                steadiest, name = min(volatility)
+                summary_parts[-1] += f" {name} has the steadiest prices, with yearly changes varying by {steadiest:.1f} points."
         
         mock_summary = "\n".join(summary_parts)
         
         # Try OpenAI, fallback to mock
-        return generate_summary_with_openai(intent, chart_data, df, mock_summary)
+        if not use_openai:
+            return mock_summary
+        return generate_summary_with_openai(intent, chart_data, snapshot, mock_summary)
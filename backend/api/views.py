@@ -1,19 +1,344 @@
 """
 API Views for Real Estate Chatbot
 """
-from rest_framework.decorators import api_view
+import hmac
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
-from .apps import ApiConfig
+import numpy as np
+from . import dataset, llm
+from .ingest import ingest_batch
+from .schema import DatasetValidationError
+from .analytics import sort_localities, window_analytics
+from .engine import PROPERTY_TYPES, metric_column, resolve_intent
+from .forecast import FORECAST_MODELS, locality_forecast, next_year, sort_localities as sort_forecasts
+from .export import ARROW_STREAM_TYPE, EXPORT_FORMATS, PYARROW_AVAILABLE, arrow_ipc, export_stream
+from .renderers import dumps
+from .similarity import SIMILARITY_METRICS, locality_similarity
 from .utils import (
-    parse_query_intent,
-    filter_data_by_locality,
+    get_query_intent,
+    intent_cache,
+    response_cache,
+    response_cache_key,
+    summary_cache,
+    make_etag,
+    etag_matches,
+    encode_cursor,
+    decode_cursor,
+    make_page_etag,
     extract_chart_data,
+    table_columns,
     format_table_data,
-    generate_summary
+    format_table_columns,
+    iter_table_data,
+    dumps_line,
+    generate_summary,
+    agenerate_summary_with_openai,
+    openai_enabled,
+    stream_summary_with_openai
 )
 
 
+TABLE_FORMATS = ('records', 'columnar', 'arrow')
+
+# Largest table offset or limit accepted: past any row count, and exact as a JSON number
+MAX_TABLE_ROWS = 2 ** 53 - 1
+
+
+def _build_analysis(intent: Dict[str, Any], snapshot: dataset.DatasetSnapshot, use_openai: bool = True) -> Dict[str, Any]:
+    """
+    Compute the /api/query/ response body for a parsed intent, except
+    tableData, which is paginated per request (see ``_table_page``).
+    
+    With ``use_openai=False`` the summary is the (instant) mock summary.
+    """
+    # Bind year window and ranking to this snapshot
+    resolve_intent(intent, snapshot)
+    return _analyze(intent, snapshot, use_openai)
+
+
+def _analyze(intent: Dict[str, Any], snapshot: dataset.DatasetSnapshot, use_openai: bool = True, chart_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """``_build_analysis`` of an intent already resolved against ``snapshot``, optionally with its chart data precomputed."""
+    if intent['type'] == 'ranking' and not intent['localities']:
+        return {
+            'summary': generate_summary(intent, {'years': []}, snapshot, use_openai),
+            'chartData': {'years': []},
+            'localities': [],
+            'ranking': [],
+            'type': intent['type'],
+            'propertyType': intent['property_type'],
+            'yearRange': intent['year_range']
+        }
+    
+    if not intent['localities']:
+        return {
+            'summary': f"I couldn't identify any localities in your query. Available localities are: {', '.join(snapshot.localities)}. Please try again with a specific locality.",
+            'chartData': {'years': []},
+            'localities': [],
+            'type': intent['type'],
+            'propertyType': intent['property_type'],
+            'yearRange': intent['year_range']
+        }
+    
+    # Any rows for the requested localities? (counted by the store)
+    if not snapshot.store.count(intent['localities'], intent['year_range']):
+        return {
+            'summary': f"No data found for the requested localities: {', '.join(intent['localities'])}",
+            'chartData': {'years': []},
+            'localities': intent['localities'],
+            'type': intent['type'],
+            'propertyType': intent['property_type'],
+            'yearRange': intent['year_range']
+        }
+    
+    # Extract chart data
+    if chart_data is None:
+        chart_data = extract_chart_data(
+            snapshot.cube, intent['localities'], intent['metrics'],
+            intent['property_type'], intent['year_range']
+        )
+    
+    # Generate summary
+    summary = generate_summary(intent, chart_data, snapshot, use_openai)
+    
+    return {
+        'summary': summary,
+        'chartData': chart_data,
+        'localities': intent['localities'],
+        'metrics': intent['metrics'],
+        'type': intent['type'],
+        'propertyType': intent['property_type'],
+        'yearRange': intent['year_range'],
+        **({'ranking': intent['ranking_results']} if intent['type'] == 'ranking' else {}),
+        **({'nearby': intent['nearby_results']} if 'nearby_results' in intent else {}),
+        **({'similar': intent['similar_results']} if 'similar_results' in intent else {}),
+        **({'forecast': {
+            'year': intent['forecast']['year'],
+            'model': intent['forecast']['model'],
+            'localities': intent['forecast_results']
+        }} if 'forecast_results' in intent else {})
+    }
+
+
+def _row_number(value: Any, name: str) -> int:
+    """
+    ``value`` as a whole number of rows.
+    
+    Raises:
+        ValueError: if it is not a number, or infinite
+    """
+    try:
+        return int(value)
+    except OverflowError:
+        raise ValueError(f'{name} must be at most {MAX_TABLE_ROWS}')
+
+
+def _table_params(data: Dict[str, Any], snapshot: dataset.DatasetSnapshot, stream: bool) -> Tuple[int, Optional[int], Optional[List[str]]]:
+    """
+    Read the tableData paging and projection parameters of a request.
+    
+    Raises:
+        ValueError: on invalid parameters
+    """
+    if data.get('cursor'):
+        offset = decode_cursor(str(data['cursor']), snapshot.version)
+    else:
+        offset = _row_number(data.get('offset', 0), 'offset')
+        if offset < 0:
+            raise ValueError('offset must not be negative')
+    if offset > MAX_TABLE_ROWS:
+        raise ValueError(f'offset must be at most {MAX_TABLE_ROWS}')
+    
+    # Streams return every row by default; JSON responses one page
+    limit = data.get('limit', None if stream else settings.TABLE_PAGE_SIZE)
+    if limit is not None:
+        limit = _row_number(limit, 'limit')
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        if limit > MAX_TABLE_ROWS:
+            raise ValueError(f'limit must be at most {MAX_TABLE_ROWS}')
+        if not stream:
+            limit = min(limit, settings.TABLE_MAX_PAGE_SIZE)
+    
+    fields = data.get('fields')
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if fields is not None and not isinstance(fields, list):
+        raise ValueError('fields must be a list or a comma-separated string')
+    
+    return offset, limit, fields or None
+
+
+def _table_page(snapshot: dataset.DatasetSnapshot, data: Dict[str, Any], offset: int, limit: Optional[int], fields: Optional[List[str]]):
+    """
+    Rows and columns of one tableData page, read from the snapshot's store
+    (only the page itself is materialized).
+    
+    Returns:
+        (page DataFrame, columns, total row count)
+    """
+    localities, year_range = data['localities'], data.get('yearRange')
+    columns = fields or table_columns(snapshot.store.schema, data.get('propertyType', 'flat'))
+    total = snapshot.store.count(localities, year_range)
+    return snapshot.store.rows(localities, year_range, columns, offset, limit), columns, total
+
+
+def _table_chunks(snapshot: dataset.DatasetSnapshot, data: Dict[str, Any], offset: int, limit: Optional[int], fields: Optional[List[str]]):
+    """
+    Like ``_table_page``, but the rows come as an iterator of DataFrame
+    chunks read from the store as they are consumed.
+    
+    Returns:
+        (chunk iterator, columns, total row count)
+    """
+    localities, year_range = data['localities'], data.get('yearRange')
+    columns = fields or table_columns(snapshot.store.schema, data.get('propertyType', 'flat'))
+    total = snapshot.store.count(localities, year_range)
+    chunks = snapshot.store.iter_rows(localities, year_range, columns, settings.EXPORT_CHUNK_ROWS, offset, limit)
+    return chunks, columns, total
+
+
+def _page_info(snapshot: dataset.DatasetSnapshot, offset: int, limit: Optional[int], total: int) -> Dict[str, Any]:
+    next_offset = None if limit is None else offset + limit
+    has_more = next_offset is not None and next_offset < total
+    return {
+        'offset': offset,
+        'limit': limit,
+        'total': total,
+        'nextCursor': encode_cursor(snapshot.version, next_offset) if has_more else None
+    }
+
+
+def _page_body(data: Dict[str, Any], page_df, columns: List[str], page: Dict[str, Any], table_format: str) -> Dict[str, Any]:
+    """Response body: the analysis plus one tableData page (records or columnar)."""
+    if table_format == 'columnar':
+        table_data = format_table_columns(page_df, columns)
+    else:
+        table_data = format_table_data(page_df, fields=columns)
+    
+    # Keep the original key order: summary, chartData, tableData, ...
+    body = {'summary': data['summary'], 'chartData': data['chartData'], 'tableData': table_data}
+    body.update(data)
+    body['tablePage'] = page
+    return body
+
+
+def _paged_response(request, snapshot: dataset.DatasetSnapshot, entry: Dict[str, Any], offset: int, limit: Optional[int], fields: Optional[List[str]], table_format: str = 'records'):
+    """Serve a cached analysis with one tableData page, or 304 Not Modified if the client already has it."""
+    etag = make_page_etag(entry['etag'], snapshot.version, offset, limit, fields, table_format)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    
+    if etag_matches(request.headers.get('If-None-Match', ''), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    data = entry['data']
+    page_df, columns, total = _table_page(snapshot, data, offset, limit, fields)
+    page = _page_info(snapshot, offset, limit, total)
+    
+    if table_format == 'arrow':
+        # Table rows as Arrow IPC; the rest of the analysis rides along as schema metadata
+        response = HttpResponse(
+            arrow_ipc(page_df, columns, {b'analysis': dumps({**data, 'tablePage': page})}),
+            content_type=ARROW_STREAM_TYPE
+        )
+        for name, value in headers.items():
+            response[name] = value
+        return response
+    
+    return Response(_page_body(data, page_df, columns, page, table_format), headers=headers)
+
+
+def _ndjson_response(snapshot: dataset.DatasetSnapshot, entry: Dict[str, Any], offset: int, limit: Optional[int], fields: Optional[List[str]]) -> StreamingHttpResponse:
+    """
+    Stream a cached analysis as NDJSON.
+    
+    The first line is the analysis without tableData (plus tablePage); every
+    further line is one table row, serialized as it is sent. Rows are read
+    from the store one chunk at a time, so memory stays flat however many
+    rows the selection has.
+    """
+    data = entry['data']
+    chunks, columns, total = _table_chunks(snapshot, data, offset, limit, fields)
+    
+    def lines():
+        yield dumps_line({**data, 'tablePage': _page_info(snapshot, offset, limit, total)})
+        for chunk in chunks:
+            for row in iter_table_data(chunk, columns):
+                yield dumps_line(row)
+    
+    response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class QueryError(Exception):
+    """An invalid query request, answered with ``status_code``."""
+    
+    def __init__(self, message: str, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _prepare_query(data: Dict[str, Any], headers, snapshot: Optional[dataset.DatasetSnapshot] = None) -> Tuple[dataset.DatasetSnapshot, Dict[str, Any], bool, str, Tuple[int, Optional[int], Optional[List[str]]]]:
+    """
+    Validate a query request (body ``data`` and request ``headers``) and parse
+    its intent, against ``snapshot`` or the current one.
+    
+    Returns:
+        (snapshot, intent, stream, table_format, (offset, limit, fields))
+    
+    Raises:
+        QueryError: on an invalid request, or when no data is loaded
+    """
+    query = data.get('query', '')
+    
+    if not query:
+        raise QueryError('Query parameter is required')
+    
+    # Use one dataset snapshot for the whole request, even if a reload happens meanwhile
+    if snapshot is None:
+        snapshot = dataset.get_snapshot()
+    
+    if snapshot is None or not snapshot.rows:
+        raise QueryError('Real estate data not loaded', status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    stream = bool(data.get('stream')) or 'application/x-ndjson' in headers.get('Accept', '')
+    
+    try:
+        offset, limit, fields = _table_params(data, snapshot, stream)
+    except (TypeError, ValueError) as e:
+        raise QueryError(str(e))
+    
+    if ARROW_STREAM_TYPE in headers.get('Accept', ''):
+        table_format = 'arrow'
+    else:
+        table_format = str(data.get('table_format', 'records')).lower()
+    
+    if table_format not in TABLE_FORMATS:
+        raise QueryError(f"table_format must be one of: {', '.join(TABLE_FORMATS)}")
+    
+    if table_format == 'arrow' and not PYARROW_AVAILABLE:
+        raise QueryError('Arrow responses require pyarrow (pip install pyarrow)', status.HTTP_406_NOT_ACCEPTABLE)
+    
+    # Parse query intent (memoized per dataset version)
+    intent = get_query_intent(query, snapshot)
+    
+    if fields:
+        unknown = [field for field in fields if field not in table_columns(snapshot.store.schema, intent['property_type'])]
+        if unknown:
+            raise QueryError(f"Unknown field(s): {', '.join(unknown)}")
+    
+    return snapshot, intent, stream, table_format, (offset, limit, fields)
+
+
 @api_view(['POST'])
 def query_analysis(request):
     """
@@ -22,73 +347,363 @@ def query_analysis(request):
     POST /api/query/
     Body: { "query": "Analyze Wakad" }
     
+    Queries can also ask for a year range ("Wakad price 2020-2023"), a
+    property type ("Aundh office prices") or a ranking ("top 5 localities
+    by price growth since 2020").
+    
+    Responses are cached per intent and dataset version and carry a strong
+    ETag; send it back as If-None-Match to get 304 Not Modified.
+    
+    tableData is paginated: "limit" (default TABLE_PAGE_SIZE), "offset" or
+    the "cursor" from the previous page's tablePage.nextCursor, and "fields"
+    to pick columns. "table_format": "columnar" sends tableData as
+    {"columns": [...], "data": {column: [...]}}; "arrow" (or Accept:
+    application/vnd.apache.arrow.stream) sends the page as an Arrow IPC
+    stream with the analysis in its schema metadata. With "stream": true (or Accept: application/x-ndjson)
+    the response is NDJSON: the analysis on the first line, then one row
+    per line.
+    
     Returns: {
         "summary": "text summary",
         "chartData": {...},
         "tableData": [...],
-        "localities": [...]
+        "localities": [...],
+        "ranking": [...],  # ranking queries only
+        "tablePage": {"offset": 0, "limit": 500, "total": 20, "nextCursor": null}
+    }
+    """
+    try:
+        try:
+            snapshot, intent, stream, table_format, (offset, limit, fields) = _prepare_query(request.data, request.headers)
+        except QueryError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        
+        # Same intent on the same dataset version: reuse the whole response
+        cache_key = response_cache_key(intent, snapshot.version)
+        entry = response_cache.get(cache_key)
+        
+        if entry is None:
+            data = _build_analysis(intent, snapshot)
+            entry = {'data': data, 'etag': make_etag(data)}
+            response_cache.set(cache_key, entry)
+        
+        if stream:
+            return _ndjson_response(snapshot, entry, offset, limit, fields)
+        
+        return _paged_response(request, snapshot, entry, offset, limit, fields, table_format)
+    
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _build_analyses(intents: Dict[str, Dict[str, Any]], snapshot: dataset.DatasetSnapshot) -> Dict[str, Dict[str, Any]]:
+    """
+    ``_build_analysis`` for many intents (keyed by response cache key) at once.
+    
+    Chart data for all of them is sliced from one cube gather over the union
+    of their localities, and with OpenAI enabled the summaries are generated
+    concurrently.
+    
+    Returns:
+        {key: {'data': ..., 'etag': ...}}, or {key: {'error': ...}} where building failed
+    """
+    # A failing item fails alone: resolve and chart each intent on its own terms
+    failed = {}
+    for key, intent in intents.items():
+        try:
+            resolve_intent(intent, snapshot)
+        except Exception as e:
+            failed[key] = {'error': f'An error occurred: {str(e)}'}
+    
+    charted = {key: intent for key, intent in intents.items() if key not in failed and intent['localities']}
+    chart_data = {}
+    if charted:
+        localities = [locality for intent in charted.values() for locality in intent['localities']]
+        metrics = {
+            metric_column(metric, intent['property_type'])
+            for intent in charted.values() for metric in intent['metrics'] if metric in ('price', 'demand')
+        }
+        block = snapshot.cube.block(localities, sorted(metrics & set(snapshot.cube.metric_codes)))
+        for key, intent in charted.items():
+            try:
+                chart_data[key] = extract_chart_data(
+                    snapshot.cube, intent['localities'], intent['metrics'],
+                    intent['property_type'], intent['year_range'], block=block
+                )
+            except Exception as e:
+                failed[key] = {'error': f'An error occurred: {str(e)}'}
+    
+    def build(key: str) -> Dict[str, Any]:
+        if key in failed:
+            return failed[key]
+        try:
+            data = _analyze(intents[key], snapshot, chart_data=chart_data.get(key))
+            return {'data': data, 'etag': make_etag(data)}
+        except Exception as e:
+            return {'error': f'An error occurred: {str(e)}'}
+    
+    pending = [key for key in intents if key not in failed]
+    if openai_enabled() and len(pending) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(pending), settings.OPENAI_MAX_CONCURRENCY)) as pool:
+            return dict(zip(intents, pool.map(build, intents)))
+    return {key: build(key) for key in intents}
+
+
+@api_view(['POST'])
+def query_batch(request):
+    """
+    Process many queries in one request.
+    
+    POST /api/query/batch/
+    Body: {
+        "queries": ["Analyze Wakad", {"query": "Compare Aundh and Akurdi", "limit": 10}, ...],
+        "limit": 50, "table_format": "columnar", ...  # optional defaults for every item
+    }
+    
+    Items take the /api/query/ body (or are just the query text). Repeated
+    intents are computed once, chart data for the whole batch comes from one
+    gather of the cube index, and AI summaries are requested concurrently.
+    
+    Returns: {
+        "results": [...],  # in request order: the /api/query/ body, or {"error": "...", "status": 400}
+        "count": 2
     }
     """
     try:
-        query = request.data.get('query', '')
+        queries = request.data.get('queries')
         
-        if not query:
+        if not isinstance(queries, list) or not queries:
             return Response(
-                {'error': 'Query parameter is required'},
+                {'error': 'queries must be a non-empty list'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get DataFrame from app config
-        df = ApiConfig.real_estate_df
+        if len(queries) > settings.QUERY_BATCH_MAX_SIZE:
+            return Response(
+                {'error': f'At most {settings.QUERY_BATCH_MAX_SIZE} queries per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        snapshot = dataset.get_snapshot()
         
-        if df is None or df.empty:
+        if snapshot is None or not snapshot.rows:
             return Response(
                 {'error': 'Real estate data not loaded'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        # Get available localities
-        available_localities = df['final location'].unique().tolist()
+        defaults = {name: value for name, value in request.data.items() if name != 'queries'}
+        items = []
+        entries = {}
+        pending = {}
         
-        # Parse query intent
-        intent = parse_query_intent(query, available_localities)
+        for item in queries:
+            data = {**defaults, **item} if isinstance(item, dict) else {**defaults, 'query': item}
+            try:
+                if not isinstance(data.get('query', ''), str):
+                    raise QueryError('query must be a string')
+                _, intent, stream, table_format, params = _prepare_query(data, {}, snapshot)
+                if stream or table_format == 'arrow':
+                    raise QueryError('Batched queries support the records and columnar table formats')
+            except QueryError as e:
+                items.append({'error': str(e), 'status': e.status_code})
+                continue
+            
+            # Same intent as an earlier item: share its analysis
+            cache_key = response_cache_key(intent, snapshot.version)
+            if cache_key not in entries and cache_key not in pending:
+                entry = response_cache.get(cache_key)
+                if entry is None:
+                    pending[cache_key] = intent
+                else:
+                    entries[cache_key] = entry
+            items.append((cache_key, table_format, params))
         
-        if not intent['localities']:
-            return Response({
-                'summary': f"I couldn't identify any localities in your query. Available localities are: {', '.join(available_localities)}. Please try again with a specific locality.",
-                'chartData': {'years': []},
-                'tableData': [],
-                'localities': []
-            })
+        for cache_key, entry in _build_analyses(pending, snapshot).items():
+            if 'error' not in entry:
+                response_cache.set(cache_key, entry)
+            entries[cache_key] = entry
         
-        # Filter data for requested localities
-        filtered_df = df[df['final location'].isin(intent['localities'])]
+        results = []
+        for item in items:
+            if isinstance(item, dict):
+                results.append(item)
+                continue
+            
+            cache_key, table_format, (offset, limit, fields) = item
+            entry = entries[cache_key]
+            if 'error' in entry:
+                results.append({'error': entry['error'], 'status': status.HTTP_500_INTERNAL_SERVER_ERROR})
+                continue
+            
+            page_df, columns, total = _table_page(snapshot, entry['data'], offset, limit, fields)
+            results.append(_page_body(entry['data'], page_df, columns, _page_info(snapshot, offset, limit, total), table_format))
         
-        if filtered_df.empty:
-            return Response({
-                'summary': f"No data found for the requested localities: {', '.join(intent['localities'])}",
-                'chartData': {'years': []},
-                'tableData': [],
-                'localities': intent['localities']
-            })
+        return Response({'results': results, 'count': len(results)})
+    
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _json_response(data: Any, status_code: int = status.HTTP_200_OK, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+    """A JSON HttpResponse encoded like the DRF responses, for plain Django views."""
+    return HttpResponse(dumps(data), content_type='application/json', status=status_code, headers=headers)
+
+
+def _off_loop(fn):
+    """``fn`` as a coroutine function running in a worker thread, so it does not block the event loop."""
+    return sync_to_async(fn, thread_sensitive=False)
+
+
+async def query_analysis_async(request):
+    """
+    Async version of /api/query/, for ASGI deployments (backend/asgi.py).
+    
+    POST /api/query/async/
+    Body and response: same as /api/query/, JSON only (records or columnar tableData)
+    
+    The AI summary is awaited on the shared AsyncOpenAI client, so the worker
+    keeps serving other requests meanwhile. Calls have a deadline and are
+    capped per process; when OpenAI is slow, failing or its circuit breaker
+    is open, the response carries the mock summary and is not cached.
+    
+    Everything else that blocks (parsing, the NumPy/pandas analysis, the
+    response cache and store reads) runs in a thread, off the event loop.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    try:
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return _json_response({'error': 'Request body must be a JSON object'}, status.HTTP_400_BAD_REQUEST)
         
-        # Extract chart data
-        chart_data = extract_chart_data(df, intent['localities'], intent['metrics'])
+        try:
+            snapshot, intent, stream, table_format, (offset, limit, fields) = await _off_loop(_prepare_query)(data, request.headers)
+        except QueryError as e:
+            return _json_response({'error': str(e)}, e.status_code)
         
-        # Format table data
-        table_data = format_table_data(filtered_df)
+        if stream or table_format == 'arrow':
+            return _json_response(
+                {'error': 'Async responses support the records and columnar table formats'},
+                status.HTTP_400_BAD_REQUEST
+            )
         
-        # Generate summary
-        summary = generate_summary(intent, chart_data, df)
+        cache_key = response_cache_key(intent, snapshot.version)
+        entry = await _off_loop(response_cache.get)(cache_key)
         
-        return Response({
-            'summary': summary,
-            'chartData': chart_data,
-            'tableData': table_data,
-            'localities': intent['localities'],
-            'metrics': intent['metrics'],
-            'type': intent['type']
-        })
+        if entry is None:
+            analysis = await _off_loop(_build_analysis)(intent, snapshot, use_openai=False)
+            summary = None
+            if len(analysis['chartData']['years']):
+                summary = await agenerate_summary_with_openai(intent, snapshot)
+            
+            if summary is not None:
+                analysis['summary'] = summary
+            entry = {'data': analysis, 'etag': make_etag(analysis)}
+            
+            # Keep the mock summary out of the cache while OpenAI is unavailable
+            if summary is not None or not openai_enabled():
+                await _off_loop(response_cache.set)(cache_key, entry)
+        
+        etag = make_page_etag(entry['etag'], snapshot.version, offset, limit, fields, table_format)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        
+        if etag_matches(request.headers.get('If-None-Match', ''), etag):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        def page_body() -> bytes:
+            page_df, columns, total = _table_page(snapshot, entry['data'], offset, limit, fields)
+            return dumps(_page_body(entry['data'], page_df, columns, _page_info(snapshot, offset, limit, total), table_format))
+        
+        body = await _off_loop(page_body)()
+        return HttpResponse(body, content_type='application/json', headers=headers)
+    
+    except Exception as e:
+        return _json_response({'error': f'An error occurred: {str(e)}'}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# DRF views are exempt from CSRF checks; do the same for this plain Django view
+query_analysis_async.csrf_exempt = True
+
+
+def _sse(event: str, data: Any) -> bytes:
+    """One Server-Sent Event with a JSON payload."""
+    return b'event: ' + event.encode() + b'\ndata: ' + dumps(data) + b'\n\n'
+
+
+@api_view(['POST'])
+def query_stream(request):
+    """
+    Process a query and stream the analysis as Server-Sent Events.
+    
+    POST /api/query/stream/
+    Body: same as /api/query/ (NDJSON and Arrow table formats excepted)
+    
+    Events:
+        analysis: the full /api/query/ body right away, with the mock
+                  summary standing in for the AI summary
+        summary:  {"text": "..."} pieces of the AI summary as they arrive
+        done:     {"summary": "..."} the final summary
+        error:    {"error": "..."} the AI summary failed; keep the mock one
+    """
+    try:
+        try:
+            snapshot, intent, _, table_format, (offset, limit, fields) = _prepare_query(request.data, request.headers)
+        except QueryError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        
+        if table_format == 'arrow':
+            return Response(
+                {'error': 'Streamed responses support the records and columnar table formats'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        cache_key = response_cache_key(intent, snapshot.version)
+        entry = response_cache.get(cache_key)
+        
+        # Charts and table first, without waiting for OpenAI
+        data = entry['data'] if entry is not None else _build_analysis(intent, snapshot, use_openai=False)
+        page_df, columns, total = _table_page(snapshot, data, offset, limit, fields)
+        first = _page_body(data, page_df, columns, _page_info(snapshot, offset, limit, total), table_format)
+        
+        def events():
+            yield _sse('analysis', first)
+            
+            if entry is not None or not openai_enabled() or not len(data['chartData']['years']):
+                # Cached or mock summary is already final
+                if entry is None:
+                    response_cache.set(cache_key, {'data': data, 'etag': make_etag(data)})
+                yield _sse('done', {'summary': data['summary']})
+                return
+            
+            parts = []
+            try:
+                for text in stream_summary_with_openai(intent, snapshot):
+                    parts.append(text)
+                    yield _sse('summary', {'text': text})
+            except Exception as e:
+                print(f"OpenAI API error: {e}")
+                yield _sse('error', {'error': 'AI summary unavailable', 'summary': data['summary']})
+                return
+            
+            final = {**data, 'summary': ''.join(parts).strip() or data['summary']}
+            response_cache.set(cache_key, {'data': final, 'etag': make_etag(final)})
+            yield _sse('done', {'summary': final['summary']})
+        
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
     
     except Exception as e:
         return Response(
@@ -109,15 +724,15 @@ def get_localities(request):
     }
     """
     try:
-        df = ApiConfig.real_estate_df
+        snapshot = dataset.get_snapshot()
         
-        if df is None or df.empty:
+        if snapshot is None or not snapshot.rows:
             return Response(
                 {'error': 'Real estate data not loaded'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        localities = sorted(df['final location'].unique().tolist())
+        localities = snapshot.sorted_localities
         
         return Response({
             'localities': localities,
@@ -131,6 +746,337 @@ def get_localities(request):
         )
 
 
+@api_view(['GET'])
+def locality_analytics(request):
+    """
+    Derived statistics per locality: CAGR, year-over-year changes, rolling
+    averages, volatility and price-demand correlation.
+    
+    GET /api/analytics/?localities=Wakad,Aundh&property_type=flat&start=2020&end=2023
+    Optional: series=true (YoY and rolling series per year), sort=price_cagr
+    (or demand_cagr, price_volatility, demand_volatility, correlation),
+    order=desc|asc, limit=N
+    
+    Without localities every locality is returned. Statistics are computed
+    for all localities at once and cached per dataset version and window.
+    
+    Returns: {
+        "years": [...],  # with series=true
+        "localities": [{"locality": "Wakad", "price": {"cagr": 5.2, "volatility": 1.8}, "demand": {...},
+                        "priceDemandCorrelation": 0.41}, ...],
+        "count": 2, "total": 2
+    }
+    """
+    try:
+        snapshot = dataset.get_snapshot()
+        
+        if snapshot is None or not snapshot.rows:
+            return Response(
+                {'error': 'Real estate data not loaded'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        params = request.query_params
+        try:
+            property_type = params.get('property_type', 'flat')
+            if property_type not in PROPERTY_TYPES:
+                raise ValueError(f"property_type must be one of: {', '.join(PROPERTY_TYPES)}")
+            
+            start = int(params['start']) if params.get('start') else None
+            end = int(params['end']) if params.get('end') else None
+            limit = int(params['limit']) if params.get('limit') else None
+            if limit is not None and limit < 1:
+                raise ValueError('limit must be positive')
+            
+            names = [name.strip() for value in params.getlist('localities') for name in value.split(',') if name.strip()]
+            unknown = [name for name in names if name not in snapshot.cube.locality_codes]
+            if unknown:
+                raise ValueError(f"Unknown localities: {', '.join(unknown)}")
+            
+            analytics = window_analytics(snapshot, start, end)
+            if names:
+                codes = np.array([snapshot.cube.locality_codes[name] for name in names], dtype=np.int64)
+            else:
+                codes = np.arange(len(snapshot.localities))
+            
+            if params.get('sort'):
+                codes = sort_localities(analytics, codes, params['sort'], property_type, params.get('order', 'desc') != 'asc')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        series = params.get('series', '').lower() in ('1', 'true', 'yes')
+        selected = codes[:limit] if limit is not None else codes
+        
+        body = {
+            'dataset_version': snapshot.version,
+            'propertyType': property_type,
+            'yearRange': [start, end] if (start, end) != (None, None) else None,
+            'rollingWindow': analytics.window,
+        }
+        if series:
+            body['years'] = analytics.years
+        body['localities'] = [
+            analytics.locality_stats(snapshot.localities[code], property_type, series) for code in selected.tolist()
+        ]
+        body['count'] = len(body['localities'])
+        body['total'] = len(codes)
+        
+        return Response(body)
+    
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def forecast_localities(request):
+    """
+    Price and demand projections per locality from a trend model.
+    
+    GET /api/forecast/?localities=Wakad,Aundh&year=2025&model=linear
+    Optional: year (default: the year after the data), model (linear,
+    log_linear or exponential; default FORECAST_MODEL), property_type,
+    city, sort=price_change (or demand_change, price, demand),
+    order=desc|asc, limit=N
+    
+    Without localities every locality is returned. Every series of the
+    dataset is fitted in one batched pass, cached per dataset version and
+    model.
+    
+    Returns: {
+        "year": 2025, "model": "linear",
+        "localities": [{"locality": "Wakad",
+                        "price": {"lastYear": 2024, "last": 10277.83, "forecast": 10560.2, "change": 2.75},
+                        "demand": {...}}, ...],
+        "count": 2, "total": 2
+    }
+    """
+    try:
+        snapshot = dataset.get_snapshot()
+        
+        if snapshot is None or not snapshot.rows:
+            return Response(
+                {'error': 'Real estate data not loaded'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        params = request.query_params
+        cube = snapshot.cube
+        try:
+            property_type = params.get('property_type', 'flat')
+            if property_type not in PROPERTY_TYPES:
+                raise ValueError(f"property_type must be one of: {', '.join(PROPERTY_TYPES)}")
+            model = params.get('model') or None
+            if model is not None and model not in FORECAST_MODELS:
+                raise ValueError(f"model must be one of: {', '.join(FORECAST_MODELS)}")
+            
+            year = int(params['year']) if params.get('year') else next_year(cube)
+            limit = int(params['limit']) if params.get('limit') else None
+            if limit is not None and limit < 1:
+                raise ValueError('limit must be positive')
+            
+            names = [name.strip() for value in params.getlist('localities') for name in value.split(',') if name.strip()]
+            unknown = [name for name in names if name not in cube.locality_codes]
+            if unknown:
+                raise ValueError(f"Unknown localities: {', '.join(unknown)}")
+            
+            city = params.get('city') or None
+            if city is not None and city not in cube.cities:
+                raise ValueError(f'Unknown city: {city}')
+            
+            forecast = locality_forecast(snapshot, model)
+            if names:
+                codes = np.array([cube.locality_codes[name] for name in names], dtype=np.int64)
+            else:
+                codes = np.arange(len(snapshot.localities))
+            if city is not None:
+                codes = codes[cube.locality_city[codes] == cube.cities.index(city)]
+            
+            if params.get('sort') and year is not None:
+                codes = sort_forecasts(forecast, codes, params['sort'], year, property_type, params.get('order', 'desc') != 'asc')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        selected = codes[:limit] if limit is not None else codes
+        localities = []
+        if year is not None:
+            localities = [
+                forecast.locality_stats(snapshot.localities[code], year, property_type) for code in selected.tolist()
+            ]
+        
+        return Response({
+            'dataset_version': snapshot.version,
+            'propertyType': property_type,
+            'year': year,
+            'model': forecast.model,
+            'localities': localities,
+            'count': len(localities),
+            'total': len(codes)
+        })
+    
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def nearby_localities(request):
+    """
+    Localities nearest to a locality or a point, by great-circle distance.
+    
+    GET /api/nearby/?locality=Wakad&k=5
+    GET /api/nearby/?lat=18.59&lng=73.76&radius_km=5
+    Optional: k (default 5, or every locality within radius_km when a radius
+    is given), radius_km
+    
+    Lookups go through the snapshot's KD-tree over loc_lat/loc_lng.
+    
+    Returns: {
+        "center": {"locality": "Wakad", "lat": 18.597, "lng": 73.763},
+        "localities": [{"locality": "Akurdi", "city": "Pune", "distanceKm": 4.12, "lat": ..., "lng": ...}, ...],
+        "count": 5
+    }
+    """
+    try:
+        snapshot = dataset.get_snapshot()
+        
+        if snapshot is None or not snapshot.rows:
+            return Response(
+                {'error': 'Real estate data not loaded'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        params = request.query_params
+        try:
+            radius_km = float(params['radius_km']) if params.get('radius_km') else None
+            if radius_km is not None and not radius_km > 0:
+                raise ValueError('radius_km must be positive')
+            k = int(params['k']) if params.get('k') else (None if radius_km is not None else 5)
+            if k is not None and k < 1:
+                raise ValueError('k must be positive')
+            
+            locality = params.get('locality', '').strip() or None
+            if locality is not None:
+                if locality not in snapshot.cube.locality_codes:
+                    raise ValueError(f'Unknown locality: {locality}')
+                center = snapshot.geo.coordinates(locality)
+                if center is None:
+                    raise ValueError(f'No coordinates are known for {locality}')
+            elif params.get('lat') and params.get('lng'):
+                center = (float(params['lat']), float(params['lng']))
+                if not (-90 <= center[0] <= 90 and -180 <= center[1] <= 180):
+                    raise ValueError('lat must be within -90..90 and lng within -180..180')
+            else:
+                raise ValueError('Give a locality, or lat and lng')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        geo, cube = snapshot.geo, snapshot.cube
+        results = []
+        for name, distance in geo.nearest_to(*center, k=k, radius_km=radius_km, exclude=locality):
+            code = cube.locality_codes[name]
+            city = cube.locality_city[code]
+            results.append({
+                'locality': name,
+                'city': cube.cities[city] if city >= 0 else None,
+                'distanceKm': round(distance, 3),
+                'lat': float(geo.latitudes[code]),
+                'lng': float(geo.longitudes[code])
+            })
+        
+        return Response({
+            'dataset_version': snapshot.version,
+            'center': {**({'locality': locality} if locality else {}), 'lat': center[0], 'lng': center[1]},
+            'radiusKm': radius_km,
+            'localities': results,
+            'count': len(results)
+        })
+    
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def similar_localities(request):
+    """
+    Localities most like a given one across price levels, price and demand
+    growth, demand, sales mix and supply.
+    
+    GET /api/similar/?locality=Aundh&k=5
+    Optional: k (default 5), metric (cosine or euclidean, default cosine), city
+    
+    The standardized feature matrix is built once per dataset version; each
+    lookup is one matrix-vector product over all localities.
+    
+    Returns: {
+        "locality": "Aundh",
+        "metric": "cosine",
+        "features": ["flat price", ...],
+        "localities": [{"locality": "Baner", "city": "Pune", "score": 0.93}, ...],
+        "count": 5
+    }
+    """
+    try:
+        snapshot = dataset.get_snapshot()
+        
+        if snapshot is None or not snapshot.rows:
+            return Response(
+                {'error': 'Real estate data not loaded'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        params = request.query_params
+        try:
+            k = int(params['k']) if params.get('k') else 5
+            if k < 1:
+                raise ValueError('k must be positive')
+            metric = params.get('metric', 'cosine')
+            if metric not in SIMILARITY_METRICS:
+                raise ValueError(f"metric must be one of: {', '.join(SIMILARITY_METRICS)}")
+            locality = params.get('locality', '').strip()
+            if not locality:
+                raise ValueError('Give a locality')
+            if locality not in snapshot.cube.locality_codes:
+                raise ValueError(f'Unknown locality: {locality}')
+            city = params.get('city') or None
+            if city is not None and city not in snapshot.cube.cities:
+                raise ValueError(f'Unknown city: {city}')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        similarity, cube = locality_similarity(snapshot), snapshot.cube
+        results = []
+        for name, score in similarity.similar(locality, k, metric, city):
+            city_code = cube.locality_city[cube.locality_codes[name]]
+            results.append({
+                'locality': name,
+                'city': cube.cities[city_code] if city_code >= 0 else None,
+                'score': round(score, 4)
+            })
+        
+        return Response({
+            'dataset_version': snapshot.version,
+            'locality': locality,
+            'metric': metric,
+            'features': similarity.features,
+            'localities': results,
+            'count': len(results)
+        })
+    
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['GET'])
 def health_check(request):
     """
@@ -138,20 +1084,265 @@ def health_check(request):
     
     GET /api/health/
     """
-    df = ApiConfig.real_estate_df
+    snapshot = dataset.get_snapshot()
     
     return Response({
         'status': 'ok',
-        'data_loaded': df is not None and not df.empty,
-        'rows': len(df) if df is not None else 0
+        'data_loaded': snapshot is not None and snapshot.rows > 0,
+        'rows': snapshot.rows if snapshot is not None else 0,
+        'storage': snapshot.store.kind if snapshot is not None else None,
+        'dataset_version': snapshot.version if snapshot is not None else None,
+        'intent_cache': intent_cache.stats(),
+        'response_cache': response_cache.stats(),
+        'summary_cache': summary_cache.stats(),
+        'openai': llm.stats()
     })
 
 
+@api_view(['POST'])
+def reload_dataset(request):
+    """
+    Reload the dataset file and atomically swap in the new snapshot.
+    
+    POST /api/admin/reload/
+    Headers: X-Reload-Token: <DATASET_RELOAD_TOKEN>
+    Body (optional): { "force": true }
+    
+    Only the worker handling this request reloads; set DATASET_WATCH_INTERVAL
+    to have every worker pick up changes on its own.
+    """
+    token = settings.DATASET_RELOAD_TOKEN
+    provided = request.headers.get('X-Reload-Token', '')
+    
+    if not token or not hmac.compare_digest(provided, token):
+        return Response(
+            {'error': 'Not authorized to reload the dataset'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    try:
+        snapshot, changed = dataset.reload_snapshot(
+            str(settings.DATASET_PATH),
+            str(settings.DATASET_CACHE_DIR) if settings.DATASET_CACHE_DIR else None,
+            force=bool(request.data.get('force', False)),
+            storage=settings.DATASET_STORAGE
+        )
+        
+        return Response({
+            'reloaded': changed,
+            'dataset_version': snapshot.version,
+            'rows': snapshot.rows
+        })
+    
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+def ingest_dataset(request):
+    """
+    Append or upsert a CSV/Excel batch into the SQLite dataset file.
+    
+    POST /api/admin/ingest/ (multipart)
+    Headers: X-Reload-Token: <DATASET_RELOAD_TOKEN>
+    Fields: file (CSV or Excel with the dataset columns), mode ("upsert" or "append")
+    
+    This worker applies the batch to its snapshot at once; the others pick it
+    up on their next DATASET_WATCH_INTERVAL check (or reload).
+    """
+    token = settings.DATASET_RELOAD_TOKEN
+    provided = request.headers.get('X-Reload-Token', '')
+    
+    if not token or not hmac.compare_digest(provided, token):
+        return Response(
+            {'error': 'Not authorized to ingest into the dataset'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    if settings.DATASET_STORAGE != 'sqlite':
+        return Response(
+            {'error': 'Ingestion needs DATASET_STORAGE=sqlite'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response(
+            {'error': 'Please upload a CSV or Excel batch as "file"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    source_path = str(settings.DATASET_PATH)
+    cache_dir = str(settings.DATASET_CACHE_DIR) if settings.DATASET_CACHE_DIR else None
+    
+    try:
+        result = ingest_batch(upload, source_path, cache_dir, request.data.get('mode', 'upsert'), name=upload.name)
+    except DatasetValidationError as e:
+        return Response(
+            {'error': str(e), 'problems': e.problems},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    try:
+        snapshot, _ = dataset.reload_snapshot(source_path, cache_dir, storage=settings.DATASET_STORAGE)
+    except Exception as e:
+        return Response(
+            {'error': f'Batch {result["batch"]} was ingested, but applying it failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    return Response({
+        'inserted': result['inserted'],
+        'updated': result['updated'],
+        'batch': result['batch'],
+        'dataset_version': snapshot.version,
+        'rows': snapshot.rows
+    })
+
+
+def _export_spec(data: Dict[str, Any], snapshot: dataset.DatasetSnapshot):
+    """
+    Rows and columns selected by an export request.
+    
+    Returns:
+        (localities or None, year range or None, columns)
+    
+    Raises:
+        ValueError: on an invalid spec
+    """
+    store = snapshot.store
+    
+    if data.get('query'):
+        # Same selection as the analysis of that query
+        intent = resolve_intent(get_query_intent(str(data['query']), snapshot), snapshot)
+        localities, year_range = intent['localities'], intent['year_range']
+        property_type, metrics = intent['property_type'], None
+        default_columns = table_columns(store.schema, property_type)
+    else:
+        localities = data.get('localities')
+        if localities is not None:
+            if not isinstance(localities, list):
+                raise ValueError('localities must be a list')
+            unknown = [name for name in localities if name not in snapshot.cube.locality_codes]
+            if unknown:
+                raise ValueError(f"Unknown localities: {', '.join(map(str, unknown))}")
+        
+        years = data.get('years')
+        if isinstance(years, dict):
+            year_range = [years.get('start'), years.get('end')]
+        elif isinstance(years, list) and len(years) == 2:
+            year_range = years
+        elif years is None:
+            year_range = None
+        else:
+            raise ValueError('years must be {"start": ..., "end": ...} or [start, end]')
+        if year_range:
+            year_range = [None if year is None else int(year) for year in year_range]
+        
+        property_type = data.get('property_type', 'flat')
+        if property_type not in PROPERTY_TYPES:
+            raise ValueError(f"property_type must be one of: {', '.join(PROPERTY_TYPES)}")
+        metrics = data.get('metrics')
+        default_columns = list(store.columns)
+    
+    fields = data.get('fields')
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    
+    if fields:
+        columns = fields
+    elif metrics:
+        columns = ['final location', 'year', 'city'] + [metric_column(metric, property_type) for metric in metrics]
+    else:
+        columns = default_columns
+    
+    unknown = [column for column in columns if column not in store.columns]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(map(str, unknown))}")
+    
+    return localities, year_range, columns
+
+
+@api_view(['POST'])
+def export_data(request):
+    """
+    Stream an export of the dataset, selected on the server.
+    
+    POST /api/export/
+    Body: {
+        "query": "Compare Wakad and Aundh",  # export what this query shows, or:
+        "localities": [...], "years": {"start": 2021, "end": 2023},
+        "property_type": "flat", "metrics": ["price", "demand"],
+        "fields": [...],                     # optional column list
+        "format": "csv" | "jsonl" | "parquet" | "arrow",
+        "gzip": false
+    }
+    
+    Without a query or localities the whole dataset is exported. Rows are
+    read from the snapshot's store and serialized chunk by chunk while the
+    response is sent, so memory use does not grow with the export size.
+    """
+    try:
+        snapshot = dataset.get_snapshot()
+        
+        if snapshot is None or not snapshot.rows:
+            return Response(
+                {'error': 'Real estate data not loaded'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        format_type = str(request.data.get('format', 'csv')).lower()
+        gzip = bool(request.data.get('gzip', False))
+        
+        try:
+            localities, year_range, columns = _export_spec(request.data, snapshot)
+            chunks = export_stream(
+                snapshot.store.iter_rows(localities, year_range, columns, settings.EXPORT_CHUNK_ROWS),
+                snapshot.store.schema[columns], format_type, gzip=gzip
+            )
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        export_format = EXPORT_FORMATS[format_type]
+        filename = f"real_estate_data.{export_format['extension']}" + ('.gz' if gzip else '')
+        
+        response = StreamingHttpResponse(
+            chunks,
+            content_type='application/gzip' if gzip else export_format['content_type']
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Dataset-Version'] = snapshot.version
+        return response
+    
+    except Exception as e:
+        return Response(
+            {'error': f'An error occurred: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['POST'])
 def download_data(request):
     """
     Download data in CSV or JSON format.
     
+    Kept for older clients; prefer /api/export/, which selects the rows on
+    the server instead of receiving them back from the browser.
+    
     POST /api/download/
     Body: {
         "tableData": [...],
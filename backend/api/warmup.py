@@ -0,0 +1,43 @@
+"""
+Build ahead of the first requests what they would otherwise build lazily.
+
+A preloading gunicorn master (see ``gunicorn.conf.py``) calls ``warm_up``
+before it forks. The URL configuration (and with it the views, REST
+framework and every module they import) and the snapshot's derived tables
+are then built once and shared copy-on-write by all workers, instead of
+once per worker on its first requests.
+"""
+import time
+
+from django.urls import get_resolver
+
+from . import dataset
+from .analytics import window_analytics
+from .engine import resolve_intent
+from .forecast import locality_forecast
+from .similarity import locality_similarity
+from .utils import extract_chart_data, generate_summary, parse_query_intent
+
+
+def warm_up() -> float:
+    """
+    Import the views and derive the current snapshot's default tables.
+
+    Returns:
+        Seconds it took
+    """
+    start = time.perf_counter()
+    get_resolver().url_patterns
+
+    snapshot = dataset.get_snapshot()
+    if snapshot is not None and snapshot.rows:
+        window_analytics(snapshot)
+        locality_similarity(snapshot)
+        locality_forecast(snapshot)
+
+        # One comparison through the query pipeline, without OpenAI
+        intent = resolve_intent(parse_query_intent(f"Compare {' and '.join(snapshot.localities[:2])}", snapshot.matcher), snapshot)
+        chart_data = extract_chart_data(snapshot.cube, intent['localities'], intent['metrics'], intent['property_type'], intent['year_range'])
+        generate_summary(intent, chart_data, snapshot, use_openai=False)
+
+    return time.perf_counter() - start
@@ -1,5 +1,9 @@
 """
 ASGI config for backend project.
+
+Serves /api/query/async/ without tying up a worker per OpenAI call:
+
+    gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker
 """
 
 import os
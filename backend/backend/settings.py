@@ -31,8 +31,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.StaticFilesMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,6 +70,87 @@ DATABASES = {
     }
 }
 
+# Real estate dataset
+DATASET_PATH = os.environ.get('DATASET_PATH', str(BASE_DIR / 'data' / 'realestate.xlsx'))
+
+# Columnar cache of the dataset, memory-mapped by every worker (empty string disables it)
+DATASET_CACHE_DIR = os.environ.get('DATASET_CACHE_DIR', str(BASE_DIR / 'data' / '.cache'))
+
+# Where the rows live: 'memory' (a DataFrame per worker) or 'sqlite' (an indexed
+# SQLite file in DATASET_CACHE_DIR, queried with filters pushed down)
+DATASET_STORAGE = os.environ.get('DATASET_STORAGE', 'memory')
+
+# Seconds between checks of the dataset file for changes (0 disables hot reload)
+DATASET_WATCH_INTERVAL = float(os.environ.get('DATASET_WATCH_INTERVAL', '0'))
+
+# Start the watcher in forked workers instead of at startup (set by gunicorn.conf.py when preloading)
+DATASET_WATCH_AFTER_FORK = os.environ.get('DATASET_WATCH_AFTER_FORK', 'False') == 'True'
+
+# Shared secret for POST /api/admin/reload/ (the endpoint is disabled when unset)
+DATASET_RELOAD_TOKEN = os.environ.get('DATASET_RELOAD_TOKEN', '')
+
+# Number of parsed query intents kept in each worker's LRU cache
+INTENT_CACHE_SIZE = int(os.environ.get('INTENT_CACHE_SIZE', '1024'))
+
+# Cache of complete /api/query/ responses, keyed by intent and dataset version:
+# 'memory' (per-worker LRU), 'django' (the CACHES alias below) or 'none'
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '256'))
+RESPONSE_CACHE_ALIAS = os.environ.get('RESPONSE_CACHE_ALIAS', 'responses')
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '86400'))
+
+# tableData rows per /api/query/ response, unless the request asks for a "limit" (up to the maximum)
+TABLE_PAGE_SIZE = int(os.environ.get('TABLE_PAGE_SIZE', '500'))
+TABLE_MAX_PAGE_SIZE = int(os.environ.get('TABLE_MAX_PAGE_SIZE', '5000'))
+
+# Years averaged by the rolling averages of /api/analytics/
+ANALYTICS_ROLLING_WINDOW = int(os.environ.get('ANALYTICS_ROLLING_WINDOW', '3'))
+
+# Trend model of forecasts when none is asked for: linear, log_linear or exponential
+FORECAST_MODEL = os.environ.get('FORECAST_MODEL', 'linear')
+# Exponential smoothing factors of the level and the trend, and how much of the trend carries
+# into each further year (1 = no damping); all in (0, 1]
+FORECAST_SMOOTHING_LEVEL = float(os.environ.get('FORECAST_SMOOTHING_LEVEL', '0.5'))
+FORECAST_SMOOTHING_TREND = float(os.environ.get('FORECAST_SMOOTHING_TREND', '0.3'))
+FORECAST_DAMPING = float(os.environ.get('FORECAST_DAMPING', '0.8'))
+
+# Most queries accepted by one /api/query/batch/ request
+QUERY_BATCH_MAX_SIZE = int(os.environ.get('QUERY_BATCH_MAX_SIZE', '100'))
+
+# Rows serialized at a time by streamed exports (/api/export/) and NDJSON query responses
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', '10000'))
+
+# Responses smaller than this are sent uncompressed (see api.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Persistent cache of OpenAI summaries, keyed by prompt and model settings (empty path disables it)
+SUMMARY_CACHE_PATH = os.environ.get('SUMMARY_CACHE_PATH', str(BASE_DIR / 'data' / '.cache' / 'summaries.sqlite3'))
+SUMMARY_CACHE_TTL = float(os.environ.get('SUMMARY_CACHE_TTL', str(7 * 24 * 3600)))
+# Seconds between deletions of expired summaries (each process, when it stores one)
+SUMMARY_CACHE_PURGE_INTERVAL = float(os.environ.get('SUMMARY_CACHE_PURGE_INTERVAL', '3600'))
+
+# OpenAI calls (see api.llm): deadline per call, concurrent calls per process and how long a
+# request waits for a free slot, in seconds; after OPENAI_BREAKER_THRESHOLD failed calls in a row
+# (or calls slower than OPENAI_SLOW_CALL) summaries use the mock text for OPENAI_BREAKER_RESET seconds
+OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', '20'))
+OPENAI_MAX_CONCURRENCY = int(os.environ.get('OPENAI_MAX_CONCURRENCY', '8'))
+OPENAI_QUEUE_TIMEOUT = float(os.environ.get('OPENAI_QUEUE_TIMEOUT', '2'))
+OPENAI_BREAKER_THRESHOLD = int(os.environ.get('OPENAI_BREAKER_THRESHOLD', '5'))
+OPENAI_BREAKER_RESET = float(os.environ.get('OPENAI_BREAKER_RESET', '30'))
+OPENAI_SLOW_CALL = float(os.environ.get('OPENAI_SLOW_CALL', '10'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # File-based, so cached responses are shared by all workers on a host
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RESPONSE_CACHE_DIR', str(BASE_DIR / 'data' / '.cache' / 'responses')),
+        'OPTIONS': {'MAX_ENTRIES': RESPONSE_CACHE_SIZE * 10},
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,11 +184,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'api.renderers.JSONFallbackNegotiation',
 }
 
 # CORS Settings
@@ -142,4 +225,8 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
 ]
+
+# Let the frontend read ETags for conditional repeat queries
+CORS_EXPOSE_HEADERS = ['etag']
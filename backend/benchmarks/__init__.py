@@ -0,0 +1,7 @@
+"""
+Benchmark scripts for the backend.
+
+Run them from the ``backend`` directory, e.g.::
+
+    python -m benchmarks.startup --rows 100000
+"""
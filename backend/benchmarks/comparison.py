@@ -0,0 +1,85 @@
+"""
+Benchmark: comparison chart data for many localities, cube gather vs the old loops.
+
+    python -m benchmarks.comparison --localities 2 10 100 500 --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from api.index import LocalityYearCube  # noqa: E402
+from api.renderers import dumps  # noqa: E402
+from api.schema import normalize_dataframe  # noqa: E402
+from api.utils import extract_chart_data  # noqa: E402
+
+from .synthetic import make_dataframe  # noqa: E402
+
+
+def legacy_comparison(df, localities, metrics):
+    """Comparison branch of extract_chart_data before the cube index (per-locality, per-year filters)."""
+    years = sorted(df['year'].unique())
+    chart_data = {'years': years}
+    columns = {'price': ('prices_by_locality', 'flat - weighted average rate'),
+               'demand': ('demand_by_locality', 'flat_sold - igr')}
+
+    for metric in metrics:
+        key, column = columns[metric]
+        chart_data[key] = {}
+        for locality in localities:
+            locality_df = df[df['final location'] == locality].sort_values('year')
+            values = []
+            for year in years:
+                year_data = locality_df[locality_df['year'] == year]
+                if year_data.empty:
+                    values.append(None)
+                elif metric == 'price':
+                    values.append(round(year_data[column].iloc[0], 2))
+                else:
+                    values.append(int(year_data[column].iloc[0]))
+            chart_data[key][locality] = values
+
+    return chart_data
+
+
+def per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--localities', type=int, nargs='+', default=[2, 10, 100, 500])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    df = normalize_dataframe(make_dataframe(args.rows))
+    cube = LocalityYearCube(df)
+    metrics = ['price', 'demand']
+    print(f"{len(df):,} rows, {len(cube.localities):,} localities")
+
+    print(f"{'localities':>10} {'legacy':>12} {'cube':>12} {'speedup':>9}")
+    for count in args.localities:
+        localities = random.Random(count).sample(cube.localities, count)
+
+        # Same JSON either way
+        assert json.loads(dumps(legacy_comparison(df, localities, metrics))) == \
+            json.loads(dumps(extract_chart_data(cube, localities, metrics)))
+
+        legacy = per_call(lambda: legacy_comparison(df, localities, metrics), max(1, args.repeat // 10))
+        vectorized = per_call(lambda: extract_chart_data(cube, localities, metrics), args.repeat)
+
+        print(f"{count:>10,} {legacy * 1e3:>10.2f}ms {vectorized * 1e3:>10.3f}ms {legacy / vectorized:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers every completion (plain or ``stream=True``) with a canned summary
+after a configurable delay and counts the calls, so summary caching and load tests can run without
+network access or API costs:
+
+    python -m benchmarks.fake_openai --port 8765 --latency 1.5
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test python manage.py runserver
+
+GET /stats returns {"calls": N}.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, call, model, content):
+        """Send ``content`` word by word as chat.completion.chunk server-sent events."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        words = content.split(' ')
+        for i, word in enumerate(words):
+            chunk = {
+                'id': f'chatcmpl-fake-{call}',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': word if i == 0 else ' ' + word}, 'finish_reason': None}],
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+        self.close_connection = True
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send_json(200, {'calls': FakeOpenAIHandler.calls})
+        else:
+            self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with FakeOpenAIHandler.lock:
+            FakeOpenAIHandler.calls += 1
+            call = FakeOpenAIHandler.calls
+        time.sleep(self.latency)
+
+        prompt = request.get('messages', [{}])[-1].get('content', '')
+        content = f'Stub summary #{call} ({len(prompt)} prompt characters).'
+
+        if request.get('stream'):
+            self._send_stream(call, request.get('model', 'fake'), content)
+            return
+
+        self._send_json(200, {
+            'id': f'chatcmpl-fake-{call}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': 8, 'total_tokens': len(prompt) // 4 + 8},
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up waiting (deadlines) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(port: int = 8765, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub in a background thread and return the server."""
+    FakeOpenAIHandler.latency = latency
+    server = FakeOpenAIServer(('127.0.0.1', port), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds per completion')
+    args = parser.parse_args()
+
+    FakeOpenAIHandler.latency = args.latency
+    server = FakeOpenAIServer(('127.0.0.1', args.port), FakeOpenAIHandler)
+    print(f"🤖 Fake OpenAI API on http://127.0.0.1:{args.port}/v1 ({args.latency}s per completion)")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
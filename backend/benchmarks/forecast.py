@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: batched trend fits for every locality vs one fit per locality.
+
+    python -m benchmarks.forecast --sizes 1000 10000 50000
+
+The batched models fit every metric series of the cube; the loop baseline
+(``np.polyfit`` per locality, the way a per-locality forecast would be
+written) fits only the flat price and demand series of each locality.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from api.engine import metric_column
+from api.forecast import FORECAST_MODELS, LocalityForecast
+from api.index import LocalityYearCube
+from api.schema import normalize_dataframe
+
+from .synthetic import make_dataframe
+
+
+def per_locality_loop(cube):
+    """Linear fit of the flat price and demand series, one locality at a time."""
+    years = cube.years.astype(np.float64)
+    projections = []
+    for code in range(len(cube.localities)):
+        for metric in (metric_column('price'), metric_column('demand')):
+            series = cube.values[code, :, cube.metric_codes[metric]]
+            known = ~np.isnan(series)
+            if known.sum() < 2:
+                projections.append(np.nan)
+                continue
+            slope, intercept = np.polyfit(years[known], series[known], 1)
+            projections.append(intercept + slope * (years[-1] + 1))
+    return projections
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='localities')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-loop', action='store_true', help='skip the per-locality baseline')
+    args = parser.parse_args()
+
+    print(f"{'localities':>10} {'series':>9} " + ' '.join(f'{model:>12}' for model in FORECAST_MODELS)
+          + f" {'predict':>9} {'loop (2 series)':>16}")
+    for size in args.sizes:
+        cube = LocalityYearCube(normalize_dataframe(make_dataframe(size * 5, seed=size)))
+        fits = [timed(lambda: LocalityForecast(cube, model), args.repeat) for model in FORECAST_MODELS]
+        forecast = LocalityForecast(cube)
+        predict = timed(lambda: forecast.predict(int(cube.years[-1]) + 1), args.repeat)
+        loop = float('nan') if args.no_loop else timed(lambda: per_locality_loop(cube), 1)
+
+        series = len(cube.localities) * len(cube.metric_codes)
+        print(f"{len(cube.localities):>10,} {series:>9,} " + ' '.join(f'{fit * 1e3:>10.1f}ms' for fit in fits)
+              + f" {predict * 1e3:>7.1f}ms {loop:>15.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Incremental ingest: time to apply a batch of rows in a worker, by dataset
+size and batch size, against rebuilding the snapshot from the file.
+
+    python -m benchmarks.ingest --localities 10000 100000 200000 --batch 10 100 1000
+
+Each batch upserts the last year of ``batch`` random existing localities
+with new figures, so every cell it touches is already in the file. The
+columns are medians over ``--repeat`` batches, each applied on top of the
+previous one as a worker would:
+
+- write: ingest_sqlite, one transaction on the file
+- cube: SQLiteStore.updated, reading the changed cells and patching the cube
+- aggregates: LocalityAggregates.updated, including the growth ranks
+- snapshot: DatasetSnapshot.updated end to end (cube, aggregates, geo index,
+  matcher and derived tables such as the default analytics)
+- rebuild: opening the file from scratch, for comparison
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import django
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from api.analytics import window_analytics  # noqa: E402
+from api.dataset import DatasetSnapshot  # noqa: E402
+from api.schema import CATEGORICAL_COLUMNS, normalize_dataframe  # noqa: E402
+from api.storage import SQLiteStore, ingest_sqlite, write_sqlite  # noqa: E402
+
+from .synthetic import make_dataframe  # noqa: E402
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def open_snapshot(path: str) -> DatasetSnapshot:
+    store = SQLiteStore(path)
+    snapshot = DatasetSnapshot(store.version, store, path, {})
+    window_analytics(snapshot)
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--localities', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--batch', type=int, nargs='+', default=[10, 100, 1000], help='localities per batch')
+    parser.add_argument('--repeat', type=int, default=5, help='batches per measurement')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'localities':>10} {'batch':>6} {'write':>9} {'cube':>9} {'aggregates':>11} {'snapshot':>9} {'rebuild':>9}")
+    for size in args.localities:
+        with tempfile.TemporaryDirectory() as directory:
+            df = normalize_dataframe(make_dataframe(size * 5, seed=size))
+            for name in CATEGORICAL_COLUMNS:
+                df[name] = df[name].astype('category')
+            path = os.path.join(directory, 'realestate.sqlite3')
+            write_sqlite(path, [df], {'version': f'bench-{size}'})
+            del df
+
+            snapshot, rebuild = timed(lambda: open_snapshot(path))
+            for batch in args.batch:
+                times = {'write': [], 'cube': [], 'aggregates': [], 'snapshot': []}
+                for _ in range(args.repeat):
+                    cube = snapshot.cube
+                    localities = [cube.localities[code] for code in rng.choice(len(cube.localities), batch, replace=False)]
+                    last_year = int(cube.years[-1])
+                    rows = snapshot.store.rows(localities, [last_year, last_year])
+                    rows['flat - weighted average rate'] *= rng.uniform(0.8, 1.2, len(rows))
+                    rows['flat_sold - igr'] += 1
+
+                    _, elapsed = timed(lambda: ingest_sqlite(path, rows))
+                    times['write'].append(elapsed)
+                    store, elapsed = timed(lambda: SQLiteStore(path, previous=snapshot.store))
+                    times['cube'].append(elapsed)
+                    _, elapsed = timed(lambda: snapshot.aggregates.updated(store.cube, store.changed))
+                    times['aggregates'].append(elapsed)
+                    snapshot, elapsed = timed(snapshot.updated)
+                    times['snapshot'].append(elapsed)
+
+                medians = {stage: statistics.median(values) for stage, values in times.items()}
+                print(f"{len(snapshot.localities):>10,} {batch:>6,} " + ' '.join(
+                    f'{medians[stage] * 1e3:>{width - 2}.1f}ms'
+                    for stage, width in (('write', 9), ('cube', 9), ('aggregates', 11), ('snapshot', 9))
+                ) + f" {rebuild * 1e3:>7.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
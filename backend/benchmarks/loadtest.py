@@ -0,0 +1,157 @@
+"""
+Load test: /api/query/ on a pool of sync workers vs /api/query/async/,
+with every summary coming from a local fake OpenAI server.
+
+    python -m benchmarks.loadtest --requests 200 --workers 4 --latency 1.0
+
+Requests go through the full middleware stack in-process (Django's test
+Client on ``--workers`` threads, AsyncClient on one event loop). Each
+request asks a different question, and the summary and response caches are
+off, so every request needs its own completion. The last run makes the fake
+server slower than OPENAI_TIMEOUT to show deadlines and the circuit breaker.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+# Uncached summaries from the fake server, before settings are read
+os.environ.update({
+    'OPENAI_API_KEY': 'test',
+    'SUMMARY_CACHE_PATH': '',
+    'RESPONSE_CACHE_BACKEND': 'none',
+    'ALLOWED_HOSTS': 'testserver',
+})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+from .fake_openai import FakeOpenAIHandler, serve  # noqa: E402
+
+
+def make_queries(snapshot, count):
+    """``count`` different questions over the loaded dataset (repeating if it runs out)."""
+    years = sorted(snapshot.cube.years.tolist())
+    ranges = [f'{start}-{end}' for start, end in itertools.combinations(years, 2)] or [str(year) for year in years]
+    questions = []
+    for kind in ('', ' office prices', ' shop prices'):
+        for window in ranges:
+            for locality in snapshot.localities:
+                questions.append(f'Analyze {locality}{kind} {window}')
+            for first, second in itertools.combinations(snapshot.localities, 2):
+                questions.append(f'Compare {first} and {second}{kind} {window}')
+    return list(itertools.islice(itertools.cycle(questions), count))
+
+
+def is_ai_summary(response):
+    return response.status_code == 200 and response.json()['summary'].startswith('Stub summary')
+
+
+def report(name, latencies, ai_summaries, elapsed, upstream_calls):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:<26} {len(latencies) / elapsed:>7.1f}/s {statistics.median(latencies):>8.2f}s {p95:>8.2f}s "
+        f"{ai_summaries:>5}/{len(latencies):<5} {upstream_calls:>9}"
+    )
+
+
+def upstream_calls(base_url):
+    with urllib.request.urlopen(base_url.replace('/v1', '/stats')) as response:
+        return json.loads(response.read())['calls']
+
+
+def run_sync(queries, workers):
+    """/api/query/ on ``workers`` threads, like as many sync gunicorn workers."""
+    from django.test import Client
+
+    def one(query):
+        start = time.perf_counter()
+        response = Client().post('/api/query/', {'query': query}, content_type='application/json')
+        return time.perf_counter() - start, is_ai_summary(response)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool, contextlib.redirect_stdout(io.StringIO()):
+        results = list(pool.map(one, queries))
+    return [latency for latency, _ in results], sum(ai for _, ai in results), time.perf_counter() - start
+
+
+def run_async(queries):
+    """All of ``queries`` at once against /api/query/async/ on one event loop."""
+    from django.test import AsyncClient
+
+    async def one(client, query):
+        start = time.perf_counter()
+        response = await client.post('/api/query/async/', {'query': query}, content_type='application/json')
+        return time.perf_counter() - start, is_ai_summary(response)
+
+    async def main():
+        client = AsyncClient()
+        return await asyncio.gather(*(one(client, query) for query in queries))
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(main())
+    return [latency for latency, _ in results], sum(ai for _, ai in results), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4, help='threads serving the sync endpoint')
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds per fake completion')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--timeout', type=float, default=3.0, help='OPENAI_TIMEOUT for the run')
+    parser.add_argument('--concurrency', type=int, default=64, help='OPENAI_MAX_CONCURRENCY for the run')
+    parser.add_argument('--queue-timeout', type=float, default=10.0, help='OPENAI_QUEUE_TIMEOUT for the run')
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}/v1'
+    os.environ.update({
+        'OPENAI_BASE_URL': base_url,
+        'OPENAI_TIMEOUT': str(args.timeout),
+        'OPENAI_MAX_CONCURRENCY': str(args.concurrency),
+        'OPENAI_QUEUE_TIMEOUT': str(args.queue_timeout),
+    })
+    django.setup()
+
+    from api import dataset, llm
+
+    server = serve(args.port, args.latency)
+    queries = make_queries(dataset.get_snapshot(), args.requests * 2 + args.workers * 4)
+    sync_queries = queries[:args.workers * 4]
+    async_queries = queries[args.workers * 4:args.workers * 4 + args.requests]
+    slow_queries = queries[args.workers * 4 + args.requests:]
+
+    print(f"{len(queries)} questions, fake OpenAI {args.latency}s per completion, OPENAI_TIMEOUT {args.timeout}s")
+    print(f"{'endpoint':<26} {'rate':>9} {'p50':>9} {'p95':>9} {'AI summaries':>11} {'upstream':>9}")
+
+    try:
+        # Fewer requests for the sync pool: each one holds a worker for the whole completion
+        calls = upstream_calls(base_url)
+        latencies, ai, elapsed = run_sync(sync_queries, args.workers)
+        report(f'sync, {args.workers} workers', latencies, ai, elapsed, upstream_calls(base_url) - calls)
+
+        calls = upstream_calls(base_url)
+        latencies, ai, elapsed = run_async(async_queries)
+        report('async', latencies, ai, elapsed, upstream_calls(base_url) - calls)
+
+        # Upstream slower than the deadline: timeouts trip the breaker, the rest get the mock summary at once
+        FakeOpenAIHandler.latency = args.timeout * 2
+        calls = upstream_calls(base_url)
+        latencies, ai, elapsed = run_async(slow_queries)
+        report(f'async, upstream {FakeOpenAIHandler.latency:g}s', latencies, ai, elapsed, upstream_calls(base_url) - calls)
+        print(f"circuit breaker: {llm.breaker.stats()}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark: compiled ``LocalityMatcher`` vs the old substring loop.
+
+    python -m benchmarks.matcher --sizes 100 1000 10000 50000
+"""
+import argparse
+import random
+import time
+
+from api.matcher import LocalityMatcher
+
+SYLLABLES = ['wa', 'kad', 'aun', 'dh', 'ak', 'ur', 'di', 'am', 'be', 'gaon', 'ba', 'ner',
+             'pim', 'ple', 'sau', 'da', 'gar', 'hin', 'je', 'wa', 'di', 'kot', 'hr', 'ud']
+
+
+def make_names(count: int, seed: int = 0):
+    """Unique, pronounceable-ish locality names."""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        if rng.random() < 0.2:
+            word += rng.choice([' Budruk', ' Khurd', ' Gaon', ' Nagar'])
+        names.add(word)
+    return sorted(names)
+
+
+def substring_loop(query, localities):
+    """The matching loop parse_query_intent used before the matcher."""
+    query_lower = query.lower()
+    return [locality for locality in localities if locality.lower() in query_lower]
+
+
+def per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'localities':>10} {'build':>9} {'loop/query':>12} {'exact/query':>12} {'typo/query':>12}")
+    for size in args.sizes:
+        names = make_names(size)
+        rng = random.Random(size)
+        a, b = rng.sample(names, 2)
+        exact_query = f'Compare {a} and {b} prices'
+        typo_query = f'Compare {a[:3] + a[4:]} and {b} prices'
+
+        start = time.perf_counter()
+        matcher = LocalityMatcher(names)
+        build = time.perf_counter() - start
+
+        loop = per_call(lambda: substring_loop(exact_query, names), max(1, args.repeat // 10))
+        exact = per_call(lambda: matcher.find(exact_query), args.repeat)
+        typo = per_call(lambda: matcher.find(typo_query), args.repeat)
+
+        print(f"{size:>10,} {build:>8.2f}s {loop * 1e6:>10.0f}µs {exact * 1e6:>10.0f}µs {typo * 1e6:>10.0f}µs")
+
+
+if __name__ == '__main__':
+    main()
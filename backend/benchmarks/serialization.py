@@ -0,0 +1,72 @@
+"""
+Benchmark: response serialization, stock DRF JSONRenderer vs ORJSONRenderer.
+
+    python -m benchmarks.serialization --localities 1000 --rows 100000
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.index import LocalityYearCube  # noqa: E402
+from api.renderers import ORJSON_AVAILABLE, ORJSONRenderer  # noqa: E402
+from api.schema import normalize_dataframe  # noqa: E402
+from api.utils import extract_chart_data, format_table_data  # noqa: E402
+
+from .synthetic import make_dataframe  # noqa: E402
+
+
+def as_lists(chart_data):
+    """Chart data as the views built it before: Python lists, None for missing values."""
+    def convert(value):
+        if isinstance(value, dict):
+            return {key: convert(item) for key, item in value.items()}
+        if hasattr(value, 'tolist'):
+            return [None if item != item else item for item in value.tolist()]
+        return value
+    return convert(chart_data)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--localities', type=int, default=1000, help='localities in the comparison chart')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not ORJSON_AVAILABLE:
+        print('⚠️ orjson is not installed; ORJSONRenderer falls back to the stdlib encoder')
+
+    df = normalize_dataframe(make_dataframe(args.rows))
+    cube = LocalityYearCube(df)
+    localities = cube.localities[:args.localities]
+    drf, fast = JSONRenderer(), ORJSONRenderer()
+
+    payloads = {
+        f'chart ({len(localities):,} localities)': lambda: extract_chart_data(cube, localities, ['price', 'demand']),
+        f'table ({len(df):,} rows)': lambda: {'tableData': format_table_data(df)},
+    }
+
+    print(f"{'payload':<28} {'size':>9} {'lists+DRF':>11} {'orjson':>9} {'speedup':>8}")
+    for name, build in payloads.items():
+        data = build()
+        legacy, body = timed(lambda: drf.render(as_lists(data)), args.repeat)
+        current, _ = timed(lambda: fast.render(data), args.repeat)
+        print(f"{name:<28} {len(body) / 1e6:>7.1f}MB {legacy * 1e3:>9.1f}ms {current * 1e3:>7.1f}ms {legacy / current:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: "similar localities" feature matrix build and top-k search.
+
+    python -m benchmarks.similarity --sizes 1000 10000 50000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from api.analytics import LocalityAnalytics
+from api.index import LocalityYearCube
+from api.schema import normalize_dataframe
+from api.similarity import SIMILARITY_METRICS, LocalitySimilarity
+
+from .synthetic import make_dataframe
+
+
+def per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='localities')
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'localities':>10} {'features':>9} {'build':>9} " + ' '.join(f'{metric + "/query":>16}' for metric in SIMILARITY_METRICS))
+    for size in args.sizes:
+        cube = LocalityYearCube(normalize_dataframe(make_dataframe(size * 5, seed=size)))
+        analytics = LocalityAnalytics(cube)
+
+        start = time.perf_counter()
+        similarity = LocalitySimilarity(cube, analytics)
+        build = time.perf_counter() - start
+
+        rng = np.random.default_rng(size)
+        names = [cube.localities[code] for code in rng.integers(0, len(cube.localities), args.repeat).tolist()]
+        timings = []
+        for metric in SIMILARITY_METRICS:
+            queries = iter(names)
+            timings.append(per_call(lambda: similarity.similar(next(queries), args.k, metric), args.repeat))
+
+        print(f"{len(cube.localities):>10,} {similarity.matrix.shape[1]:>9} {build:>8.2f}s "
+              + ' '.join(f'{timing * 1e3:>14.2f}ms' for timing in timings))
+
+
+if __name__ == '__main__':
+    main()
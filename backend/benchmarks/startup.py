@@ -0,0 +1,61 @@
+"""
+Startup-time comparison: ``pd.read_excel`` vs the columnar dataset cache.
+
+    python -m benchmarks.startup --rows 100000
+
+Each measurement runs in a fresh interpreter so imports and page-cache state
+look like a worker starting up.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .synthetic import write_workbook
+
+LOAD_SNIPPET = """
+import time
+start = time.perf_counter()
+from api.dataset import load_dataset
+df, _ = load_dataset({source!r}, {cache_dir!r})
+assert len(df) > 0
+print(time.perf_counter() - start)
+"""
+
+
+def time_load(source: str, cache_dir) -> float:
+    """Seconds taken by ``load_dataset`` (imports included) in a new process."""
+    code = LOAD_SNIPPET.format(source=source, cache_dir=cache_dir)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=backend_dir)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'realestate.xlsx')
+        cache_dir = os.path.join(tmp, 'cache')
+
+        start = time.perf_counter()
+        write_workbook(source, args.rows)
+        print(f"Wrote {args.rows:,}-row workbook in {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(source) / 1e6:.1f} MB)")
+
+        excel = min(time_load(source, None) for _ in range(args.repeat))
+        build = time_load(source, cache_dir)
+        cached = min(time_load(source, cache_dir) for _ in range(args.repeat))
+
+        print(f"{'read_excel (no cache)':<28}{excel:>8.3f}s")
+        print(f"{'first start (builds cache)':<28}{build:>8.3f}s")
+        print(f"{'cached start (memory-mapped)':<28}{cached:>8.3f}s  ({excel / cached:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
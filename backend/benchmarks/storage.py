@@ -0,0 +1,216 @@
+"""
+Storage backend comparison: request latency and worker RSS with the rows in
+memory (DataFrame over the columnar cache) vs in SQLite.
+
+    python -m benchmarks.storage --rows 10000 1000000 10000000
+    python -m benchmarks.storage --rows 10000000 --periods 12
+
+With ``--periods N`` every (locality, year) gets N rows, like monthly
+figures: the table has N times more rows than the cube has cells.
+
+Each synthetic dataset is converted once into both formats. Every backend is
+then measured in a fresh interpreter, like a worker starting up: time to open
+the store and build the snapshot, memory once loaded, and median latency of
+/api/query/ and /api/export/ requests through the Django test client.
+
+Memory is the RSS added by the dataset, its anonymous part (what every
+worker pays for itself; the rest are file pages shared through the page
+cache) and the peak RSS of the whole run. The figures are read from /proc, so
+they need Linux.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rows generated per synthetic chunk (a multiple of 5 years x 12 periods per locality)
+CHUNK_ROWS = 600_000
+
+
+def prepare(directory: str, rows: int, periods: int = 1) -> None:
+    """Write a ``rows``-row dataset as a columnar cache and a SQLite file in ``directory``."""
+    import pandas as pd
+
+    from api.dataset import cache_path_for, file_fingerprint, file_sha256, sqlite_path_for, write_cache
+    from api.schema import CATEGORICAL_COLUMNS, normalize_dataframe
+    from api.storage import write_sqlite
+
+    from .synthetic import make_dataframe
+
+    frames = []
+    for i, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        chunk = make_dataframe(min(CHUNK_ROWS, rows - start) // periods, seed=i)
+        chunk = chunk.loc[chunk.index.repeat(periods)].reset_index(drop=True)
+        chunk['final location'] = f'C{i:03d} ' + chunk['final location']
+        frames.append(normalize_dataframe(chunk))
+    df = pd.concat(frames, ignore_index=True)
+    del frames
+    for name in CATEGORICAL_COLUMNS:
+        df[name] = df[name].astype('category')
+
+    # Stand-in for the workbook: the caches only need its fingerprint and hash
+    source = os.path.join(directory, 'realestate.xlsx')
+    with open(source, 'w') as f:
+        f.write(f'synthetic dataset, {rows} rows\n')
+
+    write_cache(df, source, cache_path_for(source, directory))
+    sha256 = file_sha256(source)
+    write_sqlite(
+        sqlite_path_for(source, directory), [df],
+        {'source': file_fingerprint(source), 'sha256': sha256, 'version': sha256[:12]}
+    )
+
+
+def _memory_mb(field: str, path: str = '/proc/self/status') -> float:
+    with open(path) as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def measure(directory: str, storage: str, repeat: int) -> dict:
+    """Load one backend (in this, fresh, process) and time requests against it."""
+    import contextlib
+    import gc
+    import io
+    import random
+    import statistics
+
+    os.environ.update({
+        'OPENAI_API_KEY': '',
+        'SUMMARY_CACHE_PATH': '',
+        'RESPONSE_CACHE_BACKEND': 'none',
+        'ALLOWED_HOSTS': 'testserver',
+    })
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    with contextlib.redirect_stdout(io.StringIO()):
+        django.setup()
+
+    from django.test import Client
+
+    from api import dataset
+
+    source = os.path.join(directory, 'realestate.xlsx')
+    gc.collect()
+    baseline = _memory_mb('VmRSS')
+    baseline_anonymous = _memory_mb('Anonymous', '/proc/self/smaps_rollup')
+
+    start = time.perf_counter()
+    store, version = dataset.load_store(source, directory, storage)
+    snapshot = dataset.DatasetSnapshot(version, store, source, dataset.file_fingerprint(source))
+    dataset.publish_snapshot(snapshot)
+    load = time.perf_counter() - start
+    gc.collect()
+    loaded = _memory_mb('VmRSS')
+    anonymous = _memory_mb('Anonymous', '/proc/self/smaps_rollup')
+
+    client = Client()
+    rng = random.Random(0)
+    localities = snapshot.localities
+
+    def timed(call):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = call()
+            if response.streaming:
+                b''.join(response.streaming_content)
+            assert response.status_code == 200, response.status_code
+            times.append((time.perf_counter() - start) * 1000)
+        return statistics.median(times)
+
+    def post(url, body):
+        return client.post(url, body, content_type='application/json')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies = {
+            'analyze': timed(lambda: post('/api/query/', {'query': f'Analyze {rng.choice(localities)}'})),
+            'compare': timed(lambda: post('/api/query/', {
+                'query': f'Compare {rng.choice(localities)} and {rng.choice(localities)} 2021-2023', 'limit': 20
+            })),
+            'export': timed(lambda: post('/api/export/', {
+                'localities': rng.sample(localities, min(50, len(localities))), 'format': 'csv'
+            })),
+        }
+
+    return {
+        'rows': snapshot.rows,
+        'load': load,
+        'rss': loaded - baseline,
+        'anonymous': anonymous - baseline_anonymous,
+        'peak': _memory_mb('VmHWM'),
+        **latencies,
+    }
+
+
+def run(args, *extra) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, '-m', 'benchmarks.storage', *map(str, args), *extra],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+
+
+def _size_mb(path: str) -> float:
+    if os.path.isdir(path):
+        return sum(_size_mb(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--periods', type=int, default=1, help='rows per locality and year')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per measurement')
+    parser.add_argument('--prepare', metavar='DIR', help=argparse.SUPPRESS)
+    parser.add_argument('--measure', nargs=2, metavar=('DIR', 'STORAGE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare(args.prepare, args.rows[0], args.periods)
+        return
+    if args.measure:
+        print(json.dumps(measure(*args.measure, args.repeat)))
+        return
+
+    print(f"{'rows':>11} {'storage':<8} {'on disk':>9} {'load':>7} {'RSS':>9} {'anon':>9} {'peak RSS':>9} "
+          f"{'analyze':>9} {'compare':>9} {'export':>9}")
+    for rows in args.rows:
+        directory = tempfile.mkdtemp(prefix='storage-bench-')
+        try:
+            start = time.perf_counter()
+            result = run(['--prepare', directory, '--rows', rows, '--periods', args.periods])
+            if result.returncode != 0:
+                print(f"{rows:>11,} could not build the dataset (exit {result.returncode}): "
+                      f"{result.stderr.strip().splitlines()[-1:] or ''}")
+                continue
+            print(f"{rows:>11,} built in {time.perf_counter() - start:.0f}s")
+            sizes = {
+                'memory': _size_mb(os.path.join(directory, 'realestate')),
+                'sqlite': _size_mb(os.path.join(directory, 'realestate.sqlite3')),
+            }
+
+            for storage in ('memory', 'sqlite'):
+                result = run(['--measure', directory, storage, '--repeat', args.repeat])
+                if result.returncode != 0:
+                    print(f"{'':>11} {storage:<8} failed (exit {result.returncode}): "
+                          f"{result.stderr.strip().splitlines()[-1:] or ''}")
+                    continue
+                m = json.loads(result.stdout.strip().splitlines()[-1])
+                print(
+                    f"{'':>11} {storage:<8} {sizes[storage]:>7.0f}MB {m['load']:>6.1f}s {m['rss']:>7.0f}MB "
+                    f"{m['anonymous']:>7.0f}MB {m['peak']:>7.0f}MB {m['analyze']:>7.1f}ms {m['compare']:>7.1f}ms {m['export']:>7.1f}ms"
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Synthetic datasets with the same schema as ``data/realestate.xlsx``.
+"""
+import numpy as np
+import pandas as pd
+
+PROPERTY_TYPES = ['flat', 'office', 'others', 'shop']
+
+
+def make_dataframe(rows: int, years=range(2020, 2025), cities=('Pune', 'Mumbai', 'Nagpur'), seed: int = 0) -> pd.DataFrame:
+    """
+    Build a DataFrame with ``rows`` rows (rounded up to whole localities).
+
+    Every locality gets one row per year, like the real dataset.
+    """
+    rng = np.random.default_rng(seed)
+    years = np.asarray(list(years))
+    n_localities = max(1, -(-rows // len(years)))
+
+    locality_names = np.array([f'Locality {i:06d}' for i in range(n_localities)], dtype=object)
+    locality_cities = np.asarray(cities, dtype=object)[rng.integers(0, len(cities), n_localities)]
+    lat = rng.uniform(18.0, 21.5, n_localities)
+    lng = rng.uniform(72.8, 79.5, n_localities)
+
+    n = n_localities * len(years)
+    df = pd.DataFrame({
+        'final location': np.repeat(locality_names, len(years)),
+        'year': np.tile(years, n_localities),
+        'city': np.repeat(locality_cities, len(years)),
+        'loc_lat': np.repeat(lat, len(years)),
+        'loc_lng': np.repeat(lng, len(years)),
+    })
+
+    # Prices trend upwards from a per-locality base level
+    base_rate = np.repeat(rng.uniform(4000, 15000, n_localities), len(years))
+    trend = 1 + 0.05 * np.tile(np.arange(len(years)), n_localities)
+
+    sold = {}
+    for kind in PROPERTY_TYPES:
+        sold[kind] = rng.integers(0, 5000 if kind == 'flat' else 500, n)
+    total_sold = sum(sold.values())
+
+    df['total_sales - igr'] = total_sold * rng.integers(3_000_000, 9_000_000, n)
+    df['total sold - igr'] = total_sold
+    for kind in PROPERTY_TYPES:
+        df[f'{kind}_sold - igr'] = sold[kind]
+    df['commercial_sold - igr'] = sold['office'] + sold['shop']
+    df['other_sold - igr'] = rng.integers(0, 30, n)
+    df['residential_sold - igr'] = sold['flat'] + rng.integers(0, 50, n)
+
+    rates = {}
+    for kind in PROPERTY_TYPES:
+        multiplier = 1.0 if kind == 'flat' else rng.uniform(1.1, 1.8)
+        rates[kind] = base_rate * trend * multiplier * rng.uniform(0.95, 1.05, n)
+        df[f'{kind} - weighted average rate'] = rates[kind]
+    for kind in PROPERTY_TYPES:
+        low = (rates[kind] * 0.95).astype(int)
+        high = (rates[kind] * 1.05).astype(int)
+        df[f'{kind} - most prevailing rate - range'] = pd.Series(low).astype(str) + '-' + pd.Series(high).astype(str)
+
+    df['total units'] = rng.integers(0, 5000, n)
+    df['total carpet area supplied (sqft)'] = df['total units'] * rng.uniform(500, 900, n)
+    for kind in PROPERTY_TYPES:
+        df[f'{kind} total'] = rng.integers(0, 1000, n)
+
+    return df
+
+
+def write_workbook(path: str, rows: int, **kwargs) -> pd.DataFrame:
+    """Write a synthetic workbook to ``path`` and return its DataFrame."""
+    df = make_dataframe(rows, **kwargs)
+    df.to_excel(path, index=False)
+    return df
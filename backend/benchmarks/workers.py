@@ -0,0 +1,212 @@
+"""
+Gunicorn configurations compared: memory per worker and warm-up time.
+
+    python -m benchmarks.workers --workers 4
+    python -m benchmarks.workers --workers 4 --rows 1000000
+
+Each configuration runs as a real gunicorn server on the shipped dataset
+(or a synthetic one of ``--rows`` rows) with mock summaries:
+
+- booted: seconds from launch until every worker has booted and loaded
+  its dataset (or, with preload, been forked from the warmed-up master)
+- ready: seconds from launch until /api/health/ first answers, which
+  includes the lazy imports of a worker's first request
+- first query, p50: latency of the first /api/query/ and the median of
+  ``--requests`` more, sent from ``--workers`` threads so they spread over
+  the workers (without preload, each worker builds its derived tables on
+  its first queries)
+- RSS, PSS and private memory of a worker (mean) after those requests, and
+  the PSS of master and workers together. PSS splits each shared page
+  between the processes sharing it, so the total is the real footprint.
+
+Memory is read from /proc/<pid>/smaps_rollup, so this needs Linux.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from .storage import BACKEND_DIR, run as run_storage
+
+GUNICORN = [shutil.which('gunicorn')] if shutil.which('gunicorn') else [sys.executable, '-m', 'gunicorn']
+
+# name: (gunicorn arguments, environment)
+CONFIGS = {
+    'sync (old Procfile)': (['backend.wsgi', '--config', '/dev/null', '--workers', '{workers}'], {}),
+    'gthread': (['--config', 'gunicorn.conf.py'], {'GUNICORN_PRELOAD': 'False'}),
+    'gthread + preload': (['--config', 'gunicorn.conf.py'], {}),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def call(port: int, path: str, body=None, timeout: float = 60):
+    request = urllib.request.Request(
+        f'http://127.0.0.1:{port}{path}',
+        data=json.dumps(body).encode() if body is not None else None,
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def memory_kb(pid: int) -> dict:
+    """Rss, Pss and private (clean + dirty) kB of a process."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    return {'rss': fields['Rss'], 'pss': fields['Pss'], 'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def children(pid: int) -> list:
+    found = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    found.append(int(name))
+        except (OSError, IndexError, ValueError):
+            continue
+    return found
+
+
+def watch(stream, marks: dict, start: float) -> None:
+    """Record when each worker boots and each process finishes loading the dataset."""
+    for line in stream:
+        if 'Booting worker' in line:
+            marks['boots'].append(time.perf_counter() - start)
+        elif 'Successfully loaded' in line:
+            marks['loads'].append(time.perf_counter() - start)
+
+
+def measure(name: str, workers: int, requests: int, env: dict) -> dict:
+    arguments, overrides = CONFIGS[name]
+    port = free_port()
+    arguments = [argument.format(workers=workers) for argument in arguments]
+    env = {**env, **overrides, 'WEB_CONCURRENCY': str(workers)}
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [*GUNICORN, *arguments, '--bind', f'127.0.0.1:{port}'], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    marks = {'boots': [], 'loads': []}
+    for stream in (process.stdout, process.stderr):
+        threading.Thread(target=watch, args=(stream, marks, start), daemon=True).start()
+
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with {process.returncode}')
+            try:
+                call(port, '/api/health/', timeout=1)
+                break
+            except OSError:
+                time.sleep(0.05)
+        ready = time.perf_counter() - start
+
+        # Every worker booted, and (without preload) loaded the dataset itself
+        loads = 1 if name.endswith('preload') else workers
+        while len(marks['boots']) < workers or len(marks['loads']) < loads:
+            if time.perf_counter() - start > 600:
+                raise RuntimeError('workers did not come up')
+            time.sleep(0.05)
+        booted = max(marks['boots'] + marks['loads'])
+
+        localities = call(port, '/api/localities/')['localities']
+        queries = [
+            f'Compare {localities[i % len(localities)]} and {localities[(i * 7 + 1) % len(localities)]}'
+            for i in range(requests + 1)
+        ]
+
+        def timed(query):
+            begin = time.perf_counter()
+            call(port, '/api/query/', {'query': query})
+            return time.perf_counter() - begin
+
+        first = timed(queries[0])
+        with ThreadPoolExecutor(workers) as pool:
+            latencies = list(pool.map(timed, queries[1:]))
+
+        pids = children(process.pid)
+        usage = [memory_kb(pid) for pid in pids]
+        return {
+            'ready': ready,
+            'booted': booted,
+            'first': first,
+            'p50': statistics.median(latencies) if latencies else float('nan'),
+            **{key: statistics.mean(u[key] for u in usage) / 1024 for key in ('rss', 'pss', 'private')},
+            'total': (memory_kb(process.pid)['pss'] + sum(u['pss'] for u in usage)) / 1024,
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=40, help='queries after the first one')
+    parser.add_argument('--rows', type=int, help='synthetic dataset of this many rows (default: the shipped workbook)')
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        'ALLOWED_HOSTS': '127.0.0.1',
+        'OPENAI_API_KEY': '',
+        'SUMMARY_CACHE_PATH': '',
+        'RESPONSE_CACHE_BACKEND': 'none',
+        'DATASET_WATCH_INTERVAL': '0',
+        'PYTHONUNBUFFERED': '1',
+    }
+    directory = None
+    if args.rows:
+        directory = tempfile.mkdtemp(prefix='workers-bench-')
+        result = run_storage(['--prepare', directory, '--rows', args.rows])
+        if result.returncode != 0:
+            sys.exit(f"could not build the dataset: {result.stderr.strip().splitlines()[-1:]}")
+        env.update({'DATASET_PATH': os.path.join(directory, 'realestate.xlsx'), 'DATASET_CACHE_DIR': directory})
+
+    print(f"{args.workers} workers, {args.rows or 'shipped'} rows")
+    print(f"{'config':<20} {'booted':>7} {'ready':>7} {'first query':>11} {'p50':>8} "
+          f"{'RSS/worker':>10} {'PSS/worker':>10} {'private':>9} {'total PSS':>9}")
+    try:
+        for name in args.configs:
+            try:
+                m = measure(name, args.workers, args.requests, env)
+            except (RuntimeError, OSError) as e:
+                print(f"{name:<20} failed: {e}")
+                continue
+            print(
+                f"{name:<20} {m['booted']:>6.1f}s {m['ready']:>6.1f}s {m['first'] * 1000:>9.0f}ms {m['p50'] * 1000:>6.0f}ms "
+                f"{m['rss']:>8.0f}MB {m['pss']:>8.0f}MB {m['private']:>7.0f}MB {m['total']:>7.0f}MB"
+            )
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
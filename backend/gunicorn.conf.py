@@ -0,0 +1,79 @@
+"""
+Gunicorn settings for the API (used by the Procfile: ``gunicorn --config gunicorn.conf.py``).
+
+- The application and the dataset snapshot are loaded once, in the master
+  (``preload_app``), then the master warms up the views and derived tables
+  and freezes its heap (``gc.freeze``). Workers are forked from it and share
+  all of that read-only memory copy-on-write, instead of each importing
+  pandas/openpyxl and loading the dataset again.
+- Requests mostly wait on OpenAI (up to ``OPENAI_TIMEOUT``) and do little
+  CPU work, so a few processes with many threads (``gthread``) serve them:
+  while every OpenAI slot of a worker (``OPENAI_MAX_CONCURRENCY``) is busy,
+  its spare threads still answer cached queries, analytics and exports.
+- Workers are recycled after ``max_requests`` (with jitter, so they do not
+  restart together); with preload, a new worker is a fork, not a reload.
+
+Every setting can be overridden from the environment (``python -m
+benchmarks.workers`` compares configurations):
+
+    WEB_CONCURRENCY=2 GUNICORN_THREADS=16 GUNICORN_PRELOAD=False gunicorn --config gunicorn.conf.py
+    GUNICORN_WORKER_CLASS=uvicorn gunicorn --config gunicorn.conf.py   # ASGI, for /api/query/async/
+"""
+import gc
+import multiprocessing
+import os
+
+_openai_timeout = float(os.environ.get('OPENAI_TIMEOUT', '20'))
+_openai_concurrency = int(os.environ.get('OPENAI_MAX_CONCURRENCY', '8'))
+
+# gthread (default), sync or uvicorn (ASGI; Django then buffers the SSE and export streams)
+_worker = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+worker_class = 'uvicorn.workers.UvicornWorker' if _worker == 'uvicorn' else _worker
+wsgi_app = 'backend.asgi:application' if _worker == 'uvicorn' else 'backend.wsgi:application'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, multiprocessing.cpu_count())))
+# One thread per OpenAI slot, plus a few for requests that do not need one
+threads = int(os.environ.get('GUNICORN_THREADS', _openai_concurrency + 4))
+
+# gthread heartbeats do not wait for requests; sync workers are busy for a whole OpenAI call
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', max(30, int(2 * _openai_timeout))))
+# Let in-flight OpenAI calls finish when a worker is recycled or reloaded
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', int(_openai_timeout) + 10))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', str(max_requests // 10)))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+if preload_app:
+    # The master must not run threads across forks: workers start their own dataset watcher
+    os.environ['DATASET_WATCH_AFTER_FORK'] = 'True'
+
+# Heartbeat files on tmpfs, so a slow disk cannot stall the workers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+errorlog = '-'
+
+
+def when_ready(server):
+    """In the (preloaded) master, before the first fork: build shared state, then freeze it."""
+    if not preload_app:
+        return
+    from api.warmup import warm_up
+
+    seconds = warm_up()
+    # Frozen objects are never scanned by the workers' garbage collector,
+    # which would otherwise write to (and so copy) every page holding one
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"🔥 Warmed up in {seconds:.2f}s, {gc.get_freeze_count()} objects frozen for the workers")
+
+
+def post_fork(server, worker):
+    """In each new worker: start the threads the master could not hand over."""
+    if preload_app:
+        from api.apps import start_dataset_watcher
+
+        start_dataset_watcher()
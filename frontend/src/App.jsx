@@ -3,7 +3,7 @@ import ChatInput from './components/ChatInput'
 import ChatMessage from './components/ChatMessage'
 import ChartResult from './components/ChartResult'
 import TableResult from './components/TableResult'
-import { queryAnalysis, getLocalities } from './api'
+import { queryAnalysis, queryAnalysisStream, getLocalities } from './api'
 import 'bootstrap/dist/js/bootstrap.bundle.min.js'
 
 function App() {
@@ -37,22 +37,41 @@ function App() {
     setMessages(prev => [...prev, userMessage])
     setLoading(true)
 
+    const botId = Date.now() + 1
+    const toBotMessage = (response) => ({
+      id: botId,
+      type: 'bot',
+      content: response.summary,
+      query,
+      chartData: response.chartData,
+      tableData: response.tableData,
+      tablePage: response.tablePage,
+      localities: response.localities,
+      metrics: response.metrics,
+      queryType: response.type,
+      timestamp: new Date()
+    })
+
     try {
-      const response = await queryAnalysis(query)
-      
-      // Add bot response
-      const botMessage = {
-        id: Date.now() + 1,
-        type: 'bot',
-        content: response.summary,
-        chartData: response.chartData,
-        tableData: response.tableData,
-        localities: response.localities,
-        metrics: response.metrics,
-        queryType: response.type,
-        timestamp: new Date()
+      if (window.ReadableStream && window.TextDecoder) {
+        // Show charts and table immediately, then fill in the AI summary as it streams
+        await queryAnalysisStream(query, {
+          onAnalysis: (response) => {
+            setMessages(prev => [...prev, { ...toBotMessage(response), streaming: true }])
+            setLoading(false)
+          },
+          onSummary: (summary, done) => {
+            setMessages(prev => prev.map(message => (
+              message.id === botId ? { ...message, content: summary, streaming: !done } : message
+            )))
+          },
+        })
+      } else {
+        const response = await queryAnalysis(query)
+        
+        // Add bot response
+        setMessages(prev => [...prev, toBotMessage(response)])
       }
-      setMessages(prev => [...prev, botMessage])
       
       // Scroll to bottom after message is added
       setTimeout(() => {
@@ -9,15 +9,110 @@ const api = axios.create({
   },
 })
 
+// Last response (and its ETag) per query, so repeats can be answered with 304
+const MAX_CACHED_QUERIES = 50
+const queryCache = new Map()
+
+const normalizeQuery = (query) => query.trim().toLowerCase().split(/\s+/).join(' ')
+
 export const queryAnalysis = async (query) => {
+  const key = normalizeQuery(query)
+  const cached = queryCache.get(key)
+
   try {
-    const response = await api.post('/api/query/', { query })
+    const response = await api.post('/api/query/', { query, table_format: 'columnar' }, {
+      headers: cached ? { 'If-None-Match': cached.etag } : {},
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    })
+
+    if (response.status === 304 && cached) {
+      return cached.data
+    }
+
+    const etag = response.headers.etag
+    if (etag) {
+      queryCache.delete(key)
+      queryCache.set(key, { etag, data: response.data })
+      if (queryCache.size > MAX_CACHED_QUERIES) {
+        queryCache.delete(queryCache.keys().next().value)
+      }
+    }
     return response.data
   } catch (error) {
     throw new Error(error.response?.data?.error || error.message || 'Failed to process query')
   }
 }
 
+// Parse a text/event-stream body into { event, data } objects as they arrive
+async function* readEvents(body) {
+  const reader = body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      const data = []
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim())
+      }
+      if (data.length > 0) yield { event, data: JSON.parse(data.join('\n')) }
+    }
+  }
+}
+
+// Charts and table arrive at once (onAnalysis), the AI summary piece by piece (onSummary)
+export const queryAnalysisStream = async (query, { onAnalysis, onSummary }) => {
+  const response = await fetch(`${API_BASE_URL}/api/query/stream/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ query, table_format: 'columnar' }),
+  })
+
+  if (!response.ok || !response.body) {
+    const error = await response.json().catch(() => ({}))
+    throw new Error(error.error || `Failed to process query (${response.status})`)
+  }
+
+  let summary = ''
+  for await (const { event, data } of readEvents(response.body)) {
+    if (event === 'analysis') {
+      onAnalysis(data)
+    } else if (event === 'summary') {
+      summary += data.text
+      onSummary(summary, false)
+    } else if (event === 'done' || event === 'error') {
+      onSummary(data.summary, true)
+    }
+  }
+}
+
+// tableData comes either as row objects or columnar: { columns: [...], data: { column: [...] } }
+export const tableColumns = (tableData) => {
+  if (!tableData) return []
+  if (Array.isArray(tableData)) return tableData.length > 0 ? Object.keys(tableData[0]) : []
+  return tableData.columns
+}
+
+export const tableRowCount = (tableData) => {
+  if (!tableData) return 0
+  if (Array.isArray(tableData)) return tableData.length
+  const [first] = tableData.columns
+  return first ? tableData.data[first].length : 0
+}
+
+export const tableCell = (tableData, rowIdx, col) => (
+  Array.isArray(tableData) ? tableData[rowIdx][col] : tableData.data[col][rowIdx]
+)
+
 export const getLocalities = async () => {
   try {
     const response = await api.get('/api/localities/')
@@ -27,18 +122,23 @@ export const getLocalities = async () => {
   }
 }
 
-export const downloadData = async (tableData, format = 'csv') => {
+const EXPORT_TYPES = {
+  csv: 'text/csv',
+  jsonl: 'application/x-ndjson',
+  parquet: 'application/vnd.apache.parquet',
+}
+
+// The server re-runs the query and streams the export; no table data is uploaded
+export const downloadData = async (query, fields, format = 'csv') => {
   try {
     const response = await api.post(
-      '/api/download/',
-      { tableData, format },
+      '/api/export/',
+      { query, fields, format },
       { responseType: 'blob' }
     )
     
     // Create blob and download
-    const blob = new Blob([response.data], {
-      type: format === 'csv' ? 'text/csv' : 'application/json'
-    })
+    const blob = new Blob([response.data], { type: EXPORT_TYPES[format] })
     const url = window.URL.createObjectURL(blob)
     const link = document.createElement('a')
     link.href = url
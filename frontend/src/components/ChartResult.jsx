@@ -32,7 +32,7 @@ function ChartResult({ chartData, localities, metrics, queryType }) {
     return null
   }
 
-  const isComparison = queryType === 'comparison' && localities && localities.length > 1
+  const isComparison = (queryType === 'comparison' || queryType === 'ranking') && localities && localities.length > 1
 
   // Prepare datasets based on metrics and type
   const datasets = []
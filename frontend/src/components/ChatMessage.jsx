@@ -1,18 +1,18 @@
 import ChartResult from './ChartResult'
 import TableResult from './TableResult'
-import { downloadData } from '../api'
+import { downloadData, tableColumns, tableRowCount } from '../api'
 
 function ChatMessage({ message }) {
   const isUser = message.type === 'user'
 
   const handleDownload = async (format) => {
-    if (!message.tableData || message.tableData.length === 0) {
+    if (tableRowCount(message.tableData) === 0) {
       alert('No data available to download')
       return
     }
 
     try {
-      await downloadData(message.tableData, format)
+      await downloadData(message.query, tableColumns(message.tableData), format)
     } catch (error) {
       alert(`Error downloading data: ${error.message}`)
     }
@@ -25,7 +25,7 @@ function ChatMessage({ message }) {
           <div className="fw-bold">
             {isUser ? 'You' : '🤖 Bot'}
           </div>
-          {!isUser && message.tableData && message.tableData.length > 0 && (
+          {!isUser && tableRowCount(message.tableData) > 0 && (
             <div className="btn-group btn-group-sm" role="group">
               <button
                 type="button"
@@ -38,16 +38,17 @@ function ChatMessage({ message }) {
               <button
                 type="button"
                 className="btn btn-outline-primary btn-sm"
-                onClick={() => handleDownload('json')}
-                title="Download as JSON"
+                onClick={() => handleDownload('jsonl')}
+                title="Download as JSON Lines"
               >
-                📥 JSON
+                📥 JSONL
               </button>
             </div>
           )}
         </div>
         <div style={{ whiteSpace: 'pre-wrap' }}>
           {message.content}
+          {message.streaming && <span className="spinner-grow spinner-grow-sm ms-1 text-secondary" role="status" />}
         </div>
       </div>
 
@@ -63,9 +64,9 @@ function ChatMessage({ message }) {
         </div>
       )}
 
-      {!isUser && message.tableData && message.tableData.length > 0 && (
+      {!isUser && tableRowCount(message.tableData) > 0 && (
         <div className="mt-3">
-          <TableResult data={message.tableData} />
+          <TableResult data={message.tableData} page={message.tablePage} />
         </div>
       )}
     </div>
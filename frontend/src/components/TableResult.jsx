@@ -1,10 +1,14 @@
-function TableResult({ data }) {
-  if (!data || data.length === 0) {
+import { tableCell, tableColumns, tableRowCount } from '../api'
+
+function TableResult({ data, page }) {
+  const rowCount = tableRowCount(data)
+  if (rowCount === 0) {
     return null
   }
 
-  // Get all unique keys from the data
-  const columns = Object.keys(data[0])
+  // Rows or columnar data
+  const columns = tableColumns(data)
+  const rows = Array.from({ length: rowCount }, (_, rowIdx) => rowIdx)
 
   // Format cell value
   const formatValue = (value) => {
@@ -37,6 +41,11 @@ function TableResult({ data }) {
     <div className="card shadow-sm mb-3">
       <div className="card-header">
         <h6 className="mb-0">📊 Data Table</h6>
+        {page && page.total > rowCount && (
+          <small className="text-muted">
+            Showing rows {page.offset + 1}–{page.offset + rowCount} of {page.total.toLocaleString('en-IN')}
+          </small>
+        )}
       </div>
       <div className="card-body p-0">
         <div style={{ maxHeight: '400px', overflowY: 'auto', overflowX: 'auto' }}>
@@ -51,11 +60,11 @@ function TableResult({ data }) {
               </tr>
             </thead>
             <tbody>
-              {data.map((row, rowIdx) => (
+              {rows.map((rowIdx) => (
                 <tr key={rowIdx}>
                   {columns.map((col, colIdx) => (
                     <td key={colIdx} style={{ whiteSpace: 'nowrap' }}>
-                      {formatValue(row[col])}
+                      {formatValue(tableCell(data, rowIdx, col))}
                     </td>
                   ))}
                 </tr>